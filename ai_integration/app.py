@@ -37,6 +37,10 @@ DOCUMENT_PROCESSOR_URL = os.getenv("DOCUMENT_PROCESSOR_URL", "http://localhost:8
 KNOWLEDGE_BASE_URL = os.getenv("KNOWLEDGE_BASE_URL", "http://localhost:8001")
 FACEBOOK_ADS_MANAGER_URL = os.getenv("FACEBOOK_ADS_MANAGER_URL", "http://localhost:8002")
 
+# Ad set metric requests in flight at once; each one is a Facebook insights
+# call, so this also bounds the load on the account's rate limit
+MAX_PARALLEL_METRIC_FETCHES = 8
+
 # Database setup
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./ai_integration.db")
 engine = create_engine(DATABASE_URL)
@@ -518,6 +522,25 @@ async def create_rule_from_knowledge(knowledge_entry: Dict[str, Any], db: Sessio
     except Exception as e:
         logger.error(f"Error creating rule from knowledge: {str(e)}")
 
+async def fetch_adset_metrics(client: httpx.AsyncClient, adsets: List[Dict[str, Any]]) -> List[Any]:
+    """
+    Fetch the performance metrics of several ad sets concurrently.
+    
+    Args:
+        client: HTTP client for the Facebook Ads Manager API
+        adsets: Ad sets to fetch metrics for
+        
+    Returns:
+        Response or raised exception per ad set, in ad set order
+    """
+    semaphore = asyncio.Semaphore(MAX_PARALLEL_METRIC_FETCHES)
+    
+    async def fetch(adset):
+        async with semaphore:
+            return await client.get(f"{FACEBOOK_ADS_MANAGER_URL}/adsets/{adset['id']}/metrics")
+    
+    return await asyncio.gather(*(fetch(adset) for adset in adsets), return_exceptions=True)
+
 async def evaluate_and_execute_rules(user_id: str, account_id: str, automation_level: str, db: Session):
     """
     Evaluate rules against performance metrics and execute actions.
@@ -549,126 +572,129 @@ async def evaluate_and_execute_rules(user_id: str, account_id: str, automation_l
         
         campaigns = campaigns_response.json()
         
-        # Process each campaign
-        for campaign in campaigns:
-            # Get campaign metrics
-            metrics_response = requests.get(
-                f"{FACEBOOK_ADS_MANAGER_URL}/campaigns/{campaign['id']}/metrics"
-            )
-            
-            if metrics_response.status_code != 200:
-                logger.error(f"Error getting campaign metrics: {metrics_response.status_code}")
-                continue
-            
-            campaign_metrics = metrics_response.json()
-            
-            # Get ad sets
-            adsets_response = requests.get(
-                f"{FACEBOOK_ADS_MANAGER_URL}/campaigns/{campaign['id']}/adsets/"
-            )
-            
-            if adsets_response.status_code != 200:
-                logger.error(f"Error getting ad sets: {adsets_response.status_code}")
-                continue
-            
-            adsets = adsets_response.json()
-            
-            # Process each ad set
-            for adset in adsets:
-                # Get ad set metrics
-                adset_metrics_response = requests.get(
-                    f"{FACEBOOK_ADS_MANAGER_URL}/adsets/{adset['id']}/metrics"
+        # Process each campaign, sharing one client so connections stay open between them
+        async with httpx.AsyncClient(timeout=60) as client:
+            for campaign in campaigns:
+                # Get campaign metrics
+                metrics_response = requests.get(
+                    f"{FACEBOOK_ADS_MANAGER_URL}/campaigns/{campaign['id']}/metrics"
                 )
                 
-                if adset_metrics_response.status_code != 200:
-                    logger.error(f"Error getting ad set metrics: {adset_metrics_response.status_code}")
+                if metrics_response.status_code != 200:
+                    logger.error(f"Error getting campaign metrics: {metrics_response.status_code}")
                     continue
                 
-                adset_metrics = adset_metrics_response.json()
+                campaign_metrics = metrics_response.json()
                 
-                # Prepare metrics for rule evaluation
-                metrics = {}
+                # Get ad sets
+                adsets_response = requests.get(
+                    f"{FACEBOOK_ADS_MANAGER_URL}/campaigns/{campaign['id']}/adsets/"
+                )
+                
+                if adsets_response.status_code != 200:
+                    logger.error(f"Error getting ad sets: {adsets_response.status_code}")
+                    continue
                 
-                if adset_metrics:
-                    # Calculate average metrics across days
-                    impressions = 0
-                    clicks = 0
-                    conversions = 0
-                    spend = 0
+                adsets = adsets_response.json()
+                
+                # Get all ad set metrics at once instead of one request after another
+                adset_metrics_responses = await fetch_adset_metrics(client, adsets)
+                
+                # Process each ad set
+                for adset, adset_metrics_response in zip(adsets, adset_metrics_responses):
+                    if isinstance(adset_metrics_response, Exception):
+                        logger.error(f"Error getting ad set metrics: {str(adset_metrics_response)}")
+                        continue
                     
-                    for metric in adset_metrics:
-                        impressions += metric.get("impressions", 0)
-                        clicks += metric.get("clicks", 0)
-                        conversions += metric.get("conversions", 0)
-                        spend += metric.get("spend", 0)
+                    if adset_metrics_response.status_code != 200:
+                        logger.error(f"Error getting ad set metrics: {adset_metrics_response.status_code}")
+                        continue
                     
-                    # Add metrics
-                    if impressions > 0:
-                        metrics["impressions"] = impressions
+                    adset_metrics = adset_metrics_response.json()
                     
-                    if clicks > 0:
-                        metrics["clicks"] = clicks
-                        if impressions > 0:
-                            metrics["CTR"] = (clicks / impressions) * 100  # As percentage
+                    # Prepare metrics for rule evaluation
+                    metrics = {}
                     
-                    if conversions > 0:
-                        metrics["conversions"] = conversions
+                    if adset_metrics:
+                        # Calculate average metrics across days
+                        impressions = 0
+                        clicks = 0
+                        conversions = 0
+                        spend = 0
+                        
+                        for metric in adset_metrics:
+                            impressions += metric.get("impressions", 0)
+                            clicks += metric.get("clicks", 0)
+                            conversions += metric.get("conversions", 0)
+                            spend += metric.get("spend", 0)
+                        
+                        # Add metrics
+                        if impressions > 0:
+                            metrics["impressions"] = impressions
+                        
+                        if clicks > 0:
+                            metrics["clicks"] = clicks
+                            if impressions > 0:
+                                metrics["CTR"] = (clicks / impressions) * 100  # As percentage
+                        
+                        if conversions > 0:
+                            metrics["conversions"] = conversions
+                            if spend > 0:
+                                metrics["CPA"] = spend / conversions
+                        
                         if spend > 0:
-                            metrics["CPA"] = spend / conversions
+                            metrics["spend"] = spend
                     
-                    if spend > 0:
-                        metrics["spend"] = spend
-                
-                # Skip if no metrics
-                if not metrics:
-                    continue
-                
-                # Evaluate rules
-                rules_response = requests.post(
-                    f"{KNOWLEDGE_BASE_URL}/rules/evaluate",
-                    json={"metrics": metrics}
-                )
-                
-                if rules_response.status_code != 200:
-                    logger.error(f"Error evaluating rules: {rules_response.status_code}")
-                    continue
-                
-                rules_result = rules_response.json()
-                
-                # Process triggered rules
-                for rule in rules_result.get("triggered_rules", []):
-                    for action in rule.get("actions", []):
-                        # Create decision
-                        decision = AIDecision(
-                            user_id=user_id,
-                            campaign_id=campaign["id"],
-                            adset_id=adset["id"],
-                            decision_type=action["action_type"],
-                            decision_details=json.dumps({
-                                "action_value": action["action_value"],
-                                "metrics": metrics
-                            }),
-                            reasoning=f"Rule: {rule['name']} - Based on metrics: {json.dumps(metrics)}",
-                            status="pending"
-                        )
-                        db.add(decision)
-                        db.commit()
-                        
-                        # Execute or request approval based on automation level
-                        if automation_level == "autonomous":
-                            await execute_decision(decision.id, db)
-                        elif automation_level == "hybrid":
-                            # Automatically execute low-risk actions, request approval for high-risk
-                            if action["action_type"] == "adjust_budget" and not action["action_value"].startswith("+"):
-                                # Budget decrease is low-risk
+                    # Skip if no metrics
+                    if not metrics:
+                        continue
+                    
+                    # Evaluate rules
+                    rules_response = requests.post(
+                        f"{KNOWLEDGE_BASE_URL}/rules/evaluate",
+                        json={"metrics": metrics}
+                    )
+                    
+                    if rules_response.status_code != 200:
+                        logger.error(f"Error evaluating rules: {rules_response.status_code}")
+                        continue
+                    
+                    rules_result = rules_response.json()
+                    
+                    # Process triggered rules
+                    for rule in rules_result.get("triggered_rules", []):
+                        for action in rule.get("actions", []):
+                            # Create decision
+                            decision = AIDecision(
+                                user_id=user_id,
+                                campaign_id=campaign["id"],
+                                adset_id=adset["id"],
+                                decision_type=action["action_type"],
+                                decision_details=json.dumps({
+                                    "action_value": action["action_value"],
+                                    "metrics": metrics
+                                }),
+                                reasoning=f"Rule: {rule['name']} - Based on metrics: {json.dumps(metrics)}",
+                                status="pending"
+                            )
+                            db.add(decision)
+                            db.commit()
+                            
+                            # Execute or request approval based on automation level
+                            if automation_level == "autonomous":
                                 await execute_decision(decision.id, db)
-                            else:
-                                # Other actions require approval
+                            elif automation_level == "hybrid":
+                                # Automatically execute low-risk actions, request approval for high-risk
+                                if action["action_type"] == "adjust_budget" and not action["action_value"].startswith("+"):
+                                    # Budget decrease is low-risk
+                                    await execute_decision(decision.id, db)
+                                else:
+                                    # Other actions require approval
+                                    decision.status = "pending_approval"
+                                    db.commit()
+                            else:  # approval_required
                                 decision.status = "pending_approval"
                                 db.commit()
-                        else:  # approval_required
-                            decision.status = "pending_approval"
-                            db.commit()
         
         logger.info(f"Rule evaluation completed for account: {account_id}")
         
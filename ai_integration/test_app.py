@@ -3,6 +3,7 @@ Test module for the AI Integration application.
 """
 
 import os
+import httpx
 import pytest
 import json
 from datetime import datetime
@@ -14,6 +15,7 @@ from sqlalchemy.pool import StaticPool
 
 from app import app, Base, get_db, AIDecision, AIQuery
 from app import process_document, create_rule_from_knowledge, evaluate_and_execute_rules, execute_decision
+from app import fetch_adset_metrics
 
 # Create test database
 TEST_DATABASE_URL = "sqlite:///./test_ai_integration.db"
@@ -171,6 +173,21 @@ async def test_execute_decision(setup_database, mock_requests, sample_decision):
     mock_requests.get.assert_called()
     mock_requests.put.assert_called()
 
+@pytest.mark.asyncio
+async def test_fetch_adset_metrics():
+    """Test that ad set metrics come back in ad set order, failures included."""
+    def handler(request):
+        if "broken" in request.url.path:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200, json=[{"impressions": 100}])
+    
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http_client:
+        responses = await fetch_adset_metrics(http_client, [{"id": "adset_1"}, {"id": "broken"}, {"id": "adset_2"}])
+    
+    assert responses[0].json() == [{"impressions": 100}]
+    assert isinstance(responses[1], httpx.ConnectError)
+    assert responses[2].status_code == 200
+
 # Integration tests for API endpoints
 def test_upload_document(setup_database, mock_requests):
     """Test document upload endpoint."""
@@ -8,7 +8,7 @@ the rest of the application, including document processing and Facebook Ads inte
 import os
 import json
 import logging
-from typing import Dict, List, Optional, Any, Union
+from typing import Dict, Iterable, Iterator, List, Optional, Any, Tuple, Union
 
 from .deepseek_client import DeepSeekAIClient, DeepSeekAPIError
 
@@ -19,6 +19,65 @@ logging.basicConfig(
 )
 logger = logging.getLogger('deepseek_api_connection')
 
+def _iter_json_fields(chunks: Iterable[str]) -> Iterator[Tuple[str, Any]]:
+    """Yield the top-level fields of a streamed JSON object as each one closes.
+    
+    Text before the opening brace (such as a markdown code fence) is skipped,
+    and parsing stops at the closing brace of the outermost object.
+    
+    Args:
+        chunks: Fragments of JSON text in order
+        
+    Yields:
+        (key, value) pairs of the top-level object
+        
+    Raises:
+        json.JSONDecodeError: If a completed field is not valid JSON, or if
+            the chunks end before an object is opened and closed (e.g. the
+            output was cut off at max_tokens)
+    """
+    buffer = ""
+    position = 0
+    depth = 0
+    field_start = 0
+    in_string = False
+    escaped = False
+    
+    for chunk in chunks:
+        buffer += chunk
+        while position < len(buffer):
+            char = buffer[position]
+            if depth == 0:
+                if char == "{":
+                    depth = 1
+                    field_start = position + 1
+            elif in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in "{[":
+                depth += 1
+            elif char in "}]":
+                depth -= 1
+                if depth == 0:
+                    field = buffer[field_start:position].strip()
+                    if field:
+                        yield from json.loads("{" + field + "}").items()
+                    return
+            elif char == "," and depth == 1:
+                yield from json.loads("{" + buffer[field_start:position] + "}").items()
+                field_start = position + 1
+            position += 1
+    
+    if depth == 0:
+        raise json.JSONDecodeError("No JSON object in streamed text", buffer, len(buffer))
+    raise json.JSONDecodeError("Streamed text ended inside the JSON object", buffer, len(buffer))
+
 class DeepSeekAPIConnection:
     """Connection class for integrating DeepSeek AI with the application."""
     
@@ -115,6 +174,63 @@ class DeepSeekAPIConnection:
             logger.error(f"Error evaluating campaign: {str(e)}")
             return {"error": f"Error: {str(e)}"}
     
+    def stream_evaluate_campaign(
+        self,
+        campaign_data: Dict[str, Any],
+        performance_metrics: Dict[str, Any],
+        knowledge_base_rules: List[Dict[str, Any]]
+    ) -> Iterator[Tuple[str, Any]]:
+        """Evaluate a campaign, yielding each recommendation as soon as it is generated.
+        
+        Args:
+            campaign_data: Data about the campaign
+            performance_metrics: Performance metrics for the campaign
+            knowledge_base_rules: Rules from the knowledge base
+            
+        Yields:
+            (key, value) pairs of the decision, e.g. ("budget_adjustment", {...}).
+            On failure a final ("error", message) pair is yielded; fields
+            yielded before it are complete.
+        """
+        campaign_name = campaign_data.get('name', 'Unknown campaign')
+        logger.info(f"Streaming evaluation for campaign: {campaign_name}")
+        
+        received = []
+        fields_yielded = 0
+        try:
+            chunks = self.client.stream_decision(
+                campaign_data=campaign_data,
+                performance_metrics=performance_metrics,
+                knowledge_base_rules=knowledge_base_rules
+            )
+            for field in _iter_json_fields(received.append(chunk) or chunk for chunk in chunks):
+                fields_yielded += 1
+                yield field
+            logger.info(f"Successfully streamed decision for campaign: {campaign_name}")
+        except json.JSONDecodeError:
+            if fields_yielded:
+                logger.error(f"Streamed decision for campaign {campaign_name} ended before it was complete")
+                yield "error", "Decision stream ended before the decision was complete"
+                return
+            
+            # Nothing usable arrived, so fall back to reformatting like generate_decision
+            logger.warning("Streamed decision was not valid JSON. Requesting reformatting...")
+            try:
+                decision = json.loads(self.client._reformat_as_json("".join(received)))
+            except (json.JSONDecodeError, DeepSeekAPIError):
+                decision = None
+            if not isinstance(decision, dict):
+                logger.error(f"Failed to parse streamed decision JSON for campaign: {campaign_name}")
+                yield "error", "Failed to parse decision"
+                return
+            yield from decision.items()
+        except DeepSeekAPIError as e:
+            logger.error(f"DeepSeek API error while streaming campaign evaluation: {str(e)}")
+            yield "error", f"DeepSeek API error: {str(e)}"
+        except Exception as e:
+            logger.error(f"Error streaming campaign evaluation: {str(e)}")
+            yield "error", f"Error: {str(e)}"
+    
     def get_optimization_suggestions(
         self, 
         ad_account_id: str,
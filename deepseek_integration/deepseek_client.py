@@ -10,7 +10,7 @@ import os
 import time
 import logging
 import json
-from typing import Dict, List, Optional, Union, Any
+from typing import Dict, Iterator, List, Optional, Union, Any
 
 import openai
 from openai import OpenAI
@@ -196,34 +196,21 @@ class DeepSeekAIClient:
             logger.error(f"Error analyzing document with DeepSeek AI: {str(e)}")
             raise DeepSeekAPIError(f"Error analyzing document: {str(e)}")
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
-        retry=retry_if_exception_type((openai.APIError, openai.APIConnectionError, openai.RateLimitError)),
-        reraise=True
-    )
-    def generate_decision(
-        self, 
-        campaign_data: Dict[str, Any], 
-        performance_metrics: Dict[str, Any], 
-        knowledge_base_rules: List[Dict[str, Any]],
-        temperature: float = 0.2,
-        max_tokens: int = 2000
-    ) -> str:
-        """Generate a decision about campaign management based on data and rules.
+    def _build_decision_messages(
+        self,
+        campaign_data: Dict[str, Any],
+        performance_metrics: Dict[str, Any],
+        knowledge_base_rules: List[Dict[str, Any]]
+    ) -> List[Dict[str, str]]:
+        """Build the chat messages for a campaign decision request.
         
         Args:
             campaign_data: Data about the campaign
             performance_metrics: Performance metrics for the campaign
             knowledge_base_rules: Rules from the knowledge base
-            temperature: Controls randomness. Lower values for more deterministic outputs.
-            max_tokens: Maximum number of tokens to generate
             
         Returns:
-            Decision recommendation from DeepSeek AI
-            
-        Raises:
-            DeepSeekAPIError: If there's an error calling the API
+            Messages for the chat completions API
         """
         # Convert inputs to JSON strings for better formatting in the prompt
         campaign_data_str = json.dumps(campaign_data, indent=2)
@@ -252,21 +239,52 @@ class DeepSeekAIClient:
         
         For each recommendation, explain your reasoning based on the knowledge base rules.
         Format your response as a JSON object with the following structure:
-        {
-            "budget_adjustment": {"action": "increase|decrease|maintain", "amount": 0.2, "reason": "explanation"},
+        {{
+            "budget_adjustment": {{"action": "increase|decrease|maintain", "amount": 0.2, "reason": "explanation"}},
             "ad_set_actions": [
-                {"ad_set_id": "id", "action": "pause|enable|increase_budget|decrease_budget", "amount": 0.3, "reason": "explanation"}
+                {{"ad_set_id": "id", "action": "pause|enable|increase_budget|decrease_budget", "amount": 0.3, "reason": "explanation"}}
             ],
             "targeting_recommendations": ["recommendation1", "recommendation2"],
             "creative_recommendations": ["recommendation1", "recommendation2"],
             "bidding_recommendations": ["recommendation1", "recommendation2"]
-        }
+        }}
         """
         
-        messages = [
+        return [
             {"role": "system", "content": "You are a media buying expert who makes data-driven decisions based on established rules."},
             {"role": "user", "content": prompt}
         ]
+    
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10),
+        retry=retry_if_exception_type((openai.APIError, openai.APIConnectionError, openai.RateLimitError)),
+        reraise=True
+    )
+    def generate_decision(
+        self, 
+        campaign_data: Dict[str, Any], 
+        performance_metrics: Dict[str, Any], 
+        knowledge_base_rules: List[Dict[str, Any]],
+        temperature: float = 0.2,
+        max_tokens: int = 2000
+    ) -> str:
+        """Generate a decision about campaign management based on data and rules.
+        
+        Args:
+            campaign_data: Data about the campaign
+            performance_metrics: Performance metrics for the campaign
+            knowledge_base_rules: Rules from the knowledge base
+            temperature: Controls randomness. Lower values for more deterministic outputs.
+            max_tokens: Maximum number of tokens to generate
+            
+        Returns:
+            Decision recommendation from DeepSeek AI
+            
+        Raises:
+            DeepSeekAPIError: If there's an error calling the API
+        """
+        messages = self._build_decision_messages(campaign_data, performance_metrics, knowledge_base_rules)
         
         logger.info(f"Generating decision with DeepSeek AI for campaign: {campaign_data.get('name', 'Unknown')}")
         
@@ -304,6 +322,53 @@ class DeepSeekAIClient:
             logger.error(f"Error generating decision with DeepSeek AI: {str(e)}")
             raise DeepSeekAPIError(f"Error generating decision: {str(e)}")
     
+    def stream_decision(
+        self,
+        campaign_data: Dict[str, Any],
+        performance_metrics: Dict[str, Any],
+        knowledge_base_rules: List[Dict[str, Any]],
+        temperature: float = 0.2,
+        max_tokens: int = 2000
+    ) -> Iterator[str]:
+        """Stream a campaign decision from DeepSeek AI as it is generated.
+        
+        Unlike generate_decision, the response is neither validated nor
+        reformatted, and failed requests are not retried once streaming
+        has started.
+        
+        Args:
+            campaign_data: Data about the campaign
+            performance_metrics: Performance metrics for the campaign
+            knowledge_base_rules: Rules from the knowledge base
+            temperature: Controls randomness. Lower values for more deterministic outputs.
+            max_tokens: Maximum number of tokens to generate
+            
+        Yields:
+            Fragments of the decision JSON text in generation order
+            
+        Raises:
+            DeepSeekAPIError: If there's an error calling the API
+        """
+        messages = self._build_decision_messages(campaign_data, performance_metrics, knowledge_base_rules)
+        
+        logger.info(f"Streaming decision with DeepSeek AI for campaign: {campaign_data.get('name', 'Unknown')}")
+        
+        try:
+            stream = self.client.chat.completions.create(
+                model="deepseek-chat",
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+            logger.info("Successfully streamed decision from DeepSeek AI")
+        except Exception as e:
+            logger.error(f"Error streaming decision with DeepSeek AI: {str(e)}")
+            raise DeepSeekAPIError(f"Error streaming decision: {str(e)}")
+    
     def _reformat_as_json(self, text: str) -> str:
         """Ask DeepSeek to reformat text as valid JSON.
         
@@ -8,6 +8,7 @@ with the existing application to create a complete AI media buying agent.
 import os
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Any, Union
 from datetime import datetime
 
@@ -22,9 +23,37 @@ logging.basicConfig(
 )
 logger = logging.getLogger('deepseek_integration')
 
+class _FacebookAdsNotConfigured:
+    """Stand-in for a missing Facebook Ads manager.
+    
+    Every method call raises, so callers fail inside their existing
+    try/except blocks instead of checking for the manager up front.
+    """
+    
+    def __bool__(self) -> bool:
+        return False
+    
+    def __getattr__(self, name: str):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        
+        def _not_configured(*args, **kwargs):
+            raise RuntimeError("Facebook Ads manager not initialized")
+        return _not_configured
+
 class AIMediaBuyingAgent:
     """AI-driven media buying agent that connects DeepSeek AI with Facebook Ads."""
     
+    # Log templates for the per-campaign methods, formatted lazily by logging
+    _LOG_EVAL_CAMPAIGN = "Evaluating campaign %s in account %s"
+    _LOG_EVAL_SUCCESS = "Successfully evaluated campaign %s"
+    _LOG_EVAL_ERROR = "Error evaluating campaign: %s"
+    _LOG_EXEC_DECISION = "Executing decision for campaign %s in account %s"
+    _LOG_EXEC_PENDING = "Auto-apply is disabled. Returning decision for manual review."
+    _LOG_EXEC_DONE = "Executed decision for campaign %s with %d changes and %d errors"
+    _LOG_EXEC_ERROR = "Error executing decision: %s"
+    _AD_SET_ERROR = "Failed to execute action for ad set {}: {}"
+    
     def __init__(
         self, 
         deepseek_api_key: Optional[str] = None,
@@ -60,7 +89,7 @@ class AIMediaBuyingAgent:
                     logger.info("Successfully initialized Facebook Ads manager")
                 except ImportError:
                     logger.warning("Could not import FacebookAdsManager. Facebook Ads functionality will be limited.")
-                    self.facebook_ads_manager = None
+                    self.facebook_ads_manager = _FacebookAdsNotConfigured()
             
             logger.info("AI Media Buying Agent initialization complete")
         except Exception as e:
@@ -95,6 +124,33 @@ class AIMediaBuyingAgent:
             logger.error(f"Error processing document: {str(e)}")
             return []
     
+    def _get_campaign_context(self, campaign_id: str, ad_account_id: str) -> Dict[str, Any]:
+        """Collect the campaign data, metrics and rules needed to evaluate a campaign.
+        
+        Args:
+            campaign_id: Facebook campaign ID
+            ad_account_id: Facebook ad account ID
+            
+        Returns:
+            Keyword arguments for the API connection's evaluation methods
+        """
+        # Get campaign data from Facebook
+        campaign_data = self.facebook_ads_manager.get_campaign(ad_account_id, campaign_id)
+        
+        # Get performance metrics
+        performance_metrics = self.facebook_ads_manager.get_campaign_performance(ad_account_id, campaign_id)
+        
+        # Get relevant knowledge base rules
+        knowledge_base_rules = self.knowledge_processor.get_rules_for_campaign_type(
+            campaign_data.get("objective", "")
+        )
+        
+        return {
+            "campaign_data": campaign_data,
+            "performance_metrics": performance_metrics,
+            "knowledge_base_rules": knowledge_base_rules
+        }
+    
     def evaluate_campaign(self, campaign_id: str, ad_account_id: str) -> Dict[str, Any]:
         """Evaluate a campaign and generate recommendations.
         
@@ -105,37 +161,87 @@ class AIMediaBuyingAgent:
         Returns:
             Recommendations for the campaign
         """
-        logger.info(f"Evaluating campaign {campaign_id} in account {ad_account_id}")
+        logger.info(self._LOG_EVAL_CAMPAIGN, campaign_id, ad_account_id)
         
         try:
-            if not self.facebook_ads_manager:
-                logger.error("Facebook Ads manager not initialized")
-                return {"error": "Facebook Ads manager not initialized"}
-            
-            # Get campaign data from Facebook
-            campaign_data = self.facebook_ads_manager.get_campaign(ad_account_id, campaign_id)
-            
-            # Get performance metrics
-            performance_metrics = self.facebook_ads_manager.get_campaign_performance(ad_account_id, campaign_id)
-            
-            # Get relevant knowledge base rules
-            knowledge_base_rules = self.knowledge_processor.get_rules_for_campaign_type(
-                campaign_data.get("objective", "")
-            )
-            
             # Generate decision using DeepSeek AI
             decision = self.api_connection.evaluate_campaign(
-                campaign_data=campaign_data,
-                performance_metrics=performance_metrics,
-                knowledge_base_rules=knowledge_base_rules
+                **self._get_campaign_context(campaign_id, ad_account_id)
             )
             
-            logger.info(f"Successfully evaluated campaign {campaign_id}")
+            logger.info(self._LOG_EVAL_SUCCESS, campaign_id)
             return decision
         except Exception as e:
-            logger.error(f"Error evaluating campaign: {str(e)}")
+            logger.error(self._LOG_EVAL_ERROR, e)
             return {"error": f"Error evaluating campaign: {str(e)}"}
     
+    def batch_evaluate_campaigns(
+        self,
+        ad_account_id: str,
+        campaign_ids: List[str],
+        max_workers: int = 8
+    ) -> Dict[str, Dict[str, Any]]:
+        """Evaluate several campaigns concurrently.
+        
+        Each evaluation is dominated by Facebook and DeepSeek network calls, so
+        running them on a thread pool overlaps the waits instead of paying for
+        them one after another.
+        
+        Args:
+            ad_account_id: Facebook ad account ID
+            campaign_ids: Facebook campaign IDs to evaluate
+            max_workers: Maximum number of concurrent evaluations
+            
+        Returns:
+            Recommendations keyed by campaign ID
+        """
+        logger.info(f"Batch evaluating {len(campaign_ids)} campaigns in account {ad_account_id}")
+        
+        if not campaign_ids:
+            return {}
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(campaign_ids))) as executor:
+            decisions = list(executor.map(
+                lambda campaign_id: self.evaluate_campaign(campaign_id, ad_account_id),
+                campaign_ids
+            ))
+        
+        return dict(zip(campaign_ids, decisions))
+    
+    def batch_execute_decisions(
+        self,
+        ad_account_id: str,
+        decisions: Dict[str, Dict[str, Any]],
+        auto_apply: bool = False,
+        max_workers: int = 8
+    ) -> Dict[str, Dict[str, Any]]:
+        """Execute decisions for several campaigns concurrently.
+        
+        Args:
+            ad_account_id: Facebook ad account ID
+            decisions: Decision structures keyed by campaign ID
+            auto_apply: Whether to automatically apply changes
+            max_workers: Maximum number of concurrent executions
+            
+        Returns:
+            Results of execution keyed by campaign ID
+        """
+        logger.info(f"Batch executing decisions for {len(decisions)} campaigns in account {ad_account_id}")
+        
+        if not decisions:
+            return {}
+        
+        campaign_ids = list(decisions)
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(campaign_ids))) as executor:
+            results = list(executor.map(
+                lambda campaign_id: self.execute_decision(
+                    campaign_id, ad_account_id, decisions[campaign_id], auto_apply=auto_apply
+                ),
+                campaign_ids
+            ))
+        
+        return dict(zip(campaign_ids, results))
+    
     def execute_decision(
         self, 
         campaign_id: str, 
@@ -154,77 +260,160 @@ class AIMediaBuyingAgent:
         Returns:
             Results of execution
         """
-        logger.info(f"Executing decision for campaign {campaign_id} in account {ad_account_id}")
+        logger.info(self._LOG_EXEC_DECISION, campaign_id, ad_account_id)
         
         if not auto_apply:
-            logger.info("Auto-apply is disabled. Returning decision for manual review.")
+            logger.info(self._LOG_EXEC_PENDING)
             return {"status": "pending_approval", "decision": decision}
         
         try:
-            if not self.facebook_ads_manager:
-                logger.error("Facebook Ads manager not initialized")
-                return {"error": "Facebook Ads manager not initialized"}
-            
             results = {"applied_changes": [], "errors": []}
             
             # Apply budget adjustment if present
             if "budget_adjustment" in decision:
-                adjustment = decision["budget_adjustment"]
-                try:
-                    if adjustment["action"] == "increase":
-                        self.facebook_ads_manager.increase_campaign_budget(
-                            ad_account_id, campaign_id, adjustment["amount"]
-                        )
-                        results["applied_changes"].append(f"Increased budget by {adjustment['amount']*100}%")
-                    elif adjustment["action"] == "decrease":
-                        self.facebook_ads_manager.decrease_campaign_budget(
-                            ad_account_id, campaign_id, adjustment["amount"]
-                        )
-                        results["applied_changes"].append(f"Decreased budget by {adjustment['amount']*100}%")
-                except Exception as e:
-                    results["errors"].append(f"Failed to adjust budget: {str(e)}")
+                self._apply_budget_adjustment(campaign_id, ad_account_id, decision["budget_adjustment"], results)
             
             # Apply ad set actions if present
             if "ad_set_actions" in decision:
-                for ad_set_action in decision["ad_set_actions"]:
-                    try:
-                        ad_set_id = ad_set_action["ad_set_id"]
-                        action = ad_set_action["action"]
-                        
-                        if action == "pause":
-                            self.facebook_ads_manager.pause_ad_set(ad_account_id, ad_set_id)
-                            results["applied_changes"].append(f"Paused ad set {ad_set_id}")
-                        elif action == "enable":
-                            self.facebook_ads_manager.enable_ad_set(ad_account_id, ad_set_id)
-                            results["applied_changes"].append(f"Enabled ad set {ad_set_id}")
-                        elif action == "increase_budget" and "amount" in ad_set_action:
-                            self.facebook_ads_manager.increase_ad_set_budget(
-                                ad_account_id, ad_set_id, ad_set_action["amount"]
-                            )
-                            results["applied_changes"].append(
-                                f"Increased ad set {ad_set_id} budget by {ad_set_action['amount']*100}%"
-                            )
-                        elif action == "decrease_budget" and "amount" in ad_set_action:
-                            self.facebook_ads_manager.decrease_ad_set_budget(
-                                ad_account_id, ad_set_id, ad_set_action["amount"]
-                            )
-                            results["applied_changes"].append(
-                                f"Decreased ad set {ad_set_id} budget by {ad_set_action['amount']*100}%"
-                            )
-                    except Exception as e:
-                        results["errors"].append(f"Failed to execute action for ad set {ad_set_id}: {str(e)}")
-            
-            logger.info(f"Executed decision for campaign {campaign_id} with {len(results['applied_changes'])} changes and {len(results['errors'])} errors")
+                self._apply_ad_set_actions(ad_account_id, decision["ad_set_actions"], results)
+            
+            logger.info(
+                self._LOG_EXEC_DONE, campaign_id, len(results["applied_changes"]), len(results["errors"])
+            )
             return results
         except Exception as e:
-            logger.error(f"Error executing decision: {str(e)}")
+            logger.error(self._LOG_EXEC_ERROR, e)
             return {"error": f"Error executing decision: {str(e)}"}
     
-    def get_account_optimization(self, ad_account_id: str) -> Dict[str, Any]:
+    def _apply_budget_adjustment(
+        self,
+        campaign_id: str,
+        ad_account_id: str,
+        adjustment: Dict[str, Any],
+        results: Dict[str, List[str]]
+    ) -> None:
+        """Apply a campaign budget adjustment, recording the outcome in results.
+        
+        Args:
+            campaign_id: Facebook campaign ID
+            ad_account_id: Facebook ad account ID
+            adjustment: Budget adjustment from the decision
+            results: Execution results to append applied changes and errors to
+        """
+        manager = self.facebook_ads_manager
+        try:
+            action = adjustment["action"]
+            if action == "increase":
+                amount = adjustment["amount"]
+                manager.increase_campaign_budget(ad_account_id, campaign_id, amount)
+                results["applied_changes"].append(f"Increased budget by {amount*100}%")
+            elif action == "decrease":
+                amount = adjustment["amount"]
+                manager.decrease_campaign_budget(ad_account_id, campaign_id, amount)
+                results["applied_changes"].append(f"Decreased budget by {amount*100}%")
+        except Exception as e:
+            results["errors"].append(f"Failed to adjust budget: {str(e)}")
+    
+    def _apply_ad_set_actions(
+        self,
+        ad_account_id: str,
+        ad_set_actions: List[Dict[str, Any]],
+        results: Dict[str, List[str]]
+    ) -> None:
+        """Apply ad set actions, recording the outcome in results.
+        
+        Args:
+            ad_account_id: Facebook ad account ID
+            ad_set_actions: Ad set actions from the decision
+            results: Execution results to append applied changes and errors to
+        """
+        applied_append = results["applied_changes"].append
+        errors_append = results["errors"].append
+        manager = self.facebook_ads_manager
+        
+        for ad_set_action in ad_set_actions:
+            try:
+                ad_set_id = ad_set_action["ad_set_id"]
+                action = ad_set_action["action"]
+                amount = ad_set_action.get("amount")
+                
+                if action == "pause":
+                    manager.pause_ad_set(ad_account_id, ad_set_id)
+                    applied_append(f"Paused ad set {ad_set_id}")
+                elif action == "enable":
+                    manager.enable_ad_set(ad_account_id, ad_set_id)
+                    applied_append(f"Enabled ad set {ad_set_id}")
+                elif action == "increase_budget" and amount is not None:
+                    manager.increase_ad_set_budget(ad_account_id, ad_set_id, amount)
+                    applied_append(f"Increased ad set {ad_set_id} budget by {amount*100}%")
+                elif action == "decrease_budget" and amount is not None:
+                    manager.decrease_ad_set_budget(ad_account_id, ad_set_id, amount)
+                    applied_append(f"Decreased ad set {ad_set_id} budget by {amount*100}%")
+            except Exception as e:
+                errors_append(self._AD_SET_ERROR.format(ad_set_action.get("ad_set_id"), e))
+    
+    def evaluate_and_execute_campaign(
+        self,
+        campaign_id: str,
+        ad_account_id: str,
+        auto_apply: bool = False
+    ) -> Dict[str, Any]:
+        """Evaluate a campaign and apply each recommendation as soon as it is generated.
+        
+        The decision is streamed from DeepSeek, so the budget adjustment can be
+        sent to Facebook while the ad set actions are still being generated.
+        
+        Args:
+            campaign_id: Facebook campaign ID
+            ad_account_id: Facebook ad account ID
+            auto_apply: Whether to automatically apply changes
+            
+        Returns:
+            Results of execution, including the full decision
+        """
+        logger.info(self._LOG_EVAL_CAMPAIGN, campaign_id, ad_account_id)
+        
+        try:
+            fields = self.api_connection.stream_evaluate_campaign(
+                **self._get_campaign_context(campaign_id, ad_account_id)
+            )
+            
+            decision = {}
+            results = {"applied_changes": [], "errors": []}
+            for key, value in fields:
+                decision[key] = value
+                if not auto_apply:
+                    continue
+                if key == "budget_adjustment":
+                    self._apply_budget_adjustment(campaign_id, ad_account_id, value, results)
+                elif key == "ad_set_actions":
+                    self._apply_ad_set_actions(ad_account_id, value, results)
+            
+            if "error" in decision:
+                logger.error(self._LOG_EVAL_ERROR, decision["error"])
+                # Changes from complete fields may have been applied already,
+                # but the run must not be reported as a clean success
+                results["errors"].append(decision["error"])
+            
+            if not auto_apply:
+                logger.info(self._LOG_EXEC_PENDING)
+                return {"status": "pending_approval", "decision": decision}
+            
+            logger.info(
+                self._LOG_EXEC_DONE, campaign_id, len(results["applied_changes"]), len(results["errors"])
+            )
+            results["decision"] = decision
+            return results
+        except Exception as e:
+            logger.error(self._LOG_EXEC_ERROR, e)
+            return {"error": f"Error executing decision: {str(e)}"}
+    
+    def get_account_optimization(self, ad_account_id: str, auto_apply: bool = False) -> Dict[str, Any]:
         """Get optimization suggestions for an entire ad account.
         
         Args:
             ad_account_id: Facebook ad account ID
+            auto_apply: Whether to automatically apply the per-campaign decisions
             
         Returns:
             Optimization suggestions for the account
@@ -232,10 +421,6 @@ class AIMediaBuyingAgent:
         logger.info(f"Getting optimization suggestions for account {ad_account_id}")
         
         try:
-            if not self.facebook_ads_manager:
-                logger.error("Facebook Ads manager not initialized")
-                return {"error": "Facebook Ads manager not initialized"}
-            
             # Get account data
             account_data = self.facebook_ads_manager.get_account(ad_account_id)
             
@@ -261,6 +446,17 @@ class AIMediaBuyingAgent:
                 knowledge_base_rules=knowledge_base_rules
             )
             
+            if auto_apply:
+                # Only campaigns that produced a usable decision are executed
+                decisions = {
+                    campaign_id: decision
+                    for campaign_id, decision in suggestions.get("campaigns", {}).items()
+                    if "error" not in decision
+                }
+                suggestions["execution_results"] = self.batch_execute_decisions(
+                    ad_account_id, decisions, auto_apply=True
+                )
+            
             logger.info(f"Successfully generated optimization suggestions for account {ad_account_id}")
             return suggestions
         except Exception as e:
@@ -94,6 +94,9 @@ class KnowledgeProcessor:
             
             with open(self.knowledge_base_path, 'w') as f:
                 json.dump(knowledge_base, f, indent=2)
+            
+            # Keep the in-memory copy in sync with what was written
+            self.knowledge_base = knowledge_base
             logger.info(f"Saved knowledge base with {len(knowledge_base.get('items', []))} items")
             return True
         except Exception as e:
@@ -6,31 +6,65 @@ and storing the information in the knowledge base.
 """
 
 import os
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+import platform
+import re
+import shutil
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple, Union
 import uuid
+from functools import lru_cache, reduce
 
+import numpy as np
 import PyPDF2
+import torch
 from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from sqlalchemy import create_engine, Column, String, Integer, Float, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import create_engine, event, func, or_, text, update, DDL, Column, String, Integer, Float, Boolean, DateTime, ForeignKey, Text, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.dialects.postgresql import UUID, JSONB
+import sentence_transformers
 from sentence_transformers import SentenceTransformer
 import nltk
-from nltk.tokenize import sent_tokenize, word_tokenize
-from datetime import datetime
+try:
+    from blingfire import text_to_sentences
+except ImportError:
+    text_to_sentences = None
+from datetime import datetime, timedelta
 import json
 
+from embedding_cache import EmbeddingCache
+from pdf_extraction import extract_pages_parallel
+from knowledge_index import KnowledgeIndex
+
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Download NLTK resources
-nltk.download('punkt')
-nltk.download('stopwords')
+# Sentence splitting uses blingfire's native splitter when installed. NLTK
+# Punkt is the fallback; its English tokenizer is loaded once instead of
+# going through sent_tokenize's lookup on every call.
+if text_to_sentences is None:
+    nltk.download('punkt')
+    punkt_tokenizer = nltk.data.load('tokenizers/punkt/english.pickle')
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split text into sentences.
+    
+    Args:
+        text: Text to split
+        
+    Returns:
+        List of sentences
+    """
+    if text_to_sentences is None:
+        return punkt_tokenizer.tokenize(text)
+    return [sentence for sentence in text_to_sentences(text).split("\n") if sentence]
 
 # Initialize FastAPI app
 app = FastAPI(title="Document Processor API", 
@@ -47,12 +81,141 @@ app.add_middleware(
 
 # Database setup
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./document_processor.db")
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))
+SEARCH_TOP_K = 20
+SEARCH_KEYWORD_LIMIT = 50
+SEARCH_MIN_SIMILARITY = float(os.getenv("SEARCH_MIN_SIMILARITY", "0.3"))
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 # Initialize sentence transformer model
-model = SentenceTransformer('all-MiniLM-L6-v2')
+def select_embedding_precision():
+    """
+    Pick the device and dtype for the embedding model.
+    
+    Returns:
+        Tuple of (device, torch dtype): FP16 on CUDA, BF16 on CPUs with native
+        BF16 support, and FP32 otherwise
+    """
+    if torch.cuda.is_available():
+        return "cuda", torch.float16
+    
+    try:
+        cpu_bf16 = torch.cpu._is_avx512_bf16_supported()
+    except AttributeError:
+        cpu_bf16 = False
+    
+    return "cpu", torch.bfloat16 if cpu_bf16 else torch.float32
+
+def as_float32(embeddings) -> np.ndarray:
+    """
+    Convert model output to a float32 numpy array.
+    
+    BF16/FP16 models return reduced-precision tensors; downstream code (the
+    embedding cache, float16 storage and the knowledge index) expects float32
+    numpy arrays.
+    
+    Args:
+        embeddings: Tensor or array returned by the embedding model
+        
+    Returns:
+        Float32 numpy array
+    """
+    if isinstance(embeddings, torch.Tensor):
+        embeddings = embeddings.float().cpu().numpy()
+    return np.asarray(embeddings, dtype=np.float32)
+
+def embedding_to_bytes(embedding) -> bytes:
+    """
+    Pack an embedding as float16 bytes for storage.
+    
+    Args:
+        embedding: Embedding vector (list or array of floats)
+        
+    Returns:
+        Raw float16 bytes (2 bytes per dimension)
+    """
+    return np.asarray(embedding, dtype=np.float16).tobytes()
+
+def embedding_from_bytes(data: bytes) -> np.ndarray:
+    """
+    Unpack an embedding stored by embedding_to_bytes.
+    
+    Args:
+        data: Raw float16 bytes
+        
+    Returns:
+        Float32 numpy array
+    """
+    return np.frombuffer(data, dtype=np.float16).astype(np.float32)
+
+def select_quantized_onnx_file() -> str:
+    """
+    Pick the INT8-quantized ONNX export matching the host CPU.
+    
+    Returns:
+        Path of the ONNX file inside the model repository
+    """
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "onnx/model_qint8_arm64.onnx"
+    
+    try:
+        with open("/proc/cpuinfo") as cpuinfo:
+            cpu_flags = cpuinfo.read()
+    except OSError:
+        cpu_flags = ""
+    
+    if "avx512_vnni" in cpu_flags:
+        return "onnx/model_qint8_avx512_vnni.onnx"
+    if "avx512" in cpu_flags:
+        return "onnx/model_qint8_avx512.onnx"
+    return "onnx/model_qint8_avx2.onnx"
+
+def load_embedding_model() -> Tuple[SentenceTransformer, str]:
+    """
+    Load the sentence transformer used for chunk and query embeddings.
+    
+    EMBEDDING_BACKEND=onnx or openvino loads the INT8-quantized export;
+    otherwise, or if that backend is unavailable, the PyTorch model is
+    loaded in the precision chosen by select_embedding_precision.
+    
+    Returns:
+        Tuple of (loaded SentenceTransformer model, variant label naming the
+        backend and precision actually in use)
+    """
+    if EMBEDDING_BACKEND in ("onnx", "openvino"):
+        if EMBEDDING_BACKEND == "openvino":
+            file_name = "openvino/openvino_model_qint8_quantized.xml"
+        else:
+            file_name = select_quantized_onnx_file()
+        try:
+            quantized_model = SentenceTransformer(
+                EMBEDDING_MODEL_NAME,
+                backend=EMBEDDING_BACKEND,
+                model_kwargs={"file_name": file_name}
+            )
+            logger.info(f"Embedding model loaded with {EMBEDDING_BACKEND} backend from {file_name}")
+            return quantized_model, f"{EMBEDDING_BACKEND}:{file_name}"
+        except (TypeError, ImportError, OSError, ValueError) as e:
+            logger.warning(f"Falling back to PyTorch embedding backend: {str(e)}")
+    
+    device, dtype = select_embedding_precision()
+    torch_model = SentenceTransformer(EMBEDDING_MODEL_NAME, device=device)
+    if dtype != torch.float32:
+        torch_model.to(dtype)
+    logger.info(f"Embedding model loaded on {device} with {dtype}")
+    return torch_model, f"torch:{device}:{dtype}"
+
+model, embedding_variant = load_embedding_model()
+# Vectors differ slightly between backends and precisions, so hosts sharing
+# EMBEDDING_CACHE_DIR only share entries produced by the same variant
+embedding_cache = EmbeddingCache(
+    os.getenv("EMBEDDING_CACHE_DIR", "./cache/embeddings"),
+    f"{EMBEDDING_MODEL_NAME}:{embedding_variant}:{sentence_transformers.__version__}"
+)
 
 # Database Models
 class Document(Base):
@@ -77,7 +240,7 @@ class DocumentChunk(Base):
     document_id = Column(String, ForeignKey("documents.id"), nullable=False)
     content = Column(Text, nullable=False)
     chunk_index = Column(Integer, nullable=False)
-    embedding = Column(Text)  # Store as JSON string for now
+    embedding = Column(LargeBinary)  # L2-normalized float16 bytes, see embedding_to_bytes
     metadata = Column(Text)  # Store as JSON string for now
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -101,12 +264,66 @@ class KnowledgeEntry(Base):
     content = Column(Text, nullable=False)
     source_page = Column(Integer, nullable=True)
     confidence_score = Column(Float, default=1.0)
-    embedding = Column(Text)  # Store as JSON string for now
+    embedding = Column(LargeBinary)  # L2-normalized float16 bytes, see embedding_to_bytes
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+# Full-text index over knowledge entry content, kept in sync by triggers on
+# SQLite (FTS5) and by an expression GIN index on PostgreSQL
+KNOWLEDGE_FTS_DDL = {
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS knowledge_entries_fts USING fts5(entry_id UNINDEXED, content)",
+        "CREATE TRIGGER IF NOT EXISTS knowledge_entries_fts_insert AFTER INSERT ON knowledge_entries BEGIN "
+        "INSERT INTO knowledge_entries_fts (entry_id, content) VALUES (new.id, new.content); END",
+        "CREATE TRIGGER IF NOT EXISTS knowledge_entries_fts_delete AFTER DELETE ON knowledge_entries BEGIN "
+        "DELETE FROM knowledge_entries_fts WHERE entry_id = old.id; END",
+        "CREATE TRIGGER IF NOT EXISTS knowledge_entries_fts_update AFTER UPDATE OF content ON knowledge_entries BEGIN "
+        "UPDATE knowledge_entries_fts SET content = new.content WHERE entry_id = old.id; END",
+    ],
+    "postgresql": [
+        "CREATE INDEX IF NOT EXISTS ix_knowledge_entries_content_tsv ON knowledge_entries "
+        "USING gin (to_tsvector('english', content))",
+    ],
+}
+
+for dialect, statements in KNOWLEDGE_FTS_DDL.items():
+    for statement in statements:
+        event.listen(KnowledgeEntry.__table__, "after_create", DDL(statement).execute_if(dialect=dialect))
+event.listen(
+    KnowledgeEntry.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS knowledge_entries_fts").execute_if(dialect="sqlite")
+)
+
+def ensure_keyword_search_index(bind):
+    """
+    Create the keyword search index on databases that predate it.
+    
+    The after_create listeners only fire for a new knowledge_entries table,
+    so existing databases get the (idempotent) DDL here, and on SQLite the
+    FTS table is backfilled from the existing entries.
+    
+    Args:
+        bind: Engine to create the index on
+    """
+    statements = KNOWLEDGE_FTS_DDL.get(bind.dialect.name, [])
+    if not statements:
+        return
+    
+    with bind.begin() as connection:
+        for statement in statements:
+            connection.execute(text(statement))
+        
+        if bind.dialect.name == "sqlite":
+            indexed = connection.execute(text("SELECT count(*) FROM knowledge_entries_fts")).scalar()
+            if not indexed:
+                connection.execute(text(
+                    "INSERT INTO knowledge_entries_fts (entry_id, content) SELECT id, content FROM knowledge_entries"
+                ))
+
 # Create database tables
 Base.metadata.create_all(bind=engine)
+ensure_keyword_search_index(engine)
 
 # Dependency to get database session
 def get_db():
@@ -151,6 +368,10 @@ def extract_text_from_pdf(file_path: str) -> List[Dict[str, Any]]:
     """
     Extract text from a PDF file, returning a list of pages with text content.
     
+    Documents with at least PDF_PARALLEL_MIN_PAGES pages are extracted in a
+    process pool (see pdf_extraction); shorter ones are not worth the worker
+    startup.
+    
     Args:
         file_path: Path to the PDF file
         
@@ -162,26 +383,31 @@ def extract_text_from_pdf(file_path: str) -> List[Dict[str, Any]]:
     try:
         with open(file_path, 'rb') as file:
             reader = PyPDF2.PdfReader(file)
+            page_count = len(reader.pages)
             
-            for i, page in enumerate(reader.pages):
-                text = page.extract_text()
-                if text:
-                    pages.append({
-                        "page_number": i + 1,
-                        "content": text
-                    })
+            if page_count < PDF_PARALLEL_MIN_PAGES:
+                texts = [page.extract_text() for page in reader.pages]
+            else:
+                texts = extract_pages_parallel(file_path, page_count)
+        
+        for i, text in enumerate(texts):
+            if text:
+                pages.append({
+                    "page_number": i + 1,
+                    "content": text
+                })
     except Exception as e:
         logger.error(f"Error extracting text from PDF: {str(e)}")
         raise
         
     return pages
 
-def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+def chunk_text(text: Union[str, List[str]], chunk_size: int = 1000, overlap: int = 200) -> List[str]:
     """
     Split text into chunks of specified size with overlap.
     
     Args:
-        text: Text to chunk
+        text: Text to chunk, or its already tokenized sentences
         chunk_size: Maximum size of each chunk
         overlap: Number of characters to overlap between chunks
         
@@ -189,72 +415,108 @@ def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[st
         List of text chunks
     """
     chunks = []
-    sentences = sent_tokenize(text)
-    current_chunk = []
-    current_size = 0
-    
-    for sentence in sentences:
-        sentence_size = len(sentence)
+    sentences = split_sentences(text) if isinstance(text, str) else text
+    sentence_count = len(sentences)
+    
+    # cum[k] is the total length of the first k sentences, so the size of
+    # sentences[a:b] is cum[b] - cum[a]
+    cum = np.zeros(sentence_count + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, sentences), dtype=np.int64, count=sentence_count), out=cum[1:])
+    
+    start = 0
+    position = 0
+    
+    while position < sentence_count:
+        # First sentence at or after position that no longer fits in the chunk
+        end = max(int(np.searchsorted(cum, cum[start] + chunk_size, side="right")) - 1, position)
+        if end >= sentence_count:
+            break
         
-        if current_size + sentence_size <= chunk_size:
-            current_chunk.append(sentence)
-            current_size += sentence_size
-        else:
-            # Add current chunk to list
-            if current_chunk:
-                chunks.append(" ".join(current_chunk))
-            
-            # Start new chunk with overlap
-            overlap_size = 0
-            overlap_chunk = []
-            
-            # Add sentences from the end of the previous chunk for overlap
-            for s in reversed(current_chunk):
-                if overlap_size + len(s) <= overlap:
-                    overlap_chunk.insert(0, s)
-                    overlap_size += len(s)
-                else:
-                    break
-            
-            current_chunk = overlap_chunk + [sentence]
-            current_size = sum(len(s) for s in current_chunk)
+        # Add current chunk to list
+        if start < end:
+            chunks.append(" ".join(sentences[start:end]))
+        
+        # Start new chunk with the trailing sentences that fit in the overlap
+        start = max(int(np.searchsorted(cum, cum[end] - overlap, side="left")), start)
+        position = end + 1
     
     # Add the last chunk if it's not empty
-    if current_chunk:
-        chunks.append(" ".join(current_chunk))
+    if start < sentence_count:
+        chunks.append(" ".join(sentences[start:]))
     
     return chunks
 
-def create_embeddings(chunks: List[str]) -> List[List[float]]:
+def create_embeddings(chunks: List[str]) -> np.ndarray:
     """
     Create embeddings for text chunks using sentence transformer.
     
+    Embeddings are L2-normalized, so cosine similarity between them is a
+    plain dot product.
+    
     Args:
         chunks: List of text chunks
         
     Returns:
-        List of embeddings (as lists of floats)
+        Float32 array of shape (len(chunks), embedding dimension)
     """
-    embeddings = []
+    if not chunks:
+        return np.empty((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
     
     try:
-        embeddings = model.encode(chunks)
-        # Convert numpy arrays to lists for JSON serialization
-        embeddings = [embedding.tolist() for embedding in embeddings]
+        # Only encode chunks whose content has not been embedded before
+        cached = embedding_cache.get_many(chunks)
+        misses = list(dict.fromkeys(chunk for chunk, vector in zip(chunks, cached) if vector is None))
+        
+        if not misses:
+            return np.vstack(cached)
+        
+        # Encode in length order so each batch pads to similar-sized inputs.
+        # The whole batch comes back to the host in one copy.
+        order = np.argsort([len(chunk) for chunk in misses], kind="stable")
+        sorted_misses = [misses[i] for i in order]
+        sorted_embeddings = as_float32(model.encode(
+            sorted_misses,
+            batch_size=64,
+            show_progress_bar=False,
+            convert_to_tensor=True,
+            normalize_embeddings=True
+        ))
+        embedding_cache.set_many(sorted_misses, sorted_embeddings)
+        
+        # Fill one preallocated array in the caller's order
+        encoded_rows = {chunk: row for row, chunk in enumerate(sorted_misses)}
+        embeddings = np.empty((len(chunks), sorted_embeddings.shape[1]), dtype=np.float32)
+        for i, (chunk, vector) in enumerate(zip(chunks, cached)):
+            embeddings[i] = sorted_embeddings[encoded_rows[chunk]] if vector is None else vector
     except Exception as e:
         logger.error(f"Error creating embeddings: {str(e)}")
         raise
         
     return embeddings
 
-def extract_knowledge(text: str, page_number: int) -> List[Dict[str, Any]]:
+# Knowledge extraction patterns. The trigger pattern uses a lookahead so that
+# overlapping trigger words are all reported, like substring checks would.
+KNOWLEDGE_SECTION_PATTERN = re.compile(r"budget|campaign|ad set", re.IGNORECASE)
+KNOWLEDGE_TRIGGER_PATTERN = re.compile(
+    r"(?=(budget|campaign|ad set|increase|decrease|create|launch|toggle|on|off))",
+    re.IGNORECASE
+)
+
+# (subject, actions, category, title), checked in order; first match wins
+KNOWLEDGE_RULES = [
+    ("budget", {"increase", "decrease"}, "budget_rule", "Budget Adjustment Rule"),
+    ("campaign", {"create", "launch"}, "campaign_rule", "Campaign Creation Rule"),
+    ("ad set", {"on", "off", "toggle"}, "adset_rule", "Ad Set Toggle Rule"),
+]
+
+def extract_knowledge(text: Union[str, List[str]], page_number: int) -> List[Dict[str, Any]]:
     """
     Extract structured knowledge from text.
     This is a simplified version - in a real implementation, 
     this would use more sophisticated NLP techniques.
     
     Args:
-        text: Text to extract knowledge from
+        text: Text to extract knowledge from, or its already tokenized sentences
         page_number: Page number in the source document
         
     Returns:
@@ -265,128 +527,251 @@ def extract_knowledge(text: str, page_number: int) -> List[Dict[str, Any]]:
     # Simple rule-based extraction for demonstration
     # In a real implementation, this would use NER, relation extraction, etc.
     
-    # Look for sections that might contain media buying rules
-    if "budget" in text.lower() or "campaign" in text.lower() or "ad set" in text.lower():
-        # Extract sentences that might contain rules
-        sentences = sent_tokenize(text)
-        for sentence in sentences:
-            lower_sentence = sentence.lower()
-            
-            # Check for budget-related rules
-            if "budget" in lower_sentence and ("increase" in lower_sentence or "decrease" in lower_sentence):
-                knowledge_entries.append({
-                    "category": "budget_rule",
-                    "title": "Budget Adjustment Rule",
-                    "content": sentence,
-                    "source_page": page_number,
-                    "confidence_score": 0.8
-                })
-            
-            # Check for campaign-related rules
-            elif "campaign" in lower_sentence and ("create" in lower_sentence or "launch" in lower_sentence):
-                knowledge_entries.append({
-                    "category": "campaign_rule",
-                    "title": "Campaign Creation Rule",
-                    "content": sentence,
-                    "source_page": page_number,
-                    "confidence_score": 0.8
-                })
-            
-            # Check for ad set-related rules
-            elif "ad set" in lower_sentence and ("on" in lower_sentence or "off" in lower_sentence or "toggle" in lower_sentence):
+    if isinstance(text, str):
+        # Look for sections that might contain media buying rules
+        if not KNOWLEDGE_SECTION_PATTERN.search(text):
+            return knowledge_entries
+        sentences = split_sentences(text)
+    else:
+        sentences = text
+    
+    # Extract sentences that might contain rules
+    for sentence in sentences:
+        triggers = {trigger.lower() for trigger in KNOWLEDGE_TRIGGER_PATTERN.findall(sentence)}
+        
+        for subject, actions, category, title in KNOWLEDGE_RULES:
+            if subject in triggers and not actions.isdisjoint(triggers):
                 knowledge_entries.append({
-                    "category": "adset_rule",
-                    "title": "Ad Set Toggle Rule",
+                    "category": category,
+                    "title": title,
                     "content": sentence,
                     "source_page": page_number,
                     "confidence_score": 0.8
                 })
+                break
     
     return knowledge_entries
 
-async def process_document(document_id: str, file_path: str, db: Session):
+# Keywords that tag a document, mapped to the stored tag name
+DOCUMENT_TAGS = {"budget": "budget", "campaign": "campaign", "ad set": "ad_set"}
+
+def detect_document_tags(pages: List[Dict[str, Any]]) -> List[str]:
+    """
+    Find which document tags apply, scanning each page at most once.
+    
+    Args:
+        pages: Pages returned by extract_text_from_pdf
+        
+    Returns:
+        Tag names in DOCUMENT_TAGS order
+    """
+    found = set()
+    
+    for page in pages:
+        for match in KNOWLEDGE_SECTION_PATTERN.finditer(page["content"]):
+            found.add(match.group().lower())
+            if len(found) == len(DOCUMENT_TAGS):
+                break
+        if len(found) == len(DOCUMENT_TAGS):
+            break
+    
+    return [tag for keyword, tag in DOCUMENT_TAGS.items() if keyword in found]
+
+def process_document(document_id: str, file_path: str):
     """
     Process a document, extract text, create chunks, and store knowledge.
     
+    This is a plain function so BackgroundTasks runs it in the threadpool
+    instead of blocking the event loop. It opens its own database session
+    because the request session is closed once the response is sent.
+    
     Args:
         document_id: ID of the document in the database
         file_path: Path to the document file
-        db: Database session
     """
+    db = SessionLocal()
     try:
-        # Update document status to processing
-        document = db.query(Document).filter(Document.id == document_id).first()
-        if not document:
+        # Mark the document as processing in its own short transaction so
+        # progress is visible while the heavy work below runs
+        result = db.execute(
+            update(Document).where(Document.id == document_id).values(processing_status="processing")
+        )
+        db.commit()
+        if not result.rowcount:
             logger.error(f"Document not found: {document_id}")
             return
         
-        document.processing_status = "processing"
-        db.commit()
-        
         # Extract text from PDF
         pages = extract_text_from_pdf(file_path)
         
-        # Process each page
-        for page in pages:
+        # Tokenize each page once; chunking and knowledge extraction share it
+        page_sentences = [split_sentences(page["content"]) for page in pages]
+        
+        # Chunk every page first so the whole document is embedded in one pass
+        all_chunks = []
+        chunk_meta = []
+        for page, sentences in zip(pages, page_sentences):
             page_number = page["page_number"]
-            text = page["content"]
-            
-            # Create chunks
-            chunks = chunk_text(text)
-            
-            # Create embeddings
-            embeddings = create_embeddings(chunks)
+            for i, chunk in enumerate(chunk_text(sentences)):
+                all_chunks.append(chunk)
+                chunk_meta.append((page_number, i))
+        
+        # Create embeddings, cast to the float16 storage format in one pass
+        embeddings = create_embeddings(all_chunks).astype(np.float16)
+        
+        # Extract knowledge from each page and embed it for semantic search
+        knowledge_entries = [
+            entry
+            for page, sentences in zip(pages, page_sentences)
+            for entry in extract_knowledge(sentences, page["page_number"])
+        ]
+        knowledge_ids = [str(uuid.uuid4()) for _ in knowledge_entries]
+        knowledge_embeddings = create_embeddings([entry["content"] for entry in knowledge_entries])
+        knowledge_embeddings_fp16 = knowledge_embeddings.astype(np.float16)
+        
+        # Write every row and the final status in a single transaction
+        with db.begin():
+            # Store chunks in database with a single multi-row insert
+            db.bulk_insert_mappings(DocumentChunk, [
+                {
+                    "id": str(uuid.uuid4()),
+                    "document_id": document_id,
+                    "content": chunk,
+                    "chunk_index": chunk_index,
+                    "embedding": embedding_to_bytes(embedding),
+                    "metadata": json.dumps({"page_number": page_number})
+                }
+                for chunk, embedding, (page_number, chunk_index) in zip(all_chunks, embeddings, chunk_meta)
+            ])
             
-            # Store chunks in database
-            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                chunk_obj = DocumentChunk(
-                    document_id=document_id,
-                    content=chunk,
-                    chunk_index=i,
-                    embedding=json.dumps(embedding),
-                    metadata=json.dumps({"page_number": page_number})
-                )
-                db.add(chunk_obj)
+            # Store knowledge entries in one insert
+            db.bulk_insert_mappings(KnowledgeEntry, [
+                {
+                    "id": entry_id,
+                    "document_id": document_id,
+                    "category": entry["category"],
+                    "title": entry["title"],
+                    "content": entry["content"],
+                    "source_page": entry["source_page"],
+                    "confidence_score": entry["confidence_score"],
+                    "embedding": embedding_to_bytes(embedding)
+                }
+                for entry_id, entry, embedding in zip(knowledge_ids, knowledge_entries, knowledge_embeddings_fp16)
+            ])
             
-            # Extract knowledge
-            knowledge_entries = extract_knowledge(text, page_number)
+            # Add document tags based on content
+            db.bulk_insert_mappings(DocumentTag, [
+                {"id": str(uuid.uuid4()), "document_id": document_id, "tag": tag, "confidence": 0.9}
+                for tag in detect_document_tags(pages)
+            ])
             
-            # Store knowledge entries in database
-            for entry in knowledge_entries:
-                knowledge_obj = KnowledgeEntry(
-                    document_id=document_id,
-                    category=entry["category"],
-                    title=entry["title"],
-                    content=entry["content"],
-                    source_page=entry["source_page"],
-                    confidence_score=entry["confidence_score"]
-                )
-                db.add(knowledge_obj)
-        
-        # Add document tags based on content
-        all_text = " ".join([page["content"] for page in pages])
-        
-        if "budget" in all_text.lower():
-            db.add(DocumentTag(document_id=document_id, tag="budget", confidence=0.9))
-        
-        if "campaign" in all_text.lower():
-            db.add(DocumentTag(document_id=document_id, tag="campaign", confidence=0.9))
-        
-        if "ad set" in all_text.lower():
-            db.add(DocumentTag(document_id=document_id, tag="ad_set", confidence=0.9))
-        
-        # Update document status to completed
-        document.processing_status = "completed"
-        db.commit()
+            # Update document status to completed
+            db.execute(
+                update(Document).where(Document.id == document_id).values(processing_status="completed")
+            )
+        
+        # Make the new entries searchable once they are committed
+        knowledge_index.add(knowledge_ids, knowledge_embeddings)
         
     except Exception as e:
         logger.error(f"Error processing document: {str(e)}")
+        db.rollback()
         
         # Update document status to failed
-        document = db.query(Document).filter(Document.id == document_id).first()
-        if document:
-            document.processing_status = "failed"
-            db.commit()
+        db.execute(
+            update(Document).where(Document.id == document_id).values(processing_status="failed")
+        )
+        db.commit()
+    finally:
+        db.close()
+
+@lru_cache(maxsize=10000)
+def encode_query(query: str) -> np.ndarray:
+    """
+    Embed a search query, memoizing repeated queries.
+    
+    Args:
+        query: Search query
+        
+    Returns:
+        Read-only, L2-normalized float32 query embedding (shared between
+        cache hits)
+    """
+    embedding = as_float32(model.encode(query, convert_to_tensor=True, normalize_embeddings=True))
+    embedding.setflags(write=False)
+    return embedding
+
+knowledge_index = KnowledgeIndex(model.get_sentence_embedding_dimension())
+
+# Each worker process has its own index; entries written by other workers
+# are picked up by periodic syncs. The overlap re-reads recent entries in
+# case they were committed out of created_at order.
+KNOWLEDGE_INDEX_REFRESH_SECONDS = float(os.getenv("KNOWLEDGE_INDEX_REFRESH_SECONDS", "30"))
+KNOWLEDGE_INDEX_SYNC_OVERLAP = timedelta(minutes=5)
+knowledge_index_lock = threading.Lock()
+knowledge_index_watermark: Optional[datetime] = None
+knowledge_index_synced_at = 0.0
+
+def sync_knowledge_index(db: Session):
+    """
+    Add stored entry embeddings that are missing from the search index.
+    
+    Only entries created since the last sync (minus the overlap) are read,
+    and entries already indexed are skipped.
+    
+    Args:
+        db: Database session
+    """
+    global knowledge_index_watermark, knowledge_index_synced_at
+    
+    # A sync already running in another thread covers this request
+    if not knowledge_index_lock.acquire(blocking=False):
+        return
+    
+    try:
+        query = db.query(KnowledgeEntry.id, KnowledgeEntry.created_at).filter(KnowledgeEntry.embedding.isnot(None))
+        if knowledge_index_watermark is not None:
+            query = query.filter(KnowledgeEntry.created_at >= knowledge_index_watermark - KNOWLEDGE_INDEX_SYNC_OVERLAP)
+        rows = query.all()
+        
+        missing_ids = [row.id for row in rows if row.id not in knowledge_index]
+        if missing_ids:
+            entries = db.query(KnowledgeEntry.id, KnowledgeEntry.embedding).filter(
+                KnowledgeEntry.id.in_(missing_ids)
+            ).all()
+            knowledge_index.add(
+                [entry.id for entry in entries],
+                np.vstack([embedding_from_bytes(entry.embedding) for entry in entries])
+            )
+            logger.info(f"Added {len(entries)} knowledge entries to the search index")
+        
+        if rows:
+            knowledge_index_watermark = max(row.created_at for row in rows)
+        knowledge_index_synced_at = time.monotonic()
+    finally:
+        knowledge_index_lock.release()
+
+@app.on_event("startup")
+def load_knowledge_index():
+    """
+    Load the stored knowledge entry embeddings into the search index.
+    """
+    db = SessionLocal()
+    try:
+        sync_knowledge_index(db)
+        logger.info(f"Search index holds {len(knowledge_index)} knowledge entries")
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def warm_up_embedding_model():
+    """
+    Run a throwaway encode and sentence split so kernel selection, buffer
+    allocation and tokenizer loading happen before the first request.
+    """
+    model.encode(["warmup"] * 16, batch_size=16, show_progress_bar=False)
+    split_sentences("Hello. World.")
+    logger.info("Embedding model warmed up")
 
 # API endpoints
 @app.post("/documents/", response_model=DocumentResponse)
@@ -432,14 +817,15 @@ async def upload_document(
     # Save file
     file_path = f"uploads/{file.filename}"
     with open(file_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
-        document.file_size = len(content)
+        # Copy in 1 MiB blocks on a worker thread so large PDFs are never
+        # fully buffered in memory and the event loop is not blocked
+        await asyncio.to_thread(shutil.copyfileobj, file.file, f, 1 << 20)
+        document.file_size = f.tell()
     
     db.commit()
     
     # Process document in background
-    background_tasks.add_task(process_document, document.id, file_path, db)
+    background_tasks.add_task(process_document, document.id, file_path)
     
     return document
 
@@ -498,35 +884,101 @@ def search_knowledge(query: str, db: Session = Depends(get_db)):
     Returns:
         List of matching knowledge entries
     """
+    # Pick up entries indexed by other workers
+    if time.monotonic() - knowledge_index_synced_at >= KNOWLEDGE_INDEX_REFRESH_SECONDS:
+        sync_knowledge_index(db)
+    
     # Create embedding for query
-    query_embedding = model.encode(query).tolist()
-    
-    # In a real implementation, this would use vector similarity search
-    # For now, we'll use a simple keyword search
-    entries = db.query(KnowledgeEntry).all()
-    
-    # Filter entries that contain the query keywords
-    keywords = query.lower().split()
-    results = []
-    
-    for entry in entries:
-        content_lower = entry.content.lower()
-        if any(keyword in content_lower for keyword in keywords):
-            results.append({
-                "id": entry.id,
-                "document_id": entry.document_id,
-                "category": entry.category,
-                "title": entry.title,
-                "content": entry.content,
-                "source_page": entry.source_page,
-                "confidence_score": entry.confidence_score,
-                "relevance": 0.8  # Placeholder for actual relevance score
-            })
+    query_embedding = encode_query(query)
+    results = {}
+    
+    # Semantic matches from the precomputed entry embeddings
+    similarities = {
+        entry_id: similarity
+        for entry_id, similarity in knowledge_index.search(query_embedding, SEARCH_TOP_K)
+        if similarity >= SEARCH_MIN_SIMILARITY
+    }
+    if similarities:
+        for entry in db.query(KnowledgeEntry).filter(KnowledgeEntry.id.in_(similarities)).all():
+            results[entry.id] = knowledge_search_result(entry, similarities[entry.id])
+    
+    # Keyword matches cover entries that have no embedding to rank them by
+    for entry in keyword_search(db, query):
+        if entry.id not in results:
+            results[entry.id] = knowledge_search_result(entry, 0.8)  # Placeholder relevance
     
     # Sort by relevance
-    results.sort(key=lambda x: x["relevance"], reverse=True)
+    return sorted(results.values(), key=lambda x: x["relevance"], reverse=True)
+
+def keyword_search(db: Session, query: str) -> List[KnowledgeEntry]:
+    """
+    Find knowledge entries without an embedding that contain any of the
+    query keywords.
     
-    return results
+    Entries with an embedding are ranked by semantic search only, so a
+    keyword hit never outranks a real similarity score.
+    
+    Uses the full-text index on SQLite and PostgreSQL, so the lookup costs
+    O(matches) instead of a scan over every entry.
+    
+    Args:
+        db: Database session
+        query: Search query
+        
+    Returns:
+        Up to SEARCH_KEYWORD_LIMIT matching knowledge entries
+    """
+    keywords = re.findall(r"\w+", query.lower())
+    if not keywords:
+        return []
+    
+    dialect = db.get_bind().dialect.name
+    
+    if dialect == "sqlite":
+        # Prefix terms so "budget" still matches "budgets"
+        fts_query = " OR ".join(f'"{keyword}"*' for keyword in keywords)
+        matching_ids = text(
+            "SELECT entry_id FROM knowledge_entries_fts WHERE knowledge_entries_fts MATCH :query"
+        ).bindparams(query=fts_query).columns(entry_id=String)
+        condition = KnowledgeEntry.id.in_(matching_ids)
+    elif dialect == "postgresql":
+        ts_query = reduce(
+            lambda left, right: left.op("||")(right),
+            [func.plainto_tsquery("english", keyword) for keyword in keywords]
+        )
+        condition = func.to_tsvector("english", KnowledgeEntry.content).op("@@")(ts_query)
+    else:
+        condition = or_(*[
+            func.lower(KnowledgeEntry.content).contains(keyword, autoescape=True)
+            for keyword in keywords
+        ])
+    
+    return db.query(KnowledgeEntry).filter(
+        KnowledgeEntry.embedding.is_(None),
+        condition
+    ).limit(SEARCH_KEYWORD_LIMIT).all()
+
+def knowledge_search_result(entry: KnowledgeEntry, relevance: float) -> Dict[str, Any]:
+    """
+    Build a search result for a knowledge entry.
+    
+    Args:
+        entry: Matching knowledge entry
+        relevance: Relevance score of the match
+        
+    Returns:
+        Search result dictionary
+    """
+    return {
+        "id": entry.id,
+        "document_id": entry.document_id,
+        "category": entry.category,
+        "title": entry.title,
+        "content": entry.content,
+        "source_page": entry.source_page,
+        "confidence_score": entry.confidence_score,
+        "relevance": relevance
+    }
 
 if __name__ == "__main__":
     import uvicorn
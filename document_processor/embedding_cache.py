@@ -0,0 +1,84 @@
+"""
+Embedding cache for the document processor.
+
+This module memoizes text-to-embedding mappings on disk, keyed by the SHA-256
+hash of the text, so repeated chunks are only encoded once.
+"""
+
+import hashlib
+import logging
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import diskcache
+except ImportError:  # pragma: no cover - depends on the deployment
+    diskcache = None
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """
+    Content-addressed store of embeddings, kept as float16 bytes.
+    
+    Keys are prefixed with a namespace (model name and version) so that
+    switching models never serves stale vectors.
+    """
+    
+    def __init__(self, directory: str, namespace: str):
+        """
+        Initialize the embedding cache.
+        
+        Args:
+            directory: Directory for the on-disk cache
+            namespace: Prefix identifying the model that produced the vectors
+        """
+        self.namespace = namespace
+        
+        if diskcache is not None:
+            self.store = diskcache.Cache(directory)
+        else:
+            logger.warning("diskcache is not installed, embedding cache will be kept in memory")
+            self.store = {}
+    
+    def key(self, text: str) -> str:
+        """
+        Build the cache key for a piece of text.
+        
+        Args:
+            text: Text that was embedded
+        
+        Returns:
+            Namespaced SHA-256 hex digest of the text
+        """
+        return f"{self.namespace}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+    
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up cached embeddings.
+        
+        Args:
+            texts: Texts to look up
+        
+        Returns:
+            List aligned with texts, holding a float32 vector for each hit and
+            None for each miss
+        """
+        vectors = []
+        for text in texts:
+            data = self.store.get(self.key(text))
+            vectors.append(None if data is None else np.frombuffer(data, dtype=np.float16).astype(np.float32))
+        return vectors
+    
+    def set_many(self, texts: Sequence[str], vectors: Sequence[np.ndarray]):
+        """
+        Store embeddings for texts.
+        
+        Args:
+            texts: Texts that were embedded
+            vectors: Embeddings aligned with texts
+        """
+        for text, vector in zip(texts, vectors):
+            self.store[self.key(text)] = np.asarray(vector, dtype=np.float16).tobytes()
@@ -4,17 +4,29 @@ This module provides functionality for storing and retrieving knowledge extracte
 """
 
 import os
-import json
+import base64
 import logging
+import threading
+import time
+import uuid
+from operator import attrgetter
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
-from sqlalchemy import create_engine, Column, String, Integer, Float, Boolean, DateTime, ForeignKey, Text, func
+import numpy as np
+import orjson
+
+from sqlalchemy import select, insert, update, bindparam, tuple_, Index, Column, String, Integer, Float, Boolean, DateTime, ForeignKey, Text, LargeBinary, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session, relationship
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.orm import relationship, selectinload
 from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.pool import StaticPool
 from pydantic import BaseModel
 from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
@@ -22,62 +34,164 @@ logger = logging.getLogger(__name__)
 
 # Database setup
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./knowledge_base.db")
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def async_database_url(database_url: str) -> str:
+    """
+    Point a database URL at its asyncio driver.
+    
+    Plain sqlite:// and postgresql:// URLs (as used in DATABASE_URL across
+    the project) are mapped to aiosqlite and asyncpg; URLs that already name
+    a driver are left alone.
+    
+    Args:
+        database_url: SQLAlchemy database URL
+        
+    Returns:
+        Database URL using an asyncio driver
+    """
+    scheme, separator, rest = database_url.partition("://")
+    if scheme == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    if scheme in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg://{rest}"
+    return database_url
+
+def create_database_engine(database_url: str):
+    """
+    Create the async SQLAlchemy engine with pooling suited to the database.
+    
+    SQLite (development and tests) shares connections across threads, with a
+    single static connection for in-memory databases. Server databases get a
+    larger pre-pinged, recycled pool; for multi-worker deployments put
+    PgBouncer (port 6432) in front and point DATABASE_URL at it.
+    
+    Args:
+        database_url: SQLAlchemy database URL
+        
+    Returns:
+        SQLAlchemy async engine
+    """
+    database_url = async_database_url(database_url)
+    
+    if database_url.startswith("sqlite"):
+        if database_url.endswith(("://", ":///:memory:")):
+            return create_async_engine(
+                database_url,
+                connect_args={"check_same_thread": False},
+                poolclass=StaticPool
+            )
+        return create_async_engine(database_url, connect_args={"check_same_thread": False})
+    
+    return create_async_engine(
+        database_url,
+        pool_size=20,
+        max_overflow=10,
+        pool_timeout=30,
+        pool_pre_ping=True,
+        pool_recycle=1800
+    )
+
+engine = create_database_engine(DATABASE_URL)
+# Objects stay usable after commit; attribute access can't lazy-load in
+# async code, so endpoints reload what they return
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
+class utc_now(FunctionElement):
+    """
+    Current timestamp evaluated by the database, with sub-second resolution.
+    
+    Rows are ordered and paginated by created_at, so the default must not
+    truncate to whole seconds (SQLite's CURRENT_TIMESTAMP does).
+    """
+    type = DateTime(timezone=True)
+    inherit_cache = True
+
+@compiles(utc_now)
+def compile_utc_now(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+@compiles(utc_now, "postgresql")
+def compile_utc_now_postgresql(element, compiler, **kw):
+    # now() is fixed at transaction start; clock_timestamp() is the wall clock
+    return "clock_timestamp()"
+
+@compiles(utc_now, "sqlite")
+def compile_utc_now_sqlite(element, compiler, **kw):
+    # Millisecond precision, padded to the six fractional digits SQLAlchemy
+    # uses for bound datetimes so stored and bound values compare as text
+    return "(strftime('%Y-%m-%d %H:%M:%f', 'now') || '000')"
+
+def new_id() -> str:
+    """
+    Generate a primary key for a new row.
+    
+    Returns:
+        Random UUID as 32 hex characters (no hyphens)
+    """
+    return uuid.uuid4().hex
+
 # Initialize FastAPI app
 app = FastAPI(title="Knowledge Base API", 
-              description="API for storing and retrieving knowledge for the media buying agent")
+              description="API for storing and retrieving knowledge for the media buying agent",
+              default_response_class=ORJSONResponse)
 
 # Database Models
 class KnowledgeEntry(Base):
     __tablename__ = "knowledge_entries"
+    # (document_id, category) also serves document_id-only filters
+    __table_args__ = (
+        Index("ix_knowledge_entries_document_id_category", "document_id", "category"),
+        # Backs keyset pagination in get_knowledge_entries
+        Index("ix_knowledge_entries_created_at_id", "created_at", "id"),
+    )
     
-    id = Column(String, primary_key=True)
+    id = Column(String, primary_key=True, default=new_id)
     document_id = Column(String, nullable=False)
-    category = Column(String, nullable=False)
+    category = Column(String, nullable=False, index=True)
     title = Column(String, nullable=False)
     content = Column(Text, nullable=False)
     source_page = Column(Integer, nullable=True)
     confidence_score = Column(Float, default=1.0)
-    embedding = Column(Text)  # Store as JSON string
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Shared with the document processor, which writes L2-normalized float16
+    # bytes (see embedding_to_bytes in app.py)
+    embedding = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=utc_now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=utc_now(), onupdate=utc_now(), nullable=False)
     
     tags = relationship("KnowledgeTag", back_populates="knowledge_entry", cascade="all, delete-orphan")
 
 class KnowledgeTag(Base):
     __tablename__ = "knowledge_tags"
     
-    id = Column(String, primary_key=True)
-    entry_id = Column(String, ForeignKey("knowledge_entries.id"), nullable=False)
-    tag = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    id = Column(String, primary_key=True, default=new_id)
+    entry_id = Column(String, ForeignKey("knowledge_entries.id"), nullable=False, index=True)
+    tag = Column(String, nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=utc_now(), nullable=False)
     
     knowledge_entry = relationship("KnowledgeEntry", back_populates="tags")
 
 class KnowledgeRelation(Base):
     __tablename__ = "knowledge_relations"
     
-    id = Column(String, primary_key=True)
-    source_id = Column(String, ForeignKey("knowledge_entries.id"), nullable=False)
-    target_id = Column(String, ForeignKey("knowledge_entries.id"), nullable=False)
-    relation_type = Column(String, nullable=False)
+    id = Column(String, primary_key=True, default=new_id)
+    source_id = Column(String, ForeignKey("knowledge_entries.id"), nullable=False, index=True)
+    target_id = Column(String, ForeignKey("knowledge_entries.id"), nullable=False, index=True)
+    relation_type = Column(String, nullable=False, index=True)
     confidence = Column(Float, default=1.0)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), server_default=utc_now(), nullable=False)
 
 class RuleEntry(Base):
     __tablename__ = "rule_entries"
     
-    id = Column(String, primary_key=True)
+    id = Column(String, primary_key=True, default=new_id)
     knowledge_id = Column(String, ForeignKey("knowledge_entries.id"), nullable=True)
     name = Column(String, nullable=False)
     description = Column(Text, nullable=True)
     priority = Column(Integer, default=0)
-    is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    is_active = Column(Boolean, default=True, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=utc_now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=utc_now(), onupdate=utc_now(), nullable=False)
     
     conditions = relationship("RuleCondition", back_populates="rule", cascade="all, delete-orphan")
     actions = relationship("RuleAction", back_populates="rule", cascade="all, delete-orphan")
@@ -85,37 +199,83 @@ class RuleEntry(Base):
 class RuleCondition(Base):
     __tablename__ = "rule_conditions"
     
-    id = Column(String, primary_key=True)
-    rule_id = Column(String, ForeignKey("rule_entries.id"), nullable=False)
-    condition_type = Column(String, nullable=False)
+    id = Column(String, primary_key=True, default=new_id)
+    rule_id = Column(String, ForeignKey("rule_entries.id"), nullable=False, index=True)
+    condition_type = Column(String, nullable=False, index=True)
     operator = Column(String, nullable=False)
     value = Column(Float, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), server_default=utc_now(), nullable=False)
     
     rule = relationship("RuleEntry", back_populates="conditions")
 
 class RuleAction(Base):
     __tablename__ = "rule_actions"
     
-    id = Column(String, primary_key=True)
-    rule_id = Column(String, ForeignKey("rule_entries.id"), nullable=False)
+    id = Column(String, primary_key=True, default=new_id)
+    rule_id = Column(String, ForeignKey("rule_entries.id"), nullable=False, index=True)
     action_type = Column(String, nullable=False)
     action_value = Column(String, nullable=False)
     priority = Column(Integer, default=0)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), server_default=utc_now(), nullable=False)
     
     rule = relationship("RuleEntry", back_populates="actions")
 
+class RuleSetVersion(Base):
+    __tablename__ = "rule_set_version"
+    
+    # Single row counting rule changes, used to detect changes made by
+    # other workers
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+async def bump_rule_set_version(db: AsyncSession):
+    """
+    Increment the rule set version as part of the current transaction.
+    
+    Args:
+        db: Database session about to commit a rule change
+    """
+    result = await db.execute(update(RuleSetVersion).values(version=RuleSetVersion.version + 1))
+    if result.rowcount == 0:
+        db.add(RuleSetVersion(id=1, version=1))
+
+# Eager-load options so child collections are fetched in one extra query
+# per request instead of one query per row
+ENTRY_LOAD_OPTIONS = (selectinload(KnowledgeEntry.tags),)
+
+# Rows fetched per batch when streaming list responses
+STREAM_BATCH_SIZE = 256
+RULE_LOAD_OPTIONS = (selectinload(RuleEntry.conditions), selectinload(RuleEntry.actions))
+
+# Fixed-shape statements for rule evaluation, built once so each call only
+# binds parameters and hits the engine's compiled statement cache
+ACTIVE_RULES_STATEMENT = select(RuleEntry).where(RuleEntry.is_active == True).options(*RULE_LOAD_OPTIONS)
+ACTIVE_RULES_BY_CONDITION_STATEMENT = ACTIVE_RULES_STATEMENT.join(RuleCondition).where(
+    RuleCondition.condition_type.in_(bindparam("condition_types", expanding=True))
+)
+
+async def bulk_insert(db: AsyncSession, model, mappings: List[Dict[str, Any]]):
+    """
+    Insert rows from plain dictionaries in one executemany.
+    
+    Args:
+        db: Database session
+        model: Mapped class of the rows
+        mappings: Column values of each row
+    """
+    if mappings:
+        await db.execute(insert(model), mappings)
+
 # Create database tables
-Base.metadata.create_all(bind=engine)
+@app.on_event("startup")
+async def create_tables():
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
 
 # Dependency to get database session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 # Pydantic models for API
 class KnowledgeEntryBase(BaseModel):
@@ -202,9 +362,95 @@ class RuleEntryResponse(BaseModel):
     class Config:
         orm_mode = True
 
+def entry_to_dict(entry: KnowledgeEntry) -> Dict[str, Any]:
+    """
+    Convert a knowledge entry to a plain dictionary for orjson serialization.
+    
+    Args:
+        entry: Knowledge entry row
+        
+    Returns:
+        Dictionary with the KnowledgeEntryResponse fields
+    """
+    return {
+        "id": entry.id,
+        "document_id": entry.document_id,
+        "category": entry.category,
+        "title": entry.title,
+        "content": entry.content,
+        "source_page": entry.source_page,
+        "confidence_score": entry.confidence_score,
+        "created_at": entry.created_at,
+        "updated_at": entry.updated_at,
+        "tags": [tag.tag for tag in entry.tags]
+    }
+
+def relation_to_dict(relation: KnowledgeRelation) -> Dict[str, Any]:
+    """
+    Convert a knowledge relation to a plain dictionary for orjson serialization.
+    
+    Args:
+        relation: Knowledge relation row
+        
+    Returns:
+        Dictionary with the KnowledgeRelationResponse fields
+    """
+    return {
+        "id": relation.id,
+        "source_id": relation.source_id,
+        "target_id": relation.target_id,
+        "relation_type": relation.relation_type,
+        "confidence": relation.confidence,
+        "created_at": relation.created_at
+    }
+
+def rule_to_dict(rule: RuleEntry) -> Dict[str, Any]:
+    """
+    Convert a rule and its conditions and actions to a plain dictionary for
+    orjson serialization.
+    
+    Args:
+        rule: Rule row with conditions and actions loaded
+        
+    Returns:
+        Dictionary with the RuleEntryResponse fields
+    """
+    return {
+        "id": rule.id,
+        "knowledge_id": rule.knowledge_id,
+        "name": rule.name,
+        "description": rule.description,
+        "priority": rule.priority,
+        "is_active": rule.is_active,
+        "created_at": rule.created_at,
+        "updated_at": rule.updated_at,
+        "conditions": [
+            {
+                "id": condition.id,
+                "rule_id": condition.rule_id,
+                "condition_type": condition.condition_type,
+                "operator": condition.operator,
+                "value": condition.value,
+                "created_at": condition.created_at
+            }
+            for condition in rule.conditions
+        ],
+        "actions": [
+            {
+                "id": action.id,
+                "rule_id": action.rule_id,
+                "action_type": action.action_type,
+                "action_value": action.action_value,
+                "priority": action.priority,
+                "created_at": action.created_at
+            }
+            for action in rule.actions
+        ]
+    }
+
 # API endpoints for knowledge entries
-@app.post("/knowledge/", response_model=KnowledgeEntryResponse)
-def create_knowledge_entry(entry: KnowledgeEntryCreate, db: Session = Depends(get_db)):
+@app.post("/knowledge/", responses={200: {"model": KnowledgeEntryResponse}})
+async def create_knowledge_entry(entry: KnowledgeEntryCreate, db: AsyncSession = Depends(get_db)):
     """
     Create a new knowledge entry.
     
@@ -214,11 +460,8 @@ def create_knowledge_entry(entry: KnowledgeEntryCreate, db: Session = Depends(ge
     Returns:
         Created knowledge entry
     """
-    import uuid
-    
     # Create knowledge entry
     db_entry = KnowledgeEntry(
-        id=str(uuid.uuid4()),
         document_id=entry.document_id,
         category=entry.category,
         title=entry.title,
@@ -227,91 +470,123 @@ def create_knowledge_entry(entry: KnowledgeEntryCreate, db: Session = Depends(ge
         confidence_score=entry.confidence_score
     )
     db.add(db_entry)
-    db.flush()
-    
-    # Create tags
-    for tag_name in entry.tags:
-        tag = KnowledgeTag(
-            id=str(uuid.uuid4()),
-            entry_id=db_entry.id,
-            tag=tag_name
-        )
-        db.add(tag)
-    
-    db.commit()
-    db.refresh(db_entry)
-    
-    # Convert to response model
-    response = KnowledgeEntryResponse(
-        id=db_entry.id,
-        document_id=db_entry.document_id,
-        category=db_entry.category,
-        title=db_entry.title,
-        content=db_entry.content,
-        source_page=db_entry.source_page,
-        confidence_score=db_entry.confidence_score,
-        created_at=db_entry.created_at,
-        updated_at=db_entry.updated_at,
-        tags=[tag.tag for tag in db_entry.tags]
-    )
+    await db.flush()
+    
+    # Create tags in one multi-row insert
+    await bulk_insert(db, KnowledgeTag, [
+        {"entry_id": db_entry.id, "tag": tag_name}
+        for tag_name in entry.tags
+    ])
+    
+    await db.commit()
+    db_entry = await db.get(KnowledgeEntry, db_entry.id, options=ENTRY_LOAD_OPTIONS, populate_existing=True)
     
-    return response
+    return ORJSONResponse(content=entry_to_dict(db_entry))
 
-@app.get("/knowledge/", response_model=List[KnowledgeEntryResponse])
-def get_knowledge_entries(
+@app.get("/knowledge/", response_class=StreamingResponse, responses={200: {"content": {"application/x-ndjson": {}}}})
+async def get_knowledge_entries(
     document_id: Optional[str] = None,
     category: Optional[str] = None,
     tag: Optional[str] = None,
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    limit: int = 100
 ):
     """
-    Get knowledge entries with optional filtering.
+    Stream knowledge entries with optional filtering, newest first.
+    
+    The response is NDJSON with one entry per line. Pages are
+    keyset-paginated on (created_at, id): when more entries may follow, a
+    final {"next_cursor": ...} line holds the cursor for the next page.
     
     Args:
         document_id: Filter by document ID
         category: Filter by category
         tag: Filter by tag
-        skip: Number of entries to skip
+        cursor: Cursor returned with the previous page
         limit: Maximum number of entries to return
         
     Returns:
-        List of knowledge entries
+        Streaming NDJSON response of knowledge entries
     """
-    query = db.query(KnowledgeEntry)
+    statement = select(KnowledgeEntry).options(*ENTRY_LOAD_OPTIONS)
     
     if document_id:
-        query = query.filter(KnowledgeEntry.document_id == document_id)
+        statement = statement.where(KnowledgeEntry.document_id == document_id)
     
     if category:
-        query = query.filter(KnowledgeEntry.category == category)
+        statement = statement.where(KnowledgeEntry.category == category)
     
     if tag:
-        query = query.join(KnowledgeTag).filter(KnowledgeTag.tag == tag)
-    
-    entries = query.offset(skip).limit(limit).all()
-    
-    # Convert to response models
-    responses = []
-    for entry in entries:
-        responses.append(KnowledgeEntryResponse(
-            id=entry.id,
-            document_id=entry.document_id,
-            category=entry.category,
-            title=entry.title,
-            content=entry.content,
-            source_page=entry.source_page,
-            confidence_score=entry.confidence_score,
-            created_at=entry.created_at,
-            updated_at=entry.updated_at,
-            tags=[tag.tag for tag in entry.tags]
-        ))
-    
-    return responses
-
-@app.get("/knowledge/{entry_id}", response_model=KnowledgeEntryResponse)
-def get_knowledge_entry(entry_id: str, db: Session = Depends(get_db)):
+        statement = statement.join(KnowledgeTag).where(KnowledgeTag.tag == tag)
+    
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        statement = statement.where(
+            tuple_(KnowledgeEntry.created_at, KnowledgeEntry.id) < tuple_(cursor_created_at, cursor_id)
+        )
+    
+    statement = statement.order_by(KnowledgeEntry.created_at.desc(), KnowledgeEntry.id.desc()).limit(limit)
+    
+    return StreamingResponse(stream_ndjson(statement, entry_to_dict, page_size=limit), media_type="application/x-ndjson")
+
+async def stream_ndjson(statement, to_dict, page_size: Optional[int] = None):
+    """
+    Stream the rows of a query as NDJSON, loading them in batches.
+    
+    The body is sent after the request's dependencies have exited, so the
+    stream opens and closes its own session.
+    
+    Args:
+        statement: Select statement for ORM entities
+        to_dict: Function converting a row to a plain dictionary
+        page_size: Page size of a keyset-paginated statement; when a full
+            page is streamed, a trailing next_cursor line is added
+        
+    Yields:
+        NDJSON lines
+    """
+    async with SessionLocal() as db:
+        count = 0
+        row = None
+        rows = await db.stream_scalars(statement.execution_options(yield_per=STREAM_BATCH_SIZE))
+        async for row in rows:
+            count += 1
+            yield orjson.dumps(to_dict(row)) + b"\n"
+        
+        if page_size and count == page_size:
+            yield orjson.dumps({"next_cursor": encode_cursor(row)}) + b"\n"
+
+def encode_cursor(entry: KnowledgeEntry) -> str:
+    """
+    Encode the pagination cursor pointing after a knowledge entry.
+    
+    Args:
+        entry: Last knowledge entry of the current page
+        
+    Returns:
+        URL-safe cursor string
+    """
+    raw = f"{entry.created_at.isoformat()}|{entry.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str):
+    """
+    Decode a pagination cursor.
+    
+    Args:
+        cursor: Cursor produced by encode_cursor
+        
+    Returns:
+        Tuple of (created_at, entry ID)
+    """
+    try:
+        created_at, entry_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+        return datetime.fromisoformat(created_at), entry_id
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@app.get("/knowledge/{entry_id}", responses={200: {"model": KnowledgeEntryResponse}})
+async def get_knowledge_entry(entry_id: str, db: AsyncSession = Depends(get_db)):
     """
     Get a knowledge entry by ID.
     
@@ -321,28 +596,14 @@ def get_knowledge_entry(entry_id: str, db: Session = Depends(get_db)):
     Returns:
         Knowledge entry
     """
-    entry = db.query(KnowledgeEntry).filter(KnowledgeEntry.id == entry_id).first()
+    entry = await db.get(KnowledgeEntry, entry_id, options=ENTRY_LOAD_OPTIONS)
     if not entry:
         raise HTTPException(status_code=404, detail="Knowledge entry not found")
     
-    # Convert to response model
-    response = KnowledgeEntryResponse(
-        id=entry.id,
-        document_id=entry.document_id,
-        category=entry.category,
-        title=entry.title,
-        content=entry.content,
-        source_page=entry.source_page,
-        confidence_score=entry.confidence_score,
-        created_at=entry.created_at,
-        updated_at=entry.updated_at,
-        tags=[tag.tag for tag in entry.tags]
-    )
-    
-    return response
+    return ORJSONResponse(content=entry_to_dict(entry))
 
 @app.delete("/knowledge/{entry_id}")
-def delete_knowledge_entry(entry_id: str, db: Session = Depends(get_db)):
+async def delete_knowledge_entry(entry_id: str, db: AsyncSession = Depends(get_db)):
     """
     Delete a knowledge entry.
     
@@ -352,18 +613,18 @@ def delete_knowledge_entry(entry_id: str, db: Session = Depends(get_db)):
     Returns:
         Success message
     """
-    entry = db.query(KnowledgeEntry).filter(KnowledgeEntry.id == entry_id).first()
+    entry = await db.get(KnowledgeEntry, entry_id, options=ENTRY_LOAD_OPTIONS)
     if not entry:
         raise HTTPException(status_code=404, detail="Knowledge entry not found")
     
-    db.delete(entry)
-    db.commit()
+    await db.delete(entry)
+    await db.commit()
     
     return {"message": "Knowledge entry deleted successfully"}
 
 # API endpoints for knowledge relations
 @app.post("/knowledge/relations/", response_model=KnowledgeRelationResponse)
-def create_knowledge_relation(relation: KnowledgeRelationCreate, db: Session = Depends(get_db)):
+async def create_knowledge_relation(relation: KnowledgeRelationCreate, db: AsyncSession = Depends(get_db)):
     """
     Create a relation between two knowledge entries.
     
@@ -373,40 +634,38 @@ def create_knowledge_relation(relation: KnowledgeRelationCreate, db: Session = D
     Returns:
         Created relation
     """
-    import uuid
+    # Check that source and target entries exist in a single round trip
+    found_ids = set((await db.execute(
+        select(KnowledgeEntry.id).where(KnowledgeEntry.id.in_((relation.source_id, relation.target_id)))
+    )).scalars())
     
-    # Check if source and target entries exist
-    source = db.query(KnowledgeEntry).filter(KnowledgeEntry.id == relation.source_id).first()
-    if not source:
+    if relation.source_id not in found_ids:
         raise HTTPException(status_code=404, detail="Source knowledge entry not found")
     
-    target = db.query(KnowledgeEntry).filter(KnowledgeEntry.id == relation.target_id).first()
-    if not target:
+    if relation.target_id not in found_ids:
         raise HTTPException(status_code=404, detail="Target knowledge entry not found")
     
     # Create relation
     db_relation = KnowledgeRelation(
-        id=str(uuid.uuid4()),
         source_id=relation.source_id,
         target_id=relation.target_id,
         relation_type=relation.relation_type,
         confidence=relation.confidence
     )
     db.add(db_relation)
-    db.commit()
-    db.refresh(db_relation)
+    await db.commit()
+    await db.refresh(db_relation)
     
     return db_relation
 
-@app.get("/knowledge/relations/", response_model=List[KnowledgeRelationResponse])
-def get_knowledge_relations(
+@app.get("/knowledge/relations/", response_class=StreamingResponse, responses={200: {"content": {"application/x-ndjson": {}}}})
+async def get_knowledge_relations(
     source_id: Optional[str] = None,
     target_id: Optional[str] = None,
-    relation_type: Optional[str] = None,
-    db: Session = Depends(get_db)
+    relation_type: Optional[str] = None
 ):
     """
-    Get knowledge relations with optional filtering.
+    Stream knowledge relations with optional filtering.
     
     Args:
         source_id: Filter by source entry ID
@@ -414,25 +673,24 @@ def get_knowledge_relations(
         relation_type: Filter by relation type
         
     Returns:
-        List of relations
+        Streaming NDJSON response of relations, one per line
     """
-    query = db.query(KnowledgeRelation)
+    statement = select(KnowledgeRelation)
     
     if source_id:
-        query = query.filter(KnowledgeRelation.source_id == source_id)
+        statement = statement.where(KnowledgeRelation.source_id == source_id)
     
     if target_id:
-        query = query.filter(KnowledgeRelation.target_id == target_id)
+        statement = statement.where(KnowledgeRelation.target_id == target_id)
     
     if relation_type:
-        query = query.filter(KnowledgeRelation.relation_type == relation_type)
+        statement = statement.where(KnowledgeRelation.relation_type == relation_type)
     
-    relations = query.all()
-    return relations
+    return StreamingResponse(stream_ndjson(statement, relation_to_dict), media_type="application/x-ndjson")
 
 # API endpoints for rules
 @app.post("/rules/", response_model=RuleEntryResponse)
-def create_rule(rule: RuleEntryCreate, db: Session = Depends(get_db)):
+async def create_rule(rule: RuleEntryCreate, db: AsyncSession = Depends(get_db)):
     """
     Create a new rule with conditions and actions.
     
@@ -442,17 +700,14 @@ def create_rule(rule: RuleEntryCreate, db: Session = Depends(get_db)):
     Returns:
         Created rule
     """
-    import uuid
-    
     # Check if knowledge entry exists if provided
     if rule.knowledge_id:
-        knowledge = db.query(KnowledgeEntry).filter(KnowledgeEntry.id == rule.knowledge_id).first()
+        knowledge = await db.get(KnowledgeEntry, rule.knowledge_id)
         if not knowledge:
             raise HTTPException(status_code=404, detail="Knowledge entry not found")
     
     # Create rule
     db_rule = RuleEntry(
-        id=str(uuid.uuid4()),
         knowledge_id=rule.knowledge_id,
         name=rule.name,
         description=rule.description,
@@ -460,41 +715,42 @@ def create_rule(rule: RuleEntryCreate, db: Session = Depends(get_db)):
         is_active=rule.is_active
     )
     db.add(db_rule)
-    db.flush()
-    
-    # Create conditions
-    for condition in rule.conditions:
-        db_condition = RuleCondition(
-            id=str(uuid.uuid4()),
-            rule_id=db_rule.id,
-            condition_type=condition.condition_type,
-            operator=condition.operator,
-            value=condition.value
-        )
-        db.add(db_condition)
-    
-    # Create actions
-    for action in rule.actions:
-        db_action = RuleAction(
-            id=str(uuid.uuid4()),
-            rule_id=db_rule.id,
-            action_type=action.action_type,
-            action_value=action.action_value,
-            priority=action.priority
-        )
-        db.add(db_action)
-    
-    db.commit()
-    db.refresh(db_rule)
-    
-    return db_rule
+    await db.flush()
+    
+    # Create conditions in one multi-row insert
+    await bulk_insert(db, RuleCondition, [
+        {
+            "rule_id": db_rule.id,
+            "condition_type": condition.condition_type,
+            "operator": condition.operator,
+            "value": condition.value
+        }
+        for condition in rule.conditions
+    ])
+    
+    # Create actions in one multi-row insert
+    await bulk_insert(db, RuleAction, [
+        {
+            "rule_id": db_rule.id,
+            "action_type": action.action_type,
+            "action_value": action.action_value,
+            "priority": action.priority
+        }
+        for action in rule.actions
+    ])
+    
+    await bump_rule_set_version(db)
+    await db.commit()
+    invalidate_rule_cache()
+    
+    return await db.get(RuleEntry, db_rule.id, options=RULE_LOAD_OPTIONS, populate_existing=True)
 
-@app.get("/rules/", response_model=List[RuleEntryResponse])
-def get_rules(
+@app.get("/rules/", responses={200: {"model": List[RuleEntryResponse]}})
+async def get_rules(
     is_active: Optional[bool] = None,
     condition_type: Optional[str] = None,
     action_type: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get rules with optional filtering.
@@ -507,22 +763,22 @@ def get_rules(
     Returns:
         List of rules
     """
-    query = db.query(RuleEntry)
+    statement = select(RuleEntry).options(*RULE_LOAD_OPTIONS)
     
     if is_active is not None:
-        query = query.filter(RuleEntry.is_active == is_active)
+        statement = statement.where(RuleEntry.is_active == is_active)
     
     if condition_type:
-        query = query.join(RuleCondition).filter(RuleCondition.condition_type == condition_type)
+        statement = statement.join(RuleCondition).where(RuleCondition.condition_type == condition_type)
     
     if action_type:
-        query = query.join(RuleAction).filter(RuleAction.action_type == action_type)
+        statement = statement.join(RuleAction).where(RuleAction.action_type == action_type)
     
-    rules = query.order_by(RuleEntry.priority.desc()).all()
-    return rules
+    rules = (await db.execute(statement.order_by(RuleEntry.priority.desc()))).scalars().all()
+    return ORJSONResponse(content=[rule_to_dict(rule) for rule in rules])
 
 @app.get("/rules/{rule_id}", response_model=RuleEntryResponse)
-def get_rule(rule_id: str, db: Session = Depends(get_db)):
+async def get_rule(rule_id: str, db: AsyncSession = Depends(get_db)):
     """
     Get a rule by ID.
     
@@ -532,14 +788,14 @@ def get_rule(rule_id: str, db: Session = Depends(get_db)):
     Returns:
         Rule
     """
-    rule = db.query(RuleEntry).filter(RuleEntry.id == rule_id).first()
+    rule = await db.get(RuleEntry, rule_id, options=RULE_LOAD_OPTIONS)
     if not rule:
         raise HTTPException(status_code=404, detail="Rule not found")
     
     return rule
 
 @app.put("/rules/{rule_id}/toggle", response_model=RuleEntryResponse)
-def toggle_rule(rule_id: str, is_active: bool, db: Session = Depends(get_db)):
+async def toggle_rule(rule_id: str, is_active: bool, db: AsyncSession = Depends(get_db)):
     """
     Toggle a rule's active status.
     
@@ -550,18 +806,19 @@ def toggle_rule(rule_id: str, is_active: bool, db: Session = Depends(get_db)):
     Returns:
         Updated rule
     """
-    rule = db.query(RuleEntry).filter(RuleEntry.id == rule_id).first()
+    rule = await db.get(RuleEntry, rule_id)
     if not rule:
         raise HTTPException(status_code=404, detail="Rule not found")
     
     rule.is_active = is_active
-    db.commit()
-    db.refresh(rule)
+    await bump_rule_set_version(db)
+    await db.commit()
+    invalidate_rule_cache()
     
-    return rule
+    return await db.get(RuleEntry, rule_id, options=RULE_LOAD_OPTIONS, populate_existing=True)
 
 @app.delete("/rules/{rule_id}")
-def delete_rule(rule_id: str, db: Session = Depends(get_db)):
+async def delete_rule(rule_id: str, db: AsyncSession = Depends(get_db)):
     """
     Delete a rule.
     
@@ -571,92 +828,205 @@ def delete_rule(rule_id: str, db: Session = Depends(get_db)):
     Returns:
         Success message
     """
-    rule = db.query(RuleEntry).filter(RuleEntry.id == rule_id).first()
+    rule = await db.get(RuleEntry, rule_id, options=RULE_LOAD_OPTIONS)
     if not rule:
         raise HTTPException(status_code=404, detail="Rule not found")
     
-    db.delete(rule)
-    db.commit()
+    await db.delete(rule)
+    await bump_rule_set_version(db)
+    await db.commit()
+    invalidate_rule_cache()
     
     return {"message": "Rule deleted successfully"}
 
-# API endpoints for rule evaluation
-@app.post("/rules/evaluate")
-def evaluate_rules(
-    metrics: Dict[str, float],
-    condition_types: Optional[List[str]] = Query(None),
-    db: Session = Depends(get_db)
-):
+# Comparison ufuncs for rule condition operators; a condition's op code is
+# the operator's position in this mapping
+CONDITION_OPERATORS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "=": np.equal,
+}
+OPERATOR_CODES = {op: code for code, op in enumerate(CONDITION_OPERATORS)}
+
+class RuleMatrix:
     """
-    Evaluate rules against provided metrics.
+    Active rules flattened into NumPy arrays for vectorized evaluation.
     
-    Args:
-        metrics: Dictionary of metric values (e.g., {"CPA": 10.5, "CTR": 0.02})
-        condition_types: Optional list of condition types to filter rules
-        
-    Returns:
-        List of triggered rules and their actions
+    Rules are kept in descending priority order, so evaluation results
+    need no sorting. Conditions are stored rule by rule: rule i owns
+    conditions rule_offsets[i]:rule_offsets[i] + condition_counts[i].
     """
-    # Get active rules
-    query = db.query(RuleEntry).filter(RuleEntry.is_active == True)
-    
-    # Filter by condition types if provided
-    if condition_types:
-        query = query.join(RuleCondition).filter(RuleCondition.condition_type.in_(condition_types))
     
-    rules = query.all()
-    
-    # Evaluate rules
-    triggered_rules = []
-    
-    for rule in rules:
-        # Check if all conditions are met
-        conditions_met = True
+    def __init__(self, rules: List[RuleEntry]):
+        """
+        Flatten rules and precompute their evaluation results.
         
-        for condition in rule.conditions:
-            # Skip if metric not provided
-            if condition.condition_type not in metrics:
-                conditions_met = False
-                break
-            
-            metric_value = metrics[condition.condition_type]
-            
-            # Evaluate condition
-            if condition.operator == ">" and not (metric_value > condition.value):
-                conditions_met = False
-                break
-            elif condition.operator == ">=" and not (metric_value >= condition.value):
-                conditions_met = False
-                break
-            elif condition.operator == "<" and not (metric_value < condition.value):
-                conditions_met = False
-                break
-            elif condition.operator == "<=" and not (metric_value <= condition.value):
-                conditions_met = False
-                break
-            elif condition.operator == "=" and not (metric_value == condition.value):
-                conditions_met = False
-                break
+        Args:
+            rules: Rules with conditions and actions loaded
+        """
+        self.metric_names: Dict[str, int] = {}
+        metric_indices = []
+        thresholds = []
+        op_codes = []
+        condition_counts = []
+        self.results = []
         
-        # If all conditions are met, add rule to triggered rules
-        if conditions_met:
-            triggered_rules.append({
+        # Priorities are fixed while the matrix is cached, so sort once here
+        # (stable, keeping load order among equal priorities)
+        for rule in sorted(rules, key=attrgetter("priority"), reverse=True):
+            for condition in rule.conditions:
+                metric_indices.append(self.metric_names.setdefault(condition.condition_type, len(self.metric_names)))
+                thresholds.append(condition.value)
+                op_codes.append(OPERATOR_CODES.get(condition.operator, -1))
+            condition_counts.append(len(rule.conditions))
+            
+            self.results.append({
                 "rule_id": rule.id,
                 "name": rule.name,
                 "description": rule.description,
                 "priority": rule.priority,
-                "actions": [
+                "actions": tuple(
                     {
                         "action_type": action.action_type,
                         "action_value": action.action_value,
                         "priority": action.priority
                     }
-                    for action in sorted(rule.actions, key=lambda a: a.priority, reverse=True)
-                ]
+                    for action in sorted(rule.actions, key=attrgetter("priority"), reverse=True)
+                )
             })
+        
+        self.metric_indices = np.array(metric_indices, dtype=np.int32)
+        self.thresholds = np.array(thresholds, dtype=np.float64)
+        self.op_codes = np.array(op_codes, dtype=np.int8)
+        self.condition_counts = np.array(condition_counts, dtype=np.int32)
+        self.rule_offsets = np.zeros(len(rules), dtype=np.int32)
+        if len(rules):
+            np.cumsum(self.condition_counts[:-1], out=self.rule_offsets[1:])
+    
+    def evaluate(self, metrics: Dict[str, float]) -> List[Dict[str, Any]]:
+        """
+        Evaluate every rule against the metrics in a few vectorized passes.
+        
+        Args:
+            metrics: Dictionary of metric values
+            
+        Returns:
+            Triggered rule results, in descending priority order
+        """
+        if not self.results:
+            return []
+        
+        # Dense metric vector aligned with metric_names; missing metrics fail
+        values = np.zeros(len(self.metric_names), dtype=np.float64)
+        present = np.zeros(len(self.metric_names), dtype=bool)
+        for name, index in self.metric_names.items():
+            if name in metrics:
+                values[index] = metrics[name]
+                present[index] = True
+        
+        condition_values = values[self.metric_indices]
+        condition_met = np.select(
+            [self.op_codes == code for code in range(len(CONDITION_OPERATORS))],
+            [compare(condition_values, self.thresholds) for compare in CONDITION_OPERATORS.values()],
+            default=False
+        ) & present[self.metric_indices]
+        
+        # A rule triggers when all its conditions are met; rules without
+        # conditions always trigger
+        triggered = np.ones(len(self.results), dtype=bool)
+        has_conditions = self.condition_counts > 0
+        if has_conditions.any():
+            triggered[has_conditions] = np.logical_and.reduceat(condition_met, self.rule_offsets[has_conditions])
+        
+        return [self.results[i] for i in np.flatnonzero(triggered)]
+
+# Seconds a cached rule matrix is trusted before re-checking the rule table
+# for changes made by other workers
+RULE_CACHE_REVALIDATE_SECONDS = float(os.getenv("RULE_CACHE_REVALIDATE_SECONDS", "5"))
+
+# Rule matrices keyed by the condition type filter, with the rule set
+# version they were built from and when it was last checked
+rule_matrix_cache: Dict[Optional[frozenset], Any] = {}
+rule_cache_lock = threading.Lock()
+rules_version = 0
+
+def invalidate_rule_cache():
+    """
+    Drop cached rule matrices after rules change in this process.
+    """
+    global rules_version
     
-    # Sort triggered rules by priority
-    triggered_rules.sort(key=lambda r: r["priority"], reverse=True)
+    with rule_cache_lock:
+        rules_version += 1
+        rule_matrix_cache.clear()
+
+async def get_rule_matrix(db: AsyncSession, condition_types: Optional[List[str]]) -> RuleMatrix:
+    """
+    Get the rule matrix for a condition type filter.
+    
+    Cached matrices are served without touching the database. Rule changes
+    in this process invalidate the cache immediately; changes made by other
+    workers are picked up by a rule set version check at most every
+    RULE_CACHE_REVALIDATE_SECONDS.
+    
+    Args:
+        db: Database session
+        condition_types: Optional list of condition types to filter rules
+        
+    Returns:
+        Rule matrix over the matching active rules
+    """
+    key = frozenset(condition_types) if condition_types else None
+    
+    with rule_cache_lock:
+        version = rules_version
+        cached = rule_matrix_cache.get(key)
+    
+    now = time.monotonic()
+    if cached and now - cached[1] < RULE_CACHE_REVALIDATE_SECONDS:
+        return cached[2]
+    
+    fingerprint = (await db.execute(select(RuleSetVersion.version))).scalar() or 0
+    
+    if cached and cached[0] == fingerprint:
+        matrix = cached[2]
+    else:
+        # Get active rules, filtered by condition types if provided
+        if condition_types:
+            result = await db.execute(ACTIVE_RULES_BY_CONDITION_STATEMENT, {"condition_types": condition_types})
+        else:
+            result = await db.execute(ACTIVE_RULES_STATEMENT)
+        
+        matrix = RuleMatrix(result.scalars().unique().all())
+    
+    with rule_cache_lock:
+        # Don't cache a matrix built from rules that changed meanwhile
+        if version == rules_version:
+            rule_matrix_cache[key] = (fingerprint, now, matrix)
+    
+    return matrix
+
+# API endpoints for rule evaluation
+@app.post("/rules/evaluate")
+async def evaluate_rules(
+    metrics: Dict[str, float],
+    condition_types: Optional[List[str]] = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Evaluate rules against provided metrics.
+    
+    Args:
+        metrics: Dictionary of metric values (e.g., {"CPA": 10.5, "CTR": 0.02})
+        condition_types: Optional list of condition types to filter rules
+        
+    Returns:
+        List of triggered rules and their actions
+    """
+    # Results come back in descending priority order
+    triggered_rules = (await get_rule_matrix(db, condition_types)).evaluate(metrics)
     
     return {
         "triggered_rules": triggered_rules,
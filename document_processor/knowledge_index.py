@@ -0,0 +1,117 @@
+"""
+In-memory vector index over knowledge entry embeddings.
+
+Entry embeddings are computed once at ingest time; this index keeps them in
+memory so semantic search is a top-k lookup instead of a table scan. FAISS
+HNSW is used when installed, with an exact numpy search as the fallback.
+
+All vectors are expected to be L2-normalized, so the inner product used for
+ranking is the cosine similarity.
+"""
+
+import logging
+import threading
+from typing import List, Sequence, Set, Tuple
+
+import numpy as np
+
+try:
+    import faiss
+except ImportError:  # pragma: no cover - depends on the deployment
+    faiss = None
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+class KnowledgeIndex:
+    """
+    Top-k nearest neighbour index mapping embeddings to knowledge entry IDs.
+    """
+    
+    def __init__(self, dimension: int, hnsw_neighbors: int = 32):
+        """
+        Initialize the knowledge index.
+        
+        Args:
+            dimension: Embedding dimension
+            hnsw_neighbors: Graph degree of the HNSW index (FAISS only)
+        """
+        self.dimension = dimension
+        self.entry_ids: List[str] = []
+        self.known_ids: Set[str] = set()
+        self.lock = threading.Lock()
+        
+        if faiss is not None:
+            self.index = faiss.IndexHNSWFlat(dimension, hnsw_neighbors, faiss.METRIC_INNER_PRODUCT)
+        else:
+            logger.warning("faiss is not installed, knowledge search will use exact numpy search")
+            self.index = None
+            self.vectors = np.empty((0, dimension), dtype=np.float32)
+    
+    def __len__(self) -> int:
+        return len(self.entry_ids)
+    
+    def __contains__(self, entry_id: str) -> bool:
+        return entry_id in self.known_ids
+    
+    def add(self, entry_ids: Sequence[str], vectors: np.ndarray):
+        """
+        Add entry embeddings to the index, skipping entries already indexed.
+        
+        Args:
+            entry_ids: Knowledge entry IDs
+            vectors: Embeddings aligned with entry_ids, shape (n, dimension)
+        """
+        if not len(entry_ids):
+            return
+        
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        
+        with self.lock:
+            new_positions = [i for i, entry_id in enumerate(entry_ids) if entry_id not in self.known_ids]
+            if not new_positions:
+                return
+            if len(new_positions) < len(entry_ids):
+                entry_ids = [entry_ids[i] for i in new_positions]
+                vectors = np.ascontiguousarray(vectors[new_positions])
+            
+            if self.index is not None:
+                self.index.add(vectors)
+            else:
+                self.vectors = np.vstack([self.vectors, vectors])
+            self.entry_ids.extend(entry_ids)
+            self.known_ids.update(entry_ids)
+    
+    def search(self, query_vector: np.ndarray, k: int = 20) -> List[Tuple[str, float]]:
+        """
+        Find the entries most similar to a query embedding.
+        
+        Args:
+            query_vector: L2-normalized query embedding
+            k: Maximum number of results
+        
+        Returns:
+            List of (entry ID, cosine similarity), most similar first
+        """
+        query = np.ascontiguousarray(query_vector, dtype=np.float32).reshape(1, self.dimension)
+        
+        with self.lock:
+            if not self.entry_ids:
+                return []
+            
+            k = min(k, len(self.entry_ids))
+            
+            if self.index is not None:
+                similarities, positions = self.index.search(query, k)
+                similarities, positions = similarities[0], positions[0]
+            else:
+                all_similarities = self.vectors @ query[0]
+                positions = np.argpartition(-all_similarities, k - 1)[:k]
+                positions = positions[np.argsort(-all_similarities[positions])]
+                similarities = all_similarities[positions]
+            
+            return [
+                (self.entry_ids[position], float(similarity))
+                for position, similarity in zip(positions, similarities)
+                if position >= 0
+            ]
@@ -0,0 +1,86 @@
+"""
+Parallel PDF text extraction for the document processor.
+
+Page extraction runs in worker processes. This module only depends on
+PyPDF2 so the workers stay light: they never import the FastAPI app, the
+embedding model or the database models.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import PyPDF2
+
+# Reader for the document being extracted, parsed once per worker process
+worker_reader: Optional[PyPDF2.PdfReader] = None
+
+def open_worker_pdf(file_path: str):
+    """
+    Parse the PDF in a worker process before it extracts any pages.
+    
+    Args:
+        file_path: Path to the PDF file
+    """
+    global worker_reader
+    worker_reader = PyPDF2.PdfReader(file_path)
+
+def extract_worker_page(page_index: int) -> str:
+    """
+    Extract the text of a single page of the worker's PDF.
+    
+    Args:
+        page_index: Zero-based index of the page
+    
+    Returns:
+        Text content of the page (may be empty)
+    """
+    return worker_reader.pages[page_index].extract_text()
+
+def pool_context():
+    """
+    Pick the multiprocessing context for extraction workers.
+    
+    The caller has loaded torch and runs OpenMP and web server threads, so
+    forking it directly risks deadlocks. forkserver forks workers from a
+    clean single-threaded server process; spawn is the fallback where
+    forkserver is unavailable.
+    
+    Returns:
+        Multiprocessing context
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["pdf_extraction"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+def extract_pages_parallel(file_path: str, page_count: int, max_workers: int = 4) -> List[str]:
+    """
+    Extract the text of every page of a PDF in a process pool.
+    
+    Each worker parses the PDF once, then extracts its share of the pages.
+    
+    Args:
+        file_path: Path to the PDF file
+        page_count: Number of pages in the PDF
+        max_workers: Maximum number of worker processes
+    
+    Returns:
+        Page texts in page order
+    """
+    workers = max(1, min(os.cpu_count() or 1, max_workers, page_count))
+    
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=pool_context(),
+        initializer=open_worker_pdf,
+        initargs=(file_path,)
+    ) as executor:
+        # map preserves page order; chunks cut per-page IPC round trips
+        return list(executor.map(
+            extract_worker_page,
+            range(page_count),
+            chunksize=max(1, page_count // (workers * 4))
+        ))
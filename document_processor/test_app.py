@@ -5,13 +5,17 @@ Test module for the document processor application.
 import os
 import pytest
 import json
+import numpy as np
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from app import app, Base, get_db, Document, DocumentChunk, KnowledgeEntry
 from app import extract_text_from_pdf, chunk_text, create_embeddings, extract_knowledge
+from app import embedding_to_bytes, embedding_from_bytes, detect_document_tags
+from embedding_cache import EmbeddingCache
+from knowledge_index import KnowledgeIndex
 
 # Create test database
 TEST_DATABASE_URL = "sqlite:///./test.db"
@@ -20,7 +24,22 @@ engine = create_engine(
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
 )
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+TestingSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=engine,
+    join_transaction_mode="create_savepoint"
+)
+
+# The sqlite3 driver defers BEGIN and mishandles SAVEPOINT; let SQLAlchemy
+# emit BEGIN itself so each test's savepoints nest inside its transaction
+@event.listens_for(engine, "connect")
+def disable_driver_transactions(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+
+@event.listens_for(engine, "begin")
+def emit_begin(connection):
+    connection.exec_driver_sql("BEGIN")
 
 # Create test client
 client = TestClient(app)
@@ -36,14 +55,26 @@ def override_get_db():
 app.dependency_overrides[get_db] = override_get_db
 
 # Setup and teardown
-@pytest.fixture(scope="function")
-def setup_database():
-    # Create tables
+@pytest.fixture(scope="session")
+def database_schema():
+    # Create tables once for the whole run
     Base.metadata.create_all(bind=engine)
     yield
     # Drop tables
     Base.metadata.drop_all(bind=engine)
 
+@pytest.fixture(scope="function")
+def setup_database(database_schema):
+    # Run the test inside a transaction that is rolled back afterwards;
+    # session commits only release savepoints within it
+    connection = engine.connect()
+    transaction = connection.begin()
+    TestingSessionLocal.configure(bind=connection)
+    yield
+    TestingSessionLocal.configure(bind=engine)
+    transaction.rollback()
+    connection.close()
+
 @pytest.fixture
 def sample_pdf_path():
     # Create a sample PDF for testing
@@ -67,6 +98,13 @@ def test_chunk_text():
     for chunk in chunks:
         assert len(chunk) <= 100 + 20  # Allow for some flexibility due to sentence boundaries
 
+def test_chunk_text_overlap():
+    """Test chunk boundaries and sentence overlap on pre-tokenized sentences."""
+    sentences = ["aaaa", "bbbb", "cccc", "dddd"]
+    chunks = chunk_text(sentences, chunk_size=10, overlap=4)
+    
+    assert chunks == ["aaaa bbbb", "bbbb cccc", "cccc dddd"]
+
 def test_extract_knowledge():
     """Test knowledge extraction from text."""
     # Test with text containing budget rules
@@ -85,11 +123,79 @@ def test_extract_knowledge():
     assert len(knowledge) > 0
     assert any(entry["category"] == "adset_rule" for entry in knowledge)
 
+@pytest.fixture
+def encoded_chunks(tmp_path, monkeypatch):
+    """Mock the embedding model and cache, recording every encoded chunk."""
+    encoded = []
+    
+    # Mock the embedding model to encode each chunk as its length
+    def mock_encode(chunks, **kwargs):
+        encoded.extend(chunks)
+        return np.array([[float(len(chunk))] for chunk in chunks])
+    
+    monkeypatch.setattr("app.model.encode", mock_encode)
+    monkeypatch.setattr("app.embedding_cache", EmbeddingCache(str(tmp_path), "test"))
+    return encoded
+
+def test_create_embeddings_preserves_order(encoded_chunks):
+    """Test that length-sorted encoding returns embeddings in input order."""
+    chunks = ["medium chunk", "a", "the longest chunk of them all", "ab"]
+    embeddings = create_embeddings(chunks)
+    
+    assert embeddings.tolist() == [[float(len(chunk))] for chunk in chunks]
+
+def test_create_embeddings_uses_cache(encoded_chunks):
+    """Test that previously embedded chunks are not encoded again."""
+    create_embeddings(["header", "first page"])
+    embeddings = create_embeddings(["header", "second page", "header"])
+    
+    assert embeddings.tolist() == [[6.0], [11.0], [6.0]]
+    assert encoded_chunks == ["header", "first page", "second page"]
+
+def test_embedding_bytes_round_trip():
+    """Test that embeddings are packed as float16 and unpacked losslessly at that precision."""
+    embedding = [0.5, -0.25, 0.125]
+    data = embedding_to_bytes(embedding)
+    
+    assert len(data) == 2 * len(embedding)
+    assert embedding_from_bytes(data).tolist() == embedding
+
+def test_detect_document_tags():
+    """Test document tag detection across pages."""
+    pages = [
+        {"page_number": 1, "content": "Launch a new Campaign each week."},
+        {"page_number": 2, "content": "Turn the ad set off when the budget runs out."}
+    ]
+    
+    assert detect_document_tags(pages) == ["budget", "campaign", "ad_set"]
+    assert detect_document_tags(pages[:1]) == ["campaign"]
+
+def test_knowledge_index_search():
+    """Test that the knowledge index returns the nearest entries first."""
+    index = KnowledgeIndex(3)
+    assert index.search(np.ones(3)) == []
+    
+    index.add(["budget", "campaign", "ad_set"], np.eye(3))
+    results = index.search(np.array([0.0, 1.0, 0.0]), k=2)
+    
+    assert results[0] == ("campaign", pytest.approx(1.0))
+    assert results[1][1] == pytest.approx(0.0)
+
+def test_knowledge_index_skips_known_entries():
+    """Test that re-adding indexed entries leaves the index unchanged."""
+    index = KnowledgeIndex(3)
+    index.add(["budget", "campaign"], np.eye(3)[:2])
+    index.add(["campaign", "ad_set"], np.eye(3)[1:])
+    
+    assert len(index) == 3
+    assert "ad_set" in index
+    assert index.search(np.array([0.0, 0.0, 1.0]), k=1)[0][0] == "ad_set"
+
 # Integration tests for API endpoints
 def test_upload_document(setup_database, monkeypatch):
     """Test document upload endpoint."""
     # Mock the background task to avoid actual processing
-    def mock_process_document(document_id, file_path, db):
+    def mock_process_document(document_id, file_path):
         pass
     
     monkeypatch.setattr("app.process_document", mock_process_document)
@@ -193,8 +299,7 @@ def test_get_document_knowledge(setup_database):
 def test_search_knowledge(setup_database, monkeypatch):
     """Test knowledge search endpoint."""
     # Mock the embedding model to avoid actual encoding
-    def mock_encode(text):
-        import numpy as np
+    def mock_encode(text, **kwargs):
         return np.zeros(384)  # Return dummy embedding
     
     monkeypatch.setattr("app.model.encode", mock_encode)
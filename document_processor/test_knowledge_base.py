@@ -0,0 +1,240 @@
+"""
+Test module for the knowledge base API.
+"""
+
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import knowledge_base
+from knowledge_base import app, Base, get_db, RuleEntry, bump_rule_set_version, invalidate_rule_cache
+
+# Create test database
+TEST_DATABASE_URL = "sqlite+aiosqlite://"
+engine = create_async_engine(
+    TEST_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = async_sessionmaker(
+    bind=engine,
+    autoflush=False,
+    expire_on_commit=False,
+    join_transaction_mode="create_savepoint"
+)
+
+# The sqlite3 driver defers BEGIN and mishandles SAVEPOINT; let SQLAlchemy
+# emit BEGIN itself so each test's savepoints nest inside its transaction
+@event.listens_for(engine.sync_engine, "connect")
+def disable_driver_transactions(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+
+@event.listens_for(engine.sync_engine, "begin")
+def emit_begin(connection):
+    connection.exec_driver_sql("BEGIN")
+
+# Create test client
+client = TestClient(app)
+
+# Override the get_db dependency
+async def override_get_db():
+    async with TestingSessionLocal() as db:
+        yield db
+
+app.dependency_overrides[get_db] = override_get_db
+
+# Streamed list endpoints open their own sessions
+knowledge_base.SessionLocal.configure(bind=engine, join_transaction_mode="create_savepoint")
+
+# Setup and teardown
+@pytest.fixture(scope="session")
+def database_schema():
+    # Create tables once for the whole run
+    asyncio.run(run_ddl(Base.metadata.create_all))
+    yield
+    # Drop tables
+    asyncio.run(run_ddl(Base.metadata.drop_all))
+
+@pytest.fixture(scope="function")
+def setup_database(database_schema):
+    # Run the test inside a transaction that is rolled back afterwards;
+    # session commits only release savepoints within it
+    connection = asyncio.run(begin_test_transaction())
+    for session_factory in (TestingSessionLocal, knowledge_base.SessionLocal):
+        session_factory.configure(bind=connection)
+    invalidate_rule_cache()
+    yield
+    for session_factory in (TestingSessionLocal, knowledge_base.SessionLocal):
+        session_factory.configure(bind=engine)
+    asyncio.run(rollback_test_transaction(connection))
+
+async def run_ddl(create_or_drop):
+    async with engine.begin() as connection:
+        await connection.run_sync(create_or_drop)
+
+async def begin_test_transaction():
+    connection = await engine.connect()
+    await connection.begin()
+    return connection
+
+async def rollback_test_transaction(connection):
+    await connection.rollback()
+    await connection.close()
+
+def create_entry(title, tags=None, category="budget_rule"):
+    response = client.post("/knowledge/", json={
+        "document_id": "doc-1",
+        "category": category,
+        "title": title,
+        "content": f"Content of {title}",
+        "tags": tags or []
+    })
+    assert response.status_code == 200
+    return response.json()
+
+def create_rule(name, conditions, actions=None, priority=0):
+    response = client.post("/rules/", json={
+        "name": name,
+        "priority": priority,
+        "conditions": conditions,
+        "actions": actions or [{"action_type": "notify", "action_value": name}]
+    })
+    assert response.status_code == 200
+    return response.json()
+
+def read_ndjson(response):
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def evaluate(metrics):
+    response = client.post("/rules/evaluate", json=metrics)
+    assert response.status_code == 200
+    return [rule["name"] for rule in response.json()["triggered_rules"]]
+
+# Knowledge entry tests
+def test_create_knowledge_entry_with_tags(setup_database):
+    """Test that tags inserted in bulk are returned with the entry."""
+    entry = create_entry("Scale winners", tags=["budget", "scaling"])
+    
+    response = client.get(f"/knowledge/{entry['id']}")
+    assert response.status_code == 200
+    assert sorted(response.json()["tags"]) == ["budget", "scaling"]
+    
+    entries = read_ndjson(client.get("/knowledge/", params={"tag": "scaling"}))
+    assert [e["title"] for e in entries] == ["Scale winners"]
+
+def test_get_knowledge_entries_cursor_walk(setup_database):
+    """Test that following cursors visits every entry once, newest first."""
+    titles = [f"Entry {i}" for i in range(5)]
+    for title in titles:
+        create_entry(title)
+    
+    seen = []
+    pages = 0
+    params = {"limit": 2}
+    while True:
+        lines = read_ndjson(client.get("/knowledge/", params=params))
+        pages += 1
+        
+        cursor = None
+        if lines and "next_cursor" in lines[-1]:
+            cursor = lines.pop()["next_cursor"]
+        seen.extend(entry["title"] for entry in lines)
+        
+        if not cursor:
+            break
+        assert pages < 10
+        params = {"limit": 2, "cursor": cursor}
+    
+    assert seen == list(reversed(titles))
+
+def test_get_knowledge_entries_invalid_cursor(setup_database):
+    """Test that a malformed cursor is rejected."""
+    response = client.get("/knowledge/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+def test_get_knowledge_relations_stream(setup_database):
+    """Test that relations are streamed as NDJSON and filtered."""
+    source = create_entry("Source")
+    target = create_entry("Target")
+    for relation_type in ("supports", "contradicts"):
+        response = client.post("/knowledge/relations/", json={
+            "source_id": source["id"],
+            "target_id": target["id"],
+            "relation_type": relation_type
+        })
+        assert response.status_code == 200
+    
+    assert len(read_ndjson(client.get("/knowledge/relations/"))) == 2
+    
+    relations = read_ndjson(client.get("/knowledge/relations/", params={"relation_type": "supports"}))
+    assert [r["relation_type"] for r in relations] == ["supports"]
+
+# Rule evaluation tests
+def test_evaluate_rules_mixed_operators(setup_database):
+    """Test rules combining different operators, ordered by priority."""
+    create_rule("high_cpa", [{"condition_type": "CPA", "operator": ">", "value": 10}], priority=1)
+    create_rule("low_ctr", [
+        {"condition_type": "CTR", "operator": "<=", "value": 0.01},
+        {"condition_type": "CPA", "operator": ">=", "value": 5}
+    ], priority=5)
+    create_rule("exact_roas", [{"condition_type": "ROAS", "operator": "=", "value": 2}], priority=3)
+    create_rule("cheap", [{"condition_type": "CPA", "operator": "<", "value": 5}])
+    
+    assert evaluate({"CPA": 12, "CTR": 0.01, "ROAS": 2}) == ["low_ctr", "exact_roas", "high_cpa"]
+    assert evaluate({"CPA": 4, "CTR": 0.01, "ROAS": 1}) == ["cheap"]
+
+def test_evaluate_rules_action_order(setup_database):
+    """Test that actions come back sorted by priority."""
+    create_rule("pause", [{"condition_type": "CPA", "operator": ">", "value": 10}], actions=[
+        {"action_type": "notify", "action_value": "team", "priority": 1},
+        {"action_type": "pause", "action_value": "ad_set", "priority": 9}
+    ])
+    
+    response = client.post("/rules/evaluate", json={"CPA": 20})
+    actions = response.json()["triggered_rules"][0]["actions"]
+    assert [action["action_type"] for action in actions] == ["pause", "notify"]
+
+def test_evaluate_rules_missing_metric(setup_database):
+    """Test that a condition on a missing metric is not met."""
+    create_rule("needs_ctr", [{"condition_type": "CTR", "operator": "<", "value": 0.5}])
+    
+    assert evaluate({"CPA": 12}) == []
+
+def test_evaluate_rules_without_conditions(setup_database):
+    """Test that rules without conditions always trigger."""
+    create_rule("always", [])
+    create_rule("high_cpa", [{"condition_type": "CPA", "operator": ">", "value": 10}])
+    
+    assert evaluate({"CPA": 1}) == ["always"]
+
+def test_evaluate_rules_after_toggle(setup_database):
+    """Test that deactivated rules stop triggering."""
+    rule = create_rule("high_cpa", [{"condition_type": "CPA", "operator": ">", "value": 10}])
+    assert evaluate({"CPA": 20}) == ["high_cpa"]
+    
+    response = client.put(f"/rules/{rule['id']}/toggle", params={"is_active": False})
+    assert response.status_code == 200
+    assert evaluate({"CPA": 20}) == []
+
+def test_evaluate_rules_sees_changes_from_other_workers(setup_database, monkeypatch):
+    """Test that the rule cache picks up changes committed elsewhere."""
+    monkeypatch.setattr(knowledge_base, "RULE_CACHE_REVALIDATE_SECONDS", 0)
+    rule = create_rule("high_cpa", [{"condition_type": "CPA", "operator": ">", "value": 10}])
+    assert evaluate({"CPA": 20}) == ["high_cpa"]
+    
+    # Change the rule without going through this process's endpoints
+    async def deactivate_rule():
+        async with TestingSessionLocal() as db:
+            (await db.get(RuleEntry, rule["id"])).is_active = False
+            await bump_rule_set_version(db)
+            await db.commit()
+    
+    asyncio.run(deactivate_rule())
+    
+    assert evaluate({"CPA": 20}) == []
@@ -6,27 +6,50 @@ for authentication, campaign management, ad set management, and budget adjustmen
 """
 
 import os
+import functools
 import logging
+import math
+import random
+import secrets
 import time
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from urllib.parse import urlencode, quote
 
 from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
-from pydantic import BaseModel
-from sqlalchemy import create_engine, Column, String, Integer, Float, Boolean, DateTime, ForeignKey, Text
+from fastapi.responses import RedirectResponse, ORJSONResponse
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import create_engine, select, insert, bindparam, Column, String, Integer, Float, Numeric, Boolean, DateTime, ForeignKey, Index, JSON
+from sqlalchemy.dialects.postgresql import JSONB, insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session, relationship
+from sqlalchemy.orm import sessionmaker, Session, relationship, joinedload, selectinload
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.schema import CreateIndex
 from facebook_business.api import FacebookAdsApi
 from facebook_business.adobjects.adaccount import AdAccount
 from facebook_business.adobjects.campaign import Campaign
 from facebook_business.adobjects.adset import AdSet
 from facebook_business.adobjects.ad import Ad
+from facebook_business.adobjects.adreportrun import AdReportRun
 from facebook_business.exceptions import FacebookRequestError
 import requests
 import json
+import httpx
+import orjson
+
+# HTTP/2 support in httpx needs the optional h2 package
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
@@ -38,15 +61,81 @@ APP_SECRET = os.getenv("FACEBOOK_APP_SECRET")
 REDIRECT_URI = os.getenv("FACEBOOK_REDIRECT_URI")
 API_VERSION = os.getenv("FACEBOOK_API_VERSION", "v18.0")
 
+# Shared client for Graph API calls made directly from async endpoints; it
+# keeps connections to graph.facebook.com open between calls and requests
+graph_api_client = httpx.AsyncClient(
+    base_url=f"https://graph.facebook.com/{API_VERSION}/",
+    http2=HTTP2_AVAILABLE,
+    timeout=10
+)
+
 # Database setup
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./facebook_ads_manager.db")
-engine = create_engine(DATABASE_URL)
+
+def dump_json(value: Any) -> str:
+    """
+    Serialize a JSON column value; drivers expect text, orjson returns bytes.
+    
+    Args:
+        value: Value to serialize
+        
+    Returns:
+        JSON text
+    """
+    return orjson.dumps(value).decode()
+
+def create_database_engine(database_url: str):
+    """
+    Create the SQLAlchemy engine with pooling suited to the database.
+    
+    SQLite (development and tests) shares connections across FastAPI's
+    threadpool, with a single static connection for in-memory databases.
+    Server databases get a pool sized for the threadpool's concurrency;
+    connections are pre-pinged so ones dropped by a proxy are replaced
+    before use, and recycled before idle timeouts close them. JSON columns
+    are (de)serialized with orjson.
+    
+    Args:
+        database_url: SQLAlchemy database URL
+        
+    Returns:
+        SQLAlchemy engine
+    """
+    if database_url.startswith("sqlite"):
+        if database_url.endswith(("://", ":///:memory:")):
+            return create_engine(
+                database_url,
+                connect_args={"check_same_thread": False},
+                poolclass=StaticPool,
+                json_serializer=dump_json,
+                json_deserializer=orjson.loads
+            )
+        return create_engine(
+            database_url,
+            connect_args={"check_same_thread": False},
+            json_serializer=dump_json,
+            json_deserializer=orjson.loads
+        )
+    
+    return create_engine(
+        database_url,
+        json_serializer=dump_json,
+        json_deserializer=orjson.loads,
+        pool_size=20,
+        max_overflow=40,
+        pool_timeout=30,
+        pool_pre_ping=True,
+        pool_recycle=1800
+    )
+
+engine = create_database_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 # Initialize FastAPI app
 app = FastAPI(title="Facebook Ads Manager API", 
-              description="API for managing Facebook Ads campaigns, ad sets, and budgets")
+              description="API for managing Facebook Ads campaigns, ad sets, and budgets",
+              default_response_class=ORJSONResponse)
 
 # Add CORS middleware
 app.add_middleware(
@@ -60,6 +149,10 @@ app.add_middleware(
 # Database Models
 class FacebookAccount(Base):
     __tablename__ = "facebook_accounts"
+    # Leading user_id also serves user_id-only filters
+    __table_args__ = (
+        Index("ix_facebook_accounts_user_id_fb_account_id", "user_id", "fb_account_id", unique=True),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = Column(String, nullable=False)
@@ -71,19 +164,23 @@ class FacebookAccount(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    campaigns = relationship("Campaign", back_populates="account", cascade="all, delete-orphan")
+    campaigns = relationship("CampaignModel", back_populates="account", cascade="all, delete-orphan")
 
 class CampaignModel(Base):
     __tablename__ = "campaigns"
+    # Leading account_id also serves account_id-only filters
+    __table_args__ = (
+        Index("ix_campaigns_account_id_fb_campaign_id", "account_id", "fb_campaign_id", unique=True),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     account_id = Column(String, ForeignKey("facebook_accounts.id"), nullable=False)
-    fb_campaign_id = Column(String, nullable=False)
+    fb_campaign_id = Column(String, nullable=False, index=True)
     name = Column(String, nullable=False)
     objective = Column(String, nullable=True)
     status = Column(String, nullable=False)
-    daily_budget = Column(Float, nullable=True)
-    lifetime_budget = Column(Float, nullable=True)
+    daily_budget = Column(Numeric(12, 2), nullable=True)
+    lifetime_budget = Column(Numeric(12, 2), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -92,14 +189,18 @@ class CampaignModel(Base):
 
 class AdSetModel(Base):
     __tablename__ = "ad_sets"
+    # Leading campaign_id also serves campaign_id-only filters
+    __table_args__ = (
+        Index("ix_ad_sets_campaign_id_fb_adset_id", "campaign_id", "fb_adset_id", unique=True),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     campaign_id = Column(String, ForeignKey("campaigns.id"), nullable=False)
-    fb_adset_id = Column(String, nullable=False)
+    fb_adset_id = Column(String, nullable=False, index=True)
     name = Column(String, nullable=False)
-    targeting = Column(Text, nullable=True)  # JSON string
-    budget = Column(Float, nullable=True)
-    bid_amount = Column(Float, nullable=True)
+    targeting = Column(JSON().with_variant(JSONB, "postgresql"), nullable=True)
+    budget = Column(Numeric(12, 2), nullable=True)
+    bid_amount = Column(Numeric(12, 2), nullable=True)
     billing_event = Column(String, nullable=True)
     optimization_goal = Column(String, nullable=True)
     status = Column(String, nullable=False)
@@ -111,6 +212,10 @@ class AdSetModel(Base):
 
 class PerformanceMetric(Base):
     __tablename__ = "performance_metrics"
+    # Backs the per-day metric upserts; leading adset_id serves adset_id-only filters
+    __table_args__ = (
+        Index("ix_performance_metrics_adset_id_date", "adset_id", "date", unique=True),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     adset_id = Column(String, ForeignKey("ad_sets.id"), nullable=False)
@@ -125,8 +230,90 @@ class PerformanceMetric(Base):
     
     ad_set = relationship("AdSetModel", back_populates="performance_metrics")
 
+# Fixed-shape lookup statements, built once so requests only bind
+# parameters and reuse the engine's compiled statement cache
+ACCOUNT_BY_ID_STATEMENT = select(FacebookAccount).where(FacebookAccount.id == bindparam("account_id"))
+# Loads everything a delete cascades to with one IN query per level instead
+# of one lazy load per campaign and ad set
+ACCOUNT_WITH_CHILDREN_STATEMENT = ACCOUNT_BY_ID_STATEMENT.options(
+    selectinload(FacebookAccount.campaigns)
+    .selectinload(CampaignModel.ad_sets)
+    .selectinload(AdSetModel.performance_metrics)
+)
+ACCOUNTS_BY_USER_STATEMENT = select(FacebookAccount).where(FacebookAccount.user_id == bindparam("user_id"))
+CAMPAIGN_BY_ID_STATEMENT = select(CampaignModel).where(CampaignModel.id == bindparam("campaign_id"))
+CAMPAIGN_WITH_ACCOUNT_STATEMENT = CAMPAIGN_BY_ID_STATEMENT.options(joinedload(CampaignModel.account))
+CAMPAIGNS_BY_ACCOUNT_STATEMENT = select(CampaignModel).where(CampaignModel.account_id == bindparam("account_id"))
+ADSET_BY_ID_STATEMENT = select(AdSetModel).where(AdSetModel.id == bindparam("adset_id"))
+ADSET_WITH_CAMPAIGN_STATEMENT = ADSET_BY_ID_STATEMENT.options(
+    joinedload(AdSetModel.campaign).joinedload(CampaignModel.account)
+)
+ADSETS_BY_CAMPAIGN_STATEMENT = select(AdSetModel).where(AdSetModel.campaign_id == bindparam("campaign_id"))
+
+def ensure_unique_indexes(bind):
+    """
+    Create the unique indexes the upserts conflict on for databases that predate them.
+    
+    create_all only adds indexes together with a new table, so existing
+    tables get the (idempotent) DDL here. Duplicate rows block the index;
+    that is logged and raised so the service does not start with upserts
+    that fail on every request.
+    
+    Args:
+        bind: Engine to create the indexes on
+    """
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                if not index.unique:
+                    continue
+                try:
+                    connection.execute(CreateIndex(index, if_not_exists=True))
+                except IntegrityError:
+                    logger.error(f"Duplicate rows in {table.name} block unique index {index.name}; remove them and restart")
+                    raise
+
 # Create database tables
 Base.metadata.create_all(bind=engine)
+ensure_unique_indexes(engine)
+
+def dialect_insert(db: Session):
+    """
+    Pick the insert construct of the session's database, for upserts.
+    
+    PostgreSQL and SQLite both support INSERT ... ON CONFLICT DO UPDATE and
+    RETURNING through their dialect's insert().
+    
+    Args:
+        db: Database session
+        
+    Returns:
+        Dialect-specific insert function
+    """
+    return postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+
+# Stored metric columns refreshed when a day is synced again
+PERFORMANCE_METRIC_VALUE_COLUMNS = ("impressions", "clicks", "conversions", "spend", "cpa", "cpl")
+
+# Rows per multi-row upsert, well under SQLite's bound parameter limit
+PERFORMANCE_METRIC_UPSERT_CHUNK = 500
+
+def upsert_performance_metrics_statement(db: Session, rows: List[Dict[str, Any]]):
+    """
+    Build one statement inserting daily metrics or updating the stored day.
+    
+    Args:
+        db: Database session
+        rows: Metric rows with adset_id, date and the value columns
+        
+    Returns:
+        INSERT ... ON CONFLICT (adset_id, date) DO UPDATE statement
+    """
+    stmt = dialect_insert(db)(PerformanceMetric).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[PerformanceMetric.adset_id, PerformanceMetric.date],
+        set_={column: stmt.excluded[column] for column in PERFORMANCE_METRIC_VALUE_COLUMNS}
+    )
 
 # Dependency to get database session
 def get_db():
@@ -154,8 +341,7 @@ class FacebookAccountResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class CampaignCreate(BaseModel):
     name: str
@@ -175,8 +361,11 @@ class CampaignResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+class CampaignBudgetUpdate(BaseModel):
+    campaign_id: str
+    daily_budget: float
 
 class AdSetCreate(BaseModel):
     name: str
@@ -191,7 +380,7 @@ class AdSetResponse(BaseModel):
     id: str
     fb_adset_id: str
     name: str
-    targeting: Dict[str, Any]
+    targeting: Optional[Dict[str, Any]]
     budget: Optional[float]
     bid_amount: Optional[float]
     billing_event: Optional[str]
@@ -200,8 +389,7 @@ class AdSetResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class PerformanceMetricResponse(BaseModel):
     id: str
@@ -214,14 +402,20 @@ class PerformanceMetricResponse(BaseModel):
     cpa: Optional[float]
     cpl: Optional[float]
     
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 # Helper functions
+@functools.lru_cache(maxsize=256)
 def initialize_facebook_api(access_token: str):
     """
     Initialize the Facebook Ads API with the provided access token.
     
+    Instances are cached per access token so their HTTP session, and its
+    pooled TCP/TLS connections, are reused across requests. Callers pass
+    the instance to Facebook objects explicitly (api=...) instead of
+    relying on the process-wide default API, which belongs to whichever
+    token was initialized last.
+    
     Args:
         access_token: Facebook access token
         
@@ -252,15 +446,95 @@ def get_ad_account(access_token: str, account_id: str):
         AdAccount object
     """
     try:
-        initialize_facebook_api(access_token)
+        api = initialize_facebook_api(access_token)
         # Make sure account_id has 'act_' prefix
         if not account_id.startswith('act_'):
             account_id = f'act_{account_id}'
-        return AdAccount(account_id)
+        return AdAccount(account_id, api=api)
     except Exception as e:
         logger.error(f"Error getting ad account: {str(e)}")
         raise
 
+# Long-lived tokens are refreshed once they expire within this window
+TOKEN_REFRESH_WINDOW = timedelta(days=1)
+
+def ensure_valid_token(account: FacebookAccount, db: Session):
+    """
+    Refresh an account's long-lived access token shortly before it expires.
+    
+    Exchanging the token ahead of expiry saves a failed request (error 190)
+    per expired token. Accounts without a known expiry are left alone, and
+    refresh failures are logged so the call can still try the old token.
+    
+    Args:
+        account: Facebook account whose token is about to be used
+        db: Database session the account belongs to
+    """
+    if not account.token_expiry or account.token_expiry - datetime.utcnow() > TOKEN_REFRESH_WINDOW:
+        return
+    
+    if not APP_ID or not APP_SECRET:
+        logger.warning(f"Cannot refresh access token for account {account.id}: Facebook App credentials not configured")
+        return
+    
+    try:
+        response = requests.get(
+            f"https://graph.facebook.com/{API_VERSION}/oauth/access_token",
+            params={
+                "grant_type": "fb_exchange_token",
+                "client_id": APP_ID,
+                "client_secret": APP_SECRET,
+                "fb_exchange_token": account.access_token
+            },
+            timeout=10
+        )
+        response.raise_for_status()
+        token_data = response.json()
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error refreshing access token for account {account.id}: {str(e)}")
+        return
+    
+    account.access_token = token_data["access_token"]
+    account.token_expiry = None
+    if token_data.get("expires_in"):
+        account.token_expiry = datetime.utcnow() + timedelta(seconds=int(token_data["expires_in"]))
+    account.updated_at = datetime.utcnow()
+    db.commit()
+    
+    logger.info(f"Refreshed access token for account {account.id}")
+
+# Longest wait handle_facebook_error sleeps through before retrying; longer
+# regain estimates are passed back to the client instead of holding a worker
+MAX_RATE_LIMIT_WAIT_SECONDS = 60
+
+def rate_limit_wait_seconds(error: FacebookRequestError, retry_count: int) -> float:
+    """
+    Work out how long to wait before retrying a rate-limited call.
+    
+    Facebook reports how long a throttled business needs to regain access in
+    the x-business-use-case-usage header. Waiting for that instead of a fixed
+    backoff avoids retrying into the same throttle. Jitter keeps concurrent
+    requests from retrying in lockstep.
+    
+    Args:
+        error: Rate limiting error raised by the Facebook SDK
+        retry_count: Number of the upcoming retry, starting at 1
+        
+    Returns:
+        Seconds to wait
+    """
+    regain_minutes = 0
+    headers = {name.lower(): value for name, value in (error.http_headers() or {}).items()}
+    try:
+        usage = json.loads(headers.get("x-business-use-case-usage") or "{}")
+        for entries in usage.values():
+            for entry in entries:
+                regain_minutes = max(regain_minutes, entry.get("estimated_time_to_regain_access") or 0)
+    except (ValueError, AttributeError, TypeError):
+        logger.warning("Could not parse x-business-use-case-usage header")
+    
+    return max(regain_minutes * 60, 2 ** retry_count) + random.uniform(0, 1)
+
 def handle_facebook_error(func):
     """
     Decorator to handle Facebook API errors.
@@ -271,6 +545,8 @@ def handle_facebook_error(func):
     Returns:
         Decorated function
     """
+    # Keep the endpoint's signature so FastAPI still sees its parameters
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         max_retries = 3
         retry_count = 0
@@ -283,8 +559,15 @@ def handle_facebook_error(func):
                 if e.api_error_code() == 17 or e.api_error_code() == 4:  # Rate limiting error codes
                     retry_count += 1
                     if retry_count < max_retries:
-                        wait_time = 2 ** retry_count  # Exponential backoff
-                        logger.warning(f"Rate limited by Facebook API. Retrying in {wait_time} seconds...")
+                        wait_time = rate_limit_wait_seconds(e, retry_count)
+                        if wait_time > MAX_RATE_LIMIT_WAIT_SECONDS:
+                            logger.error(f"Rate limited by Facebook API for {wait_time:.0f} seconds, not retrying")
+                            raise HTTPException(
+                                status_code=429,
+                                detail="Facebook API rate limit exceeded",
+                                headers={"Retry-After": str(math.ceil(wait_time))}
+                            )
+                        logger.warning(f"Rate limited by Facebook API. Retrying in {wait_time:.1f} seconds...")
                         time.sleep(wait_time)
                     else:
                         logger.error(f"Facebook API rate limit exceeded after {max_retries} retries")
@@ -297,12 +580,268 @@ def handle_facebook_error(func):
                 else:
                     logger.error(f"Facebook API error: {e.api_error_message()}")
                     raise HTTPException(status_code=400, detail=f"Facebook API error: {e.api_error_message()}")
+            except HTTPException:
+                raise
             except Exception as e:
                 logger.error(f"Error in Facebook API call: {str(e)}")
                 raise HTTPException(status_code=500, detail=f"Error in Facebook API call: {str(e)}")
     
     return wrapper
 
+# Async insights jobs are polled with exponential backoff between these
+# bounds and abandoned after the ceiling
+INSIGHTS_POLL_INITIAL_SECONDS = 5
+INSIGHTS_POLL_MAX_SECONDS = 300
+INSIGHTS_JOB_TIMEOUT_SECONDS = 40 * 60
+
+def get_insights_async(ad_object, params: Dict[str, Any]):
+    """
+    Run an asynchronous insights job and wait for its results.
+    
+    Async jobs don't time out like synchronous /insights calls and cost far
+    fewer rate limit points for large date ranges.
+    
+    Args:
+        ad_object: Ad account, campaign or ad set to report on
+        params: Insights parameters (fields, level, time_range, ...)
+        
+    Returns:
+        Cursor over the report's insights
+    """
+    report = ad_object.get_insights_async(params=params)
+    deadline = time.monotonic() + INSIGHTS_JOB_TIMEOUT_SECONDS
+    delay = INSIGHTS_POLL_INITIAL_SECONDS
+    
+    while True:
+        report = report.api_get(fields=[
+            AdReportRun.Field.async_status,
+            AdReportRun.Field.async_percent_completion
+        ])
+        status = report[AdReportRun.Field.async_status]
+        
+        if status == 'Job Completed':
+            return report.get_result(params={'limit': 500})
+        
+        if status in ('Job Failed', 'Job Skipped'):
+            raise RuntimeError(f"Insights job {report['id']} ended with status: {status}")
+        
+        if time.monotonic() + delay > deadline:
+            raise TimeoutError(f"Insights job {report['id']} did not complete in {INSIGHTS_JOB_TIMEOUT_SECONDS} seconds")
+        
+        logger.info(f"Insights job {report['id']} is {report[AdReportRun.Field.async_percent_completion]}% complete")
+        time.sleep(delay)
+        delay = min(delay * 2, INSIGHTS_POLL_MAX_SECONDS)
+
+def default_date_range(start_date: Optional[str], end_date: Optional[str]) -> Tuple[str, str]:
+    """
+    Fill in a missing metrics date range with the last 30 days.
+    
+    Args:
+        start_date: Start date (YYYY-MM-DD) or None
+        end_date: End date (YYYY-MM-DD) or None
+        
+    Returns:
+        Tuple of start and end date (YYYY-MM-DD)
+    """
+    today = datetime.utcnow().date()
+    return (
+        start_date or (today - timedelta(days=30)).isoformat(),
+        end_date or today.isoformat()
+    )
+
+def to_cents(amount) -> int:
+    """
+    Convert a budget or bid to the minor units the Graph API expects.
+    
+    Goes through the decimal string so amounts like 19.99 become 1999
+    rather than being truncated to 1998 by binary float multiplication.
+    
+    Args:
+        amount: Amount in account currency units
+        
+    Returns:
+        Amount in cents
+    """
+    return int((Decimal(str(amount)) * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+def from_cents(cents) -> Decimal:
+    """
+    Convert a Graph API budget or bid in minor units to currency units.
+    
+    Args:
+        cents: Amount in cents, as the numeric string the API returns
+        
+    Returns:
+        Exact amount in account currency units
+    """
+    return Decimal(str(cents)) / 100
+
+# Action types counted as conversions; leads count as conversions too
+CONVERSION_ACTION_TYPES = frozenset(('offsite_conversion', 'lead'))
+
+def count_conversions(actions) -> Tuple[int, int]:
+    """
+    Total the conversions and leads of an insight's actions in one pass.
+    
+    Args:
+        actions: Insight actions with action_type and value
+        
+    Returns:
+        Tuple of conversions and leads
+    """
+    conversions = 0
+    leads = 0
+    for action in actions:
+        action_type = action['action_type']
+        if action_type in CONVERSION_ACTION_TYPES:
+            value = int(action['value'])
+            conversions += value
+            if action_type == 'lead':
+                leads += value
+    
+    return conversions, leads
+
+def parse_insight_metrics(insight) -> Dict[str, Any]:
+    """
+    Extract stored performance metrics from a daily ad set insight.
+    
+    Args:
+        insight: Insight with impressions, clicks, spend and actions
+        
+    Returns:
+        Dictionary of impressions, clicks, conversions, spend, cpa and cpl
+    """
+    impressions = int(insight.get('impressions', 0))
+    clicks = int(insight.get('clicks', 0))
+    spend = float(insight.get('spend', 0))
+    
+    conversions, leads = count_conversions(insight.get('actions', ()))
+    
+    # Calculate CPA and CPL
+    cpa = None
+    if conversions > 0 and spend > 0:
+        cpa = spend / conversions
+    
+    cpl = None
+    if leads > 0 and spend > 0:
+        cpl = spend / leads
+    
+    return {
+        "impressions": impressions,
+        "clicks": clicks,
+        "conversions": conversions,
+        "spend": spend,
+        "cpa": cpa,
+        "cpl": cpl
+    }
+
+def sync_account_insights(account_id: str, start_date: str, end_date: str):
+    """
+    Store daily ad set metrics for an account from an async insights job.
+    
+    Runs as a background task with its own database session, since the
+    job can take minutes and outlives the request.
+    
+    Args:
+        account_id: ID of the Facebook account
+        start_date: Start date for metrics (YYYY-MM-DD)
+        end_date: End date for metrics (YYYY-MM-DD)
+    """
+    db = SessionLocal()
+    try:
+        account = db.get(FacebookAccount, account_id)
+        if not account:
+            logger.error(f"Facebook account {account_id} not found")
+            return
+        
+        ensure_valid_token(account, db)
+        ad_account = get_ad_account(account.access_token, account.fb_account_id)
+        insights = get_insights_async(ad_account, {
+            'level': 'adset',
+            'time_range': {
+                'since': start_date,
+                'until': end_date
+            },
+            'time_increment': 1,  # Daily breakdown
+            'fields': [
+                'adset_id',
+                'date_start',
+                'impressions',
+                'clicks',
+                'actions',
+                'spend'
+            ]
+        })
+        
+        # Map the account's Facebook ad set IDs to stored ad sets
+        adset_ids = dict(
+            db.query(AdSetModel.fb_adset_id, AdSetModel.id).join(CampaignModel).filter(
+                CampaignModel.account_id == account_id
+            )
+        )
+        
+        rows = []
+        for insight in insights:
+            adset_id = adset_ids.get(insight.get('adset_id'))
+            if not adset_id:
+                continue
+            
+            rows.append({
+                "adset_id": adset_id,
+                "date": datetime.fromisoformat(insight['date_start']),
+                **parse_insight_metrics(insight)
+            })
+        
+        # Insert new days and update stored ones, a chunk per statement
+        for start in range(0, len(rows), PERFORMANCE_METRIC_UPSERT_CHUNK):
+            db.execute(upsert_performance_metrics_statement(
+                db, rows[start:start + PERFORMANCE_METRIC_UPSERT_CHUNK]
+            ))
+        db.commit()
+        
+        logger.info(f"Synced {len(rows)} daily ad set metrics for account {account_id}")
+    except FacebookRequestError as e:
+        logger.error(f"Facebook API error syncing insights for account {account_id}: {e.api_error_message()}")
+    except Exception as e:
+        logger.error(f"Error syncing insights for account {account_id}: {str(e)}")
+    finally:
+        db.close()
+
+# How long a user has to complete the Facebook login after it is started
+OAUTH_STATE_TTL_SECONDS = 600
+
+# OAuth states issued by facebook_auth, mapped to their expiry time
+pending_oauth_states: Dict[str, float] = {}
+
+def issue_oauth_state() -> str:
+    """
+    Create a random OAuth state and remember it until it expires.
+    
+    Returns:
+        State value to send to Facebook
+    """
+    now = time.monotonic()
+    for state, expires_at in list(pending_oauth_states.items()):
+        if expires_at <= now:
+            del pending_oauth_states[state]
+    
+    state = secrets.token_urlsafe(16)
+    pending_oauth_states[state] = now + OAUTH_STATE_TTL_SECONDS
+    return state
+
+def consume_oauth_state(state: str) -> bool:
+    """
+    Check an OAuth state returned by Facebook; each state is valid once.
+    
+    Args:
+        state: State value from the callback
+        
+    Returns:
+        True if the state was issued by this process and has not expired
+    """
+    expires_at = pending_oauth_states.pop(state, None)
+    return expires_at is not None and expires_at > time.monotonic()
+
 # Authentication endpoints
 @app.get("/auth/facebook")
 def facebook_auth():
@@ -322,11 +861,11 @@ def facebook_auth():
         "redirect_uri": REDIRECT_URI,
         "scope": "ads_management,ads_read",
         "response_type": "code",
-        "state": "state123"  # Use a secure random state in production
+        "state": issue_oauth_state()
     }
     
-    # Convert params to URL query string
-    query_string = "&".join([f"{k}={v}" for k, v in params.items()])
+    # Convert params to URL query string, encoding reserved characters
+    query_string = urlencode(params, quote_via=quote)
     auth_url = f"{oauth_url}?{query_string}"
     
     return RedirectResponse(auth_url)
@@ -346,42 +885,38 @@ async def facebook_callback(code: str, state: str, db: Session = Depends(get_db)
     if not APP_ID or not APP_SECRET or not REDIRECT_URI:
         raise HTTPException(status_code=500, detail="Facebook App credentials not configured")
     
-    # Exchange code for access token
-    token_url = f"https://graph.facebook.com/{API_VERSION}/oauth/access_token"
-    params = {
-        "client_id": APP_ID,
-        "client_secret": APP_SECRET,
-        "redirect_uri": REDIRECT_URI,
-        "code": code
-    }
+    if not consume_oauth_state(state):
+        raise HTTPException(status_code=400, detail="Invalid or expired OAuth state")
     
+    # The three calls depend on each other, so they run in order; they share
+    # one connection instead of opening a new TLS session each
     try:
-        response = requests.get(token_url, params=params)
+        # Exchange code for access token
+        response = await graph_api_client.get("oauth/access_token", params={
+            "client_id": APP_ID,
+            "client_secret": APP_SECRET,
+            "redirect_uri": REDIRECT_URI,
+            "code": code
+        })
         response.raise_for_status()
         token_data = response.json()
         
         # Get long-lived token
-        long_lived_url = f"https://graph.facebook.com/{API_VERSION}/oauth/access_token"
-        long_lived_params = {
+        long_lived_response = await graph_api_client.get("oauth/access_token", params={
             "grant_type": "fb_exchange_token",
             "client_id": APP_ID,
             "client_secret": APP_SECRET,
             "fb_exchange_token": token_data["access_token"]
-        }
-        
-        long_lived_response = requests.get(long_lived_url, params=long_lived_params)
+        })
         long_lived_response.raise_for_status()
         long_lived_data = long_lived_response.json()
         
         # Get user's ad accounts
         access_token = long_lived_data["access_token"]
-        accounts_url = f"https://graph.facebook.com/{API_VERSION}/me/adaccounts"
-        accounts_params = {
+        accounts_response = await graph_api_client.get("me/adaccounts", params={
             "access_token": access_token,
             "fields": "id,name,account_id"
-        }
-        
-        accounts_response = requests.get(accounts_url, params=accounts_params)
+        })
         accounts_response.raise_for_status()
         accounts_data = accounts_response.json()
         
@@ -394,10 +929,17 @@ async def facebook_callback(code: str, state: str, db: Session = Depends(get_db)
             "ad_accounts": accounts_data.get("data", [])
         }
         
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Error exchanging code for token: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Error exchanging code for token: {str(e)}")
 
+@app.on_event("shutdown")
+async def close_graph_api_client():
+    """
+    Close the pooled Graph API connections.
+    """
+    await graph_api_client.aclose()
+
 # Facebook account management endpoints
 @app.post("/accounts/", response_model=FacebookAccountResponse)
 def create_facebook_account(account: FacebookAccountCreate, db: Session = Depends(get_db)):
@@ -410,25 +952,9 @@ def create_facebook_account(account: FacebookAccountCreate, db: Session = Depend
     Returns:
         Created account
     """
-    # Check if account already exists
-    existing_account = db.query(FacebookAccount).filter(
-        FacebookAccount.user_id == account.user_id,
-        FacebookAccount.fb_account_id == account.fb_account_id
-    ).first()
-    
-    if existing_account:
-        # Update existing account
-        existing_account.access_token = account.access_token
-        existing_account.token_expiry = account.token_expiry
-        existing_account.refresh_token = account.refresh_token
-        existing_account.name = account.name
-        existing_account.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(existing_account)
-        return existing_account
-    
-    # Create new account
-    db_account = FacebookAccount(
+    # Insert the account, or update the stored one for this user and ad
+    # account, in a single statement
+    stmt = dialect_insert(db)(FacebookAccount).values(
         user_id=account.user_id,
         fb_account_id=account.fb_account_id,
         name=account.name,
@@ -436,11 +962,24 @@ def create_facebook_account(account: FacebookAccountCreate, db: Session = Depend
         token_expiry=account.token_expiry,
         refresh_token=account.refresh_token
     )
-    db.add(db_account)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[FacebookAccount.user_id, FacebookAccount.fb_account_id],
+        set_={
+            "name": stmt.excluded.name,
+            "access_token": stmt.excluded.access_token,
+            "token_expiry": stmt.excluded.token_expiry,
+            "refresh_token": stmt.excluded.refresh_token,
+            "updated_at": datetime.utcnow()
+        }
+    ).returning(FacebookAccount)
+    
+    db_account = db.scalars(stmt, execution_options={"populate_existing": True}).one()
+    
+    # Build the response before committing, which would expire the row
+    response = FacebookAccountResponse.model_validate(db_account)
     db.commit()
-    db.refresh(db_account)
     
-    return db_account
+    return response
 
 @app.get("/accounts/", response_model=List[FacebookAccountResponse])
 def get_facebook_accounts(user_id: str, db: Session = Depends(get_db)):
@@ -453,7 +992,7 @@ def get_facebook_accounts(user_id: str, db: Session = Depends(get_db)):
     Returns:
         List of Facebook accounts
     """
-    accounts = db.query(FacebookAccount).filter(FacebookAccount.user_id == user_id).all()
+    accounts = db.execute(ACCOUNTS_BY_USER_STATEMENT, {"user_id": user_id}).scalars().all()
     return accounts
 
 @app.get("/accounts/{account_id}", response_model=FacebookAccountResponse)
@@ -467,7 +1006,7 @@ def get_facebook_account(account_id: str, db: Session = Depends(get_db)):
     Returns:
         Facebook account
     """
-    account = db.query(FacebookAccount).filter(FacebookAccount.id == account_id).first()
+    account = db.execute(ACCOUNT_BY_ID_STATEMENT, {"account_id": account_id}).scalar_one_or_none()
     if not account:
         raise HTTPException(status_code=404, detail="Facebook account not found")
     return account
@@ -483,7 +1022,7 @@ def delete_facebook_account(account_id: str, db: Session = Depends(get_db)):
     Returns:
         Success message
     """
-    account = db.query(FacebookAccount).filter(FacebookAccount.id == account_id).first()
+    account = db.execute(ACCOUNT_WITH_CHILDREN_STATEMENT, {"account_id": account_id}).scalar_one_or_none()
     if not account:
         raise HTTPException(status_code=404, detail="Facebook account not found")
     
@@ -511,10 +1050,13 @@ def create_campaign(
         Created campaign
     """
     # Get Facebook account
-    account = db.query(FacebookAccount).filter(FacebookAccount.id == account_id).first()
+    account = db.execute(ACCOUNT_BY_ID_STATEMENT, {"account_id": account_id}).scalar_one_or_none()
     if not account:
         raise HTTPException(status_code=404, detail="Facebook account not found")
     
+    # Refresh the access token before it expires
+    ensure_valid_token(account, db)
+    
     # Initialize Facebook API
     ad_account = get_ad_account(account.access_token, account.fb_account_id)
     
@@ -527,10 +1069,10 @@ def create_campaign(
     }
     
     if campaign.daily_budget:
-        params['daily_budget'] = int(campaign.daily_budget * 100)  # Convert to cents
+        params['daily_budget'] = to_cents(campaign.daily_budget)
     
     if campaign.lifetime_budget:
-        params['lifetime_budget'] = int(campaign.lifetime_budget * 100)  # Convert to cents
+        params['lifetime_budget'] = to_cents(campaign.lifetime_budget)
     
     fb_campaign = ad_account.create_campaign(params=params)
     
@@ -550,84 +1092,177 @@ def create_campaign(
     
     return db_campaign
 
-@app.get("/accounts/{account_id}/campaigns/", response_model=List[CampaignResponse])
-@handle_facebook_error
-def get_campaigns(account_id: str, db: Session = Depends(get_db)):
+# Campaign fields synced from Facebook
+CAMPAIGN_FIELDS = [
+    'id',
+    'name',
+    'objective',
+    'status',
+    'daily_budget',
+    'lifetime_budget'
+]
+
+# Upper bound on concurrent Facebook calls when syncing several accounts
+MAX_PARALLEL_ACCOUNT_FETCHES = 8
+
+def fetch_account_campaigns(access_token: str, fb_account_id: str) -> List[Dict[str, Any]]:
     """
-    Get all campaigns for a Facebook account.
+    Fetch all campaigns of an ad account from Facebook.
+    
+    Takes plain values rather than the account row so it can run in worker
+    threads while the request thread owns the database session.
     
     Args:
-        account_id: ID of the Facebook account
+        access_token: Facebook access token
+        fb_account_id: Facebook ad account ID
         
     Returns:
-        List of campaigns
+        Campaigns with CAMPAIGN_FIELDS, all pages loaded
     """
-    # Get Facebook account
-    account = db.query(FacebookAccount).filter(FacebookAccount.id == account_id).first()
-    if not account:
-        raise HTTPException(status_code=404, detail="Facebook account not found")
+    ad_account = get_ad_account(access_token, fb_account_id)
+    return list(ad_account.get_campaigns(fields=CAMPAIGN_FIELDS))
+
+def store_account_campaigns(db: Session, account_id: str, fb_campaigns: List[Dict[str, Any]]) -> List[CampaignModel]:
+    """
+    Update stored campaigns of an account with data fetched from Facebook.
     
-    # Initialize Facebook API
-    ad_account = get_ad_account(account.access_token, account.fb_account_id)
+    The changes are flushed but left for the caller to commit.
     
-    # Get campaigns from Facebook
-    fields = [
-        'id',
-        'name',
-        'objective',
-        'status',
-        'daily_budget',
-        'lifetime_budget'
-    ]
-    fb_campaigns = ad_account.get_campaigns(fields=fields)
+    Args:
+        db: Database session
+        account_id: ID of the Facebook account
+        fb_campaigns: Campaigns returned by fetch_account_campaigns
+        
+    Returns:
+        Every stored campaign of the account, including new ones
+    """
+    # Load the account's stored campaigns in one query, keyed by Facebook ID
+    campaigns = {
+        campaign.fb_campaign_id: campaign
+        for campaign in db.execute(CAMPAIGNS_BY_ACCOUNT_STATEMENT, {"account_id": account_id}).scalars()
+    }
+    
+    # Fields missing from the Facebook data keep their stored value
+    new_campaigns = []
+    now = datetime.utcnow()
     
-    # Update local database with latest data
     for fb_campaign in fb_campaigns:
-        # Check if campaign exists in database
-        db_campaign = db.query(CampaignModel).filter(
-            CampaignModel.account_id == account_id,
-            CampaignModel.fb_campaign_id == fb_campaign['id']
-        ).first()
+        campaign = campaigns.get(fb_campaign['id'])
         
-        if db_campaign:
+        if campaign:
             # Update existing campaign
-            db_campaign.name = fb_campaign.get('name', db_campaign.name)
-            db_campaign.objective = fb_campaign.get('objective', db_campaign.objective)
-            db_campaign.status = fb_campaign.get('status', db_campaign.status)
+            for field in ('name', 'objective', 'status'):
+                if field in fb_campaign:
+                    setattr(campaign, field, fb_campaign[field])
             
             if 'daily_budget' in fb_campaign:
-                db_campaign.daily_budget = float(fb_campaign['daily_budget']) / 100  # Convert from cents
+                campaign.daily_budget = from_cents(fb_campaign['daily_budget'])
             
             if 'lifetime_budget' in fb_campaign:
-                db_campaign.lifetime_budget = float(fb_campaign['lifetime_budget']) / 100  # Convert from cents
+                campaign.lifetime_budget = from_cents(fb_campaign['lifetime_budget'])
             
-            db_campaign.updated_at = datetime.utcnow()
+            campaign.updated_at = now
         else:
             # Create new campaign record
             daily_budget = None
             if 'daily_budget' in fb_campaign:
-                daily_budget = float(fb_campaign['daily_budget']) / 100  # Convert from cents
+                daily_budget = from_cents(fb_campaign['daily_budget'])
             
             lifetime_budget = None
             if 'lifetime_budget' in fb_campaign:
-                lifetime_budget = float(fb_campaign['lifetime_budget']) / 100  # Convert from cents
+                lifetime_budget = from_cents(fb_campaign['lifetime_budget'])
             
-            db_campaign = CampaignModel(
-                account_id=account_id,
-                fb_campaign_id=fb_campaign['id'],
-                name=fb_campaign.get('name', ''),
-                objective=fb_campaign.get('objective'),
-                status=fb_campaign.get('status', 'UNKNOWN'),
-                daily_budget=daily_budget,
-                lifetime_budget=lifetime_budget
-            )
-            db.add(db_campaign)
+            new_campaigns.append({
+                "account_id": account_id,
+                "fb_campaign_id": fb_campaign['id'],
+                "name": fb_campaign.get('name', ''),
+                "objective": fb_campaign.get('objective'),
+                "status": fb_campaign.get('status', 'UNKNOWN'),
+                "daily_budget": daily_budget,
+                "lifetime_budget": lifetime_budget
+            })
+    
+    # Write the updates, then insert the new campaigns in one statement that
+    # returns them with their generated IDs and timestamps
+    db.flush()
+    if new_campaigns:
+        for campaign in db.scalars(
+            insert(CampaignModel).returning(CampaignModel, sort_by_parameter_order=True), new_campaigns
+        ):
+            campaigns[campaign.fb_campaign_id] = campaign
+    
+    return list(campaigns.values())
+
+@app.get("/accounts/{account_id}/campaigns/", response_model=List[CampaignResponse])
+@handle_facebook_error
+def get_campaigns(account_id: str, db: Session = Depends(get_db)):
+    """
+    Get all campaigns for a Facebook account.
     
+    Args:
+        account_id: ID of the Facebook account
+        
+    Returns:
+        List of campaigns
+    """
+    # Get Facebook account
+    account = db.execute(ACCOUNT_BY_ID_STATEMENT, {"account_id": account_id}).scalar_one_or_none()
+    if not account:
+        raise HTTPException(status_code=404, detail="Facebook account not found")
+    
+    # Refresh the access token before it expires
+    ensure_valid_token(account, db)
+    
+    # Update local database with latest data from Facebook
+    campaigns = store_account_campaigns(
+        db, account_id, fetch_account_campaigns(account.access_token, account.fb_account_id)
+    )
+    
+    # Build the response before committing, which would expire the rows
+    response = [CampaignResponse.model_validate(campaign) for campaign in campaigns]
     db.commit()
+    return response
+
+@app.get("/campaigns/", response_model=List[CampaignResponse])
+@handle_facebook_error
+def get_user_campaigns(user_id: str, db: Session = Depends(get_db)):
+    """
+    Get all campaigns across a user's Facebook accounts.
+    
+    The accounts are fetched from Facebook concurrently, so the request
+    takes about as long as the slowest account instead of the sum of all.
     
-    # Return campaigns from database
-    campaigns = db.query(CampaignModel).filter(CampaignModel.account_id == account_id).all()
-    return campaigns
+    Args:
+        user_id: ID of the user
+        
+    Returns:
+        List of campaigns
+    """
+    accounts = db.execute(ACCOUNTS_BY_USER_STATEMENT, {"user_id": user_id}).scalars().all()
+    if not accounts:
+        return []
+    
+    # Refresh tokens first; this touches the session, so it stays in this thread
+    for account in accounts:
+        ensure_valid_token(account, db)
+    
+    account_ids = [account.id for account in accounts]
+    access_tokens = [account.access_token for account in accounts]
+    fb_account_ids = [account.fb_account_id for account in accounts]
+    
+    workers = min(len(accounts), MAX_PARALLEL_ACCOUNT_FETCHES)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        fetched = list(executor.map(fetch_account_campaigns, access_tokens, fb_account_ids))
+    
+    # Build the response before committing, which would expire the rows
+    response = []
+    for account_id, fb_campaigns in zip(account_ids, fetched):
+        response.extend(
+            CampaignResponse.model_validate(campaign)
+            for campaign in store_account_campaigns(db, account_id, fb_campaigns)
+        )
+    db.commit()
+    return response
 
 @app.get("/campaigns/{campaign_id}", response_model=CampaignResponse)
 def get_campaign(campaign_id: str, db: Session = Depends(get_db)):
@@ -640,7 +1275,7 @@ def get_campaign(campaign_id: str, db: Session = Depends(get_db)):
     Returns:
         Campaign
     """
-    campaign = db.query(CampaignModel).filter(CampaignModel.id == campaign_id).first()
+    campaign = db.execute(CAMPAIGN_BY_ID_STATEMENT, {"campaign_id": campaign_id}).scalar_one_or_none()
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
     return campaign
@@ -667,28 +1302,29 @@ def update_campaign_status(
     if status not in valid_statuses:
         raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}")
     
-    # Get campaign
-    campaign = db.query(CampaignModel).filter(CampaignModel.id == campaign_id).first()
+    # Get campaign and its Facebook account in one query
+    campaign = db.execute(CAMPAIGN_WITH_ACCOUNT_STATEMENT, {"campaign_id": campaign_id}).scalar_one_or_none()
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
     
-    # Get Facebook account
-    account = db.query(FacebookAccount).filter(FacebookAccount.id == campaign.account_id).first()
+    account = campaign.account
     if not account:
         raise HTTPException(status_code=404, detail="Facebook account not found")
     
+    # Refresh the access token before it expires
+    ensure_valid_token(account, db)
+    
     # Initialize Facebook API
-    initialize_facebook_api(account.access_token)
+    api = initialize_facebook_api(account.access_token)
     
     # Update campaign on Facebook
-    fb_campaign = Campaign(campaign.fb_campaign_id)
+    fb_campaign = Campaign(campaign.fb_campaign_id, api=api)
     fb_campaign.api_update(params={'status': status})
     
     # Update campaign in database
     campaign.status = status
     campaign.updated_at = datetime.utcnow()
     db.commit()
-    db.refresh(campaign)
     
     return {"message": f"Campaign status updated to {status}", "campaign_id": campaign_id}
 
@@ -714,29 +1350,31 @@ def update_campaign_budget(
     if daily_budget is None and lifetime_budget is None:
         raise HTTPException(status_code=400, detail="Either daily_budget or lifetime_budget must be provided")
     
-    # Get campaign
-    campaign = db.query(CampaignModel).filter(CampaignModel.id == campaign_id).first()
+    # Get campaign and its Facebook account in one query
+    campaign = db.execute(CAMPAIGN_WITH_ACCOUNT_STATEMENT, {"campaign_id": campaign_id}).scalar_one_or_none()
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
     
-    # Get Facebook account
-    account = db.query(FacebookAccount).filter(FacebookAccount.id == campaign.account_id).first()
+    account = campaign.account
     if not account:
         raise HTTPException(status_code=404, detail="Facebook account not found")
     
+    # Refresh the access token before it expires
+    ensure_valid_token(account, db)
+    
     # Initialize Facebook API
-    initialize_facebook_api(account.access_token)
+    api = initialize_facebook_api(account.access_token)
     
     # Update campaign on Facebook
-    fb_campaign = Campaign(campaign.fb_campaign_id)
+    fb_campaign = Campaign(campaign.fb_campaign_id, api=api)
     params = {}
     
     if daily_budget is not None:
-        params['daily_budget'] = int(daily_budget * 100)  # Convert to cents
+        params['daily_budget'] = to_cents(daily_budget)
         campaign.daily_budget = daily_budget
     
     if lifetime_budget is not None:
-        params['lifetime_budget'] = int(lifetime_budget * 100)  # Convert to cents
+        params['lifetime_budget'] = to_cents(lifetime_budget)
         campaign.lifetime_budget = lifetime_budget
     
     fb_campaign.api_update(params=params)
@@ -744,11 +1382,136 @@ def update_campaign_budget(
     # Update campaign in database
     campaign.updated_at = datetime.utcnow()
     db.commit()
-    db.refresh(campaign)
     
     return {"message": "Campaign budget updated", "campaign_id": campaign_id}
 
+# Maximum number of requests Facebook accepts in one batch call
+FACEBOOK_BATCH_LIMIT = 50
+
+@app.post("/campaigns/batch/budget")
+@handle_facebook_error
+def update_campaign_budgets(
+    updates: List[CampaignBudgetUpdate],
+    db: Session = Depends(get_db)
+):
+    """
+    Update the daily budgets of several campaigns with batched API calls.
+    
+    Updates are grouped by Facebook account and sent in Graph API batches
+    of up to FACEBOOK_BATCH_LIMIT requests, instead of one HTTP round trip
+    per campaign.
+    
+    Args:
+        updates: Campaign IDs with their new daily budgets in currency units
+        
+    Returns:
+        IDs of the updated campaigns and errors for the ones that failed
+    """
+    # Get all campaigns and their Facebook accounts in one query
+    campaigns = {
+        campaign.id: campaign
+        for campaign in db.query(CampaignModel).options(joinedload(CampaignModel.account)).filter(
+            CampaignModel.id.in_([update.campaign_id for update in updates])
+        )
+    }
+    
+    missing = [update.campaign_id for update in updates if update.campaign_id not in campaigns]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Campaigns not found: {', '.join(missing)}")
+    
+    # Each account has its own access token, so batch per account
+    updates_by_account = defaultdict(list)
+    for index, update in enumerate(updates):
+        updates_by_account[campaigns[update.campaign_id].account].append(index)
+    
+    # Error message per answered update (None on success)
+    results: Dict[int, Optional[str]] = {}
+    
+    def on_success(index):
+        def record_success(response):
+            results[index] = None
+        return record_success
+    
+    def on_failure(index):
+        def record_error(response):
+            results[index] = response.error().api_error_message()
+        return record_error
+    
+    for account, indices in updates_by_account.items():
+        ensure_valid_token(account, db)
+        api = initialize_facebook_api(account.access_token)
+        
+        for start in range(0, len(indices), FACEBOOK_BATCH_LIMIT):
+            batch = api.new_batch()
+            for index in indices[start:start + FACEBOOK_BATCH_LIMIT]:
+                update = updates[index]
+                fb_campaign = Campaign(campaigns[update.campaign_id].fb_campaign_id, api=api)
+                fb_campaign.api_update(
+                    params={'daily_budget': to_cents(update.daily_budget)},
+                    batch=batch,
+                    success=on_success(index),
+                    failure=on_failure(index)
+                )
+            
+            # execute() returns a batch of the calls that got no response
+            for _ in range(3):
+                batch = batch.execute()
+                if not batch:
+                    break
+    
+    updated = []
+    errors = []
+    for index, update in enumerate(updates):
+        if index not in results:
+            errors.append({"campaign_id": update.campaign_id, "error": "No response from Facebook"})
+        elif results[index] is not None:
+            errors.append({"campaign_id": update.campaign_id, "error": results[index]})
+        else:
+            updated.append(update)
+    
+    for error in errors:
+        logger.error(f"Error updating budget of campaign {error['campaign_id']}: {error['error']}")
+    
+    # Update campaigns in database in one statement
+    now = datetime.utcnow()
+    db.bulk_update_mappings(CampaignModel, [
+        {"id": update.campaign_id, "daily_budget": update.daily_budget, "updated_at": now}
+        for update in updated
+    ])
+    db.commit()
+    
+    return {
+        "updated": [update.campaign_id for update in updated],
+        "errors": errors
+    }
+
 # Ad set management endpoints
+def ad_set_params(ad_set: AdSetCreate, fb_campaign_id: str) -> Dict[str, Any]:
+    """
+    Build the Facebook parameters for creating an ad set.
+    
+    Args:
+        ad_set: Ad set data
+        fb_campaign_id: Facebook ID of the campaign the ad set belongs to
+        
+    Returns:
+        Parameters for AdAccount.create_ad_set
+    """
+    params = {
+        'name': ad_set.name,
+        'campaign_id': fb_campaign_id,
+        'targeting': ad_set.targeting,
+        'status': ad_set.status,
+        'billing_event': ad_set.billing_event,
+        'optimization_goal': ad_set.optimization_goal,
+        'daily_budget': to_cents(ad_set.budget)
+    }
+    
+    if ad_set.bid_amount:
+        params['bid_amount'] = to_cents(ad_set.bid_amount)
+    
+    return params
+
 @app.post("/campaigns/{campaign_id}/adsets/", response_model=AdSetResponse)
 @handle_facebook_error
 def create_ad_set(
@@ -766,41 +1529,30 @@ def create_ad_set(
     Returns:
         Created ad set
     """
-    # Get campaign
-    campaign = db.query(CampaignModel).filter(CampaignModel.id == campaign_id).first()
+    # Get campaign and its Facebook account in one query
+    campaign = db.execute(CAMPAIGN_WITH_ACCOUNT_STATEMENT, {"campaign_id": campaign_id}).scalar_one_or_none()
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
     
-    # Get Facebook account
-    account = db.query(FacebookAccount).filter(FacebookAccount.id == campaign.account_id).first()
+    account = campaign.account
     if not account:
         raise HTTPException(status_code=404, detail="Facebook account not found")
     
+    # Refresh the access token before it expires
+    ensure_valid_token(account, db)
+    
     # Initialize Facebook API
     ad_account = get_ad_account(account.access_token, account.fb_account_id)
     
     # Create ad set on Facebook
-    params = {
-        'name': ad_set.name,
-        'campaign_id': campaign.fb_campaign_id,
-        'targeting': ad_set.targeting,
-        'status': ad_set.status,
-        'billing_event': ad_set.billing_event,
-        'optimization_goal': ad_set.optimization_goal,
-        'daily_budget': int(ad_set.budget * 100)  # Convert to cents
-    }
-    
-    if ad_set.bid_amount:
-        params['bid_amount'] = int(ad_set.bid_amount * 100)  # Convert to cents
-    
-    fb_adset = ad_account.create_ad_set(params=params)
+    fb_adset = ad_account.create_ad_set(params=ad_set_params(ad_set, campaign.fb_campaign_id))
     
     # Store ad set in database
     db_adset = AdSetModel(
         campaign_id=campaign_id,
         fb_adset_id=fb_adset['id'],
         name=ad_set.name,
-        targeting=json.dumps(ad_set.targeting),
+        targeting=ad_set.targeting,
         budget=ad_set.budget,
         bid_amount=ad_set.bid_amount,
         billing_event=ad_set.billing_event,
@@ -811,137 +1563,215 @@ def create_ad_set(
     db.commit()
     db.refresh(db_adset)
     
-    # Convert targeting JSON string back to dict for response
-    response = AdSetResponse(
-        id=db_adset.id,
-        fb_adset_id=db_adset.fb_adset_id,
-        name=db_adset.name,
-        targeting=json.loads(db_adset.targeting),
-        budget=db_adset.budget,
-        bid_amount=db_adset.bid_amount,
-        billing_event=db_adset.billing_event,
-        optimization_goal=db_adset.optimization_goal,
-        status=db_adset.status,
-        created_at=db_adset.created_at,
-        updated_at=db_adset.updated_at
-    )
+    return db_adset
+
+@app.post("/campaigns/{campaign_id}/adsets/batch")
+@handle_facebook_error
+def create_ad_sets(
+    campaign_id: str,
+    ad_sets: List[AdSetCreate],
+    db: Session = Depends(get_db)
+):
+    """
+    Create several ad sets in a campaign with batched API calls.
     
-    return response
+    The creations are sent in Graph API batches of up to
+    FACEBOOK_BATCH_LIMIT requests, instead of one HTTP round trip per ad set.
+    
+    Args:
+        campaign_id: ID of the campaign
+        ad_sets: Ad set data
+        
+    Returns:
+        IDs of the created ad sets and errors for the ones that failed
+    """
+    # Get campaign and its Facebook account in one query
+    campaign = db.execute(CAMPAIGN_WITH_ACCOUNT_STATEMENT, {"campaign_id": campaign_id}).scalar_one_or_none()
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    
+    account = campaign.account
+    if not account:
+        raise HTTPException(status_code=404, detail="Facebook account not found")
+    
+    # Refresh the access token before it expires
+    ensure_valid_token(account, db)
+    
+    # Initialize Facebook API
+    api = initialize_facebook_api(account.access_token)
+    ad_account = get_ad_account(account.access_token, account.fb_account_id)
+    
+    # Facebook ad set ID or error message per answered creation
+    results: Dict[int, Dict[str, str]] = {}
+    
+    def on_success(index):
+        def record_success(response):
+            results[index] = {"fb_adset_id": response.json()['id']}
+        return record_success
+    
+    def on_failure(index):
+        def record_error(response):
+            results[index] = {"error": response.error().api_error_message()}
+        return record_error
+    
+    for start in range(0, len(ad_sets), FACEBOOK_BATCH_LIMIT):
+        batch = api.new_batch()
+        for index in range(start, min(start + FACEBOOK_BATCH_LIMIT, len(ad_sets))):
+            ad_account.create_ad_set(
+                params=ad_set_params(ad_sets[index], campaign.fb_campaign_id),
+                batch=batch,
+                success=on_success(index),
+                failure=on_failure(index)
+            )
+        
+        # execute() returns a batch of the calls that got no response
+        for _ in range(3):
+            batch = batch.execute()
+            if not batch:
+                break
+    
+    rows = []
+    errors = []
+    for index, ad_set in enumerate(ad_sets):
+        result = results.get(index, {"error": "No response from Facebook"})
+        if "error" in result:
+            logger.error(f"Error creating ad set {ad_set.name}: {result['error']}")
+            errors.append({"index": index, "name": ad_set.name, "error": result["error"]})
+            continue
+        
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "campaign_id": campaign_id,
+            "fb_adset_id": result["fb_adset_id"],
+            "name": ad_set.name,
+            "targeting": ad_set.targeting,
+            "budget": ad_set.budget,
+            "bid_amount": ad_set.bid_amount,
+            "billing_event": ad_set.billing_event,
+            "optimization_goal": ad_set.optimization_goal,
+            "status": ad_set.status
+        })
+    
+    # Store the created ad sets in one statement
+    db.bulk_insert_mappings(AdSetModel, rows)
+    db.commit()
+    
+    return {
+        "created": [row["id"] for row in rows],
+        "errors": errors
+    }
 
 @app.get("/campaigns/{campaign_id}/adsets/", response_model=List[AdSetResponse])
 @handle_facebook_error
-def get_ad_sets(campaign_id: str, db: Session = Depends(get_db)):
+def get_ad_sets(campaign_id: str, include_targeting: bool = False, db: Session = Depends(get_db)):
     """
     Get all ad sets for a campaign.
     
+    Targeting specs are large and rarely needed when listing, so they are only
+    fetched from Facebook on request; otherwise the stored targeting is kept.
+    
     Args:
         campaign_id: ID of the campaign
+        include_targeting: Also refresh targeting from Facebook
         
     Returns:
         List of ad sets
     """
-    # Get campaign
-    campaign = db.query(CampaignModel).filter(CampaignModel.id == campaign_id).first()
+    # Get campaign and its Facebook account in one query
+    campaign = db.execute(CAMPAIGN_WITH_ACCOUNT_STATEMENT, {"campaign_id": campaign_id}).scalar_one_or_none()
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
     
-    # Get Facebook account
-    account = db.query(FacebookAccount).filter(FacebookAccount.id == campaign.account_id).first()
+    account = campaign.account
     if not account:
         raise HTTPException(status_code=404, detail="Facebook account not found")
     
+    # Refresh the access token before it expires
+    ensure_valid_token(account, db)
+    
     # Initialize Facebook API
-    initialize_facebook_api(account.access_token)
+    api = initialize_facebook_api(account.access_token)
     
     # Get ad sets from Facebook
-    fb_campaign = Campaign(campaign.fb_campaign_id)
+    fb_campaign = Campaign(campaign.fb_campaign_id, api=api)
     fields = [
         'id',
         'name',
         'status',
         'daily_budget',
-        'targeting',
         'bid_amount',
         'billing_event',
         'optimization_goal'
     ]
+    if include_targeting:
+        fields.append('targeting')
     fb_adsets = fb_campaign.get_ad_sets(fields=fields)
     
-    # Update local database with latest data
+    # Load the campaign's stored ad sets in one query, keyed by Facebook ID
+    adsets = {
+        adset.fb_adset_id: adset
+        for adset in db.execute(ADSETS_BY_CAMPAIGN_STATEMENT, {"campaign_id": campaign_id}).scalars()
+    }
+    
+    # Fields missing from the Facebook data keep their stored value
+    new_adsets = []
+    now = datetime.utcnow()
+    
     for fb_adset in fb_adsets:
-        # Check if ad set exists in database
-        db_adset = db.query(AdSetModel).filter(
-            AdSetModel.campaign_id == campaign_id,
-            AdSetModel.fb_adset_id == fb_adset['id']
-        ).first()
+        adset = adsets.get(fb_adset['id'])
         
-        if db_adset:
+        if adset:
             # Update existing ad set
-            db_adset.name = fb_adset.get('name', db_adset.name)
-            db_adset.status = fb_adset.get('status', db_adset.status)
-            
-            if 'targeting' in fb_adset:
-                db_adset.targeting = json.dumps(fb_adset['targeting'])
+            for field in ('name', 'status', 'billing_event', 'optimization_goal', 'targeting'):
+                if field in fb_adset:
+                    setattr(adset, field, fb_adset[field])
             
             if 'daily_budget' in fb_adset:
-                db_adset.budget = float(fb_adset['daily_budget']) / 100  # Convert from cents
+                adset.budget = from_cents(fb_adset['daily_budget'])
             
             if 'bid_amount' in fb_adset:
-                db_adset.bid_amount = float(fb_adset['bid_amount']) / 100  # Convert from cents
+                adset.bid_amount = from_cents(fb_adset['bid_amount'])
             
-            db_adset.billing_event = fb_adset.get('billing_event', db_adset.billing_event)
-            db_adset.optimization_goal = fb_adset.get('optimization_goal', db_adset.optimization_goal)
-            db_adset.updated_at = datetime.utcnow()
+            adset.updated_at = now
         else:
-            # Create new ad set record
-            targeting = {}
+            # Create new ad set record; targeting stays unset until fetched
+            targeting = {} if include_targeting else None
             if 'targeting' in fb_adset:
                 targeting = fb_adset['targeting']
             
             budget = None
             if 'daily_budget' in fb_adset:
-                budget = float(fb_adset['daily_budget']) / 100  # Convert from cents
+                budget = from_cents(fb_adset['daily_budget'])
             
             bid_amount = None
             if 'bid_amount' in fb_adset:
-                bid_amount = float(fb_adset['bid_amount']) / 100  # Convert from cents
+                bid_amount = from_cents(fb_adset['bid_amount'])
             
-            db_adset = AdSetModel(
-                campaign_id=campaign_id,
-                fb_adset_id=fb_adset['id'],
-                name=fb_adset.get('name', ''),
-                targeting=json.dumps(targeting),
-                budget=budget,
-                bid_amount=bid_amount,
-                billing_event=fb_adset.get('billing_event'),
-                optimization_goal=fb_adset.get('optimization_goal'),
-                status=fb_adset.get('status', 'UNKNOWN')
-            )
-            db.add(db_adset)
-    
+            new_adsets.append({
+                "campaign_id": campaign_id,
+                "fb_adset_id": fb_adset['id'],
+                "name": fb_adset.get('name', ''),
+                "targeting": targeting,
+                "budget": budget,
+                "bid_amount": bid_amount,
+                "billing_event": fb_adset.get('billing_event'),
+                "optimization_goal": fb_adset.get('optimization_goal'),
+                "status": fb_adset.get('status', 'UNKNOWN')
+            })
+    
+    # Insert the new ad sets in one statement that returns them with their
+    # generated IDs and timestamps
+    if new_adsets:
+        for adset in db.scalars(
+            insert(AdSetModel).returning(AdSetModel, sort_by_parameter_order=True), new_adsets
+        ):
+            adsets[adset.fb_adset_id] = adset
+    
+    # Build the response before committing, which would expire the rows
+    response = [AdSetResponse.model_validate(adset) for adset in adsets.values()]
     db.commit()
     
-    # Return ad sets from database
-    adsets = db.query(AdSetModel).filter(AdSetModel.campaign_id == campaign_id).all()
-    
-    # Convert targeting JSON string to dict for each ad set
-    responses = []
-    for adset in adsets:
-        responses.append(AdSetResponse(
-            id=adset.id,
-            fb_adset_id=adset.fb_adset_id,
-            name=adset.name,
-            targeting=json.loads(adset.targeting),
-            budget=adset.budget,
-            bid_amount=adset.bid_amount,
-            billing_event=adset.billing_event,
-            optimization_goal=adset.optimization_goal,
-            status=adset.status,
-            created_at=adset.created_at,
-            updated_at=adset.updated_at
-        ))
-    
-    return responses
+    return response
 
 @app.get("/adsets/{adset_id}", response_model=AdSetResponse)
 def get_ad_set(adset_id: str, db: Session = Depends(get_db)):
@@ -954,26 +1784,36 @@ def get_ad_set(adset_id: str, db: Session = Depends(get_db)):
     Returns:
         Ad set
     """
-    adset = db.query(AdSetModel).filter(AdSetModel.id == adset_id).first()
+    adset = db.execute(ADSET_BY_ID_STATEMENT, {"adset_id": adset_id}).scalar_one_or_none()
     if not adset:
         raise HTTPException(status_code=404, detail="Ad set not found")
     
-    # Convert targeting JSON string to dict
-    response = AdSetResponse(
-        id=adset.id,
-        fb_adset_id=adset.fb_adset_id,
-        name=adset.name,
-        targeting=json.loads(adset.targeting),
-        budget=adset.budget,
-        bid_amount=adset.bid_amount,
-        billing_event=adset.billing_event,
-        optimization_goal=adset.optimization_goal,
-        status=adset.status,
-        created_at=adset.created_at,
-        updated_at=adset.updated_at
-    )
+    return adset
+
+def load_adset_chain(db: Session, adset_id: str) -> Tuple[AdSetModel, CampaignModel, FacebookAccount]:
+    """
+    Load an ad set with its campaign and Facebook account in one query.
     
-    return response
+    Args:
+        db: Database session
+        adset_id: ID of the ad set
+        
+    Returns:
+        The ad set, its campaign and the campaign's Facebook account
+    """
+    adset = db.execute(ADSET_WITH_CAMPAIGN_STATEMENT, {"adset_id": adset_id}).scalar_one_or_none()
+    if not adset:
+        raise HTTPException(status_code=404, detail="Ad set not found")
+    
+    campaign = adset.campaign
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    
+    account = campaign.account
+    if not account:
+        raise HTTPException(status_code=404, detail="Facebook account not found")
+    
+    return adset, campaign, account
 
 @app.put("/adsets/{adset_id}/status")
 @handle_facebook_error
@@ -997,33 +1837,23 @@ def update_ad_set_status(
     if status not in valid_statuses:
         raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}")
     
-    # Get ad set
-    adset = db.query(AdSetModel).filter(AdSetModel.id == adset_id).first()
-    if not adset:
-        raise HTTPException(status_code=404, detail="Ad set not found")
-    
-    # Get campaign
-    campaign = db.query(CampaignModel).filter(CampaignModel.id == adset.campaign_id).first()
-    if not campaign:
-        raise HTTPException(status_code=404, detail="Campaign not found")
+    # Get ad set with its campaign and Facebook account in one query
+    adset, campaign, account = load_adset_chain(db, adset_id)
     
-    # Get Facebook account
-    account = db.query(FacebookAccount).filter(FacebookAccount.id == campaign.account_id).first()
-    if not account:
-        raise HTTPException(status_code=404, detail="Facebook account not found")
+    # Refresh the access token before it expires
+    ensure_valid_token(account, db)
     
     # Initialize Facebook API
-    initialize_facebook_api(account.access_token)
+    api = initialize_facebook_api(account.access_token)
     
     # Update ad set on Facebook
-    fb_adset = AdSet(adset.fb_adset_id)
+    fb_adset = AdSet(adset.fb_adset_id, api=api)
     fb_adset.api_update(params={'status': status})
     
     # Update ad set in database
     adset.status = status
     adset.updated_at = datetime.utcnow()
     db.commit()
-    db.refresh(adset)
     
     return {"message": f"Ad set status updated to {status}", "adset_id": adset_id}
 
@@ -1044,37 +1874,62 @@ def update_ad_set_budget(
     Returns:
         Updated ad set
     """
-    # Get ad set
-    adset = db.query(AdSetModel).filter(AdSetModel.id == adset_id).first()
-    if not adset:
-        raise HTTPException(status_code=404, detail="Ad set not found")
+    # Get ad set with its campaign and Facebook account in one query
+    adset, campaign, account = load_adset_chain(db, adset_id)
     
-    # Get campaign
-    campaign = db.query(CampaignModel).filter(CampaignModel.id == adset.campaign_id).first()
-    if not campaign:
-        raise HTTPException(status_code=404, detail="Campaign not found")
-    
-    # Get Facebook account
-    account = db.query(FacebookAccount).filter(FacebookAccount.id == campaign.account_id).first()
-    if not account:
-        raise HTTPException(status_code=404, detail="Facebook account not found")
+    # Refresh the access token before it expires
+    ensure_valid_token(account, db)
     
     # Initialize Facebook API
-    initialize_facebook_api(account.access_token)
+    api = initialize_facebook_api(account.access_token)
     
     # Update ad set on Facebook
-    fb_adset = AdSet(adset.fb_adset_id)
-    fb_adset.api_update(params={'daily_budget': int(budget * 100)})  # Convert to cents
+    fb_adset = AdSet(adset.fb_adset_id, api=api)
+    fb_adset.api_update(params={'daily_budget': to_cents(budget)})
     
     # Update ad set in database
     adset.budget = budget
     adset.updated_at = datetime.utcnow()
     db.commit()
-    db.refresh(adset)
     
     return {"message": "Ad set budget updated", "adset_id": adset_id}
 
 # Performance metrics endpoints
+@app.post("/accounts/{account_id}/metrics/sync")
+def sync_account_metrics(
+    account_id: str,
+    background_tasks: BackgroundTasks,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Start syncing daily ad set metrics for an account in the background.
+    
+    Args:
+        account_id: ID of the Facebook account
+        start_date: Start date for metrics (YYYY-MM-DD)
+        end_date: End date for metrics (YYYY-MM-DD)
+        
+    Returns:
+        Confirmation with the synced date range
+    """
+    account = db.execute(ACCOUNT_BY_ID_STATEMENT, {"account_id": account_id}).scalar_one_or_none()
+    if not account:
+        raise HTTPException(status_code=404, detail="Facebook account not found")
+    
+    # Set default date range if not provided
+    start_date, end_date = default_date_range(start_date, end_date)
+    
+    background_tasks.add_task(sync_account_insights, account_id, start_date, end_date)
+    
+    return {
+        "message": "Metrics sync started",
+        "account_id": account_id,
+        "start_date": start_date,
+        "end_date": end_date
+    }
+
 @app.get("/adsets/{adset_id}/metrics", response_model=List[PerformanceMetricResponse])
 @handle_facebook_error
 def get_ad_set_metrics(
@@ -1094,33 +1949,20 @@ def get_ad_set_metrics(
     Returns:
         List of performance metrics
     """
-    # Get ad set
-    adset = db.query(AdSetModel).filter(AdSetModel.id == adset_id).first()
-    if not adset:
-        raise HTTPException(status_code=404, detail="Ad set not found")
-    
-    # Get campaign
-    campaign = db.query(CampaignModel).filter(CampaignModel.id == adset.campaign_id).first()
-    if not campaign:
-        raise HTTPException(status_code=404, detail="Campaign not found")
-    
-    # Get Facebook account
-    account = db.query(FacebookAccount).filter(FacebookAccount.id == campaign.account_id).first()
-    if not account:
-        raise HTTPException(status_code=404, detail="Facebook account not found")
+    # Get ad set with its campaign and Facebook account in one query
+    adset, campaign, account = load_adset_chain(db, adset_id)
     
     # Set default date range if not provided
-    if not start_date:
-        start_date = (datetime.utcnow() - timedelta(days=30)).strftime('%Y-%m-%d')
+    start_date, end_date = default_date_range(start_date, end_date)
     
-    if not end_date:
-        end_date = datetime.utcnow().strftime('%Y-%m-%d')
+    # Refresh the access token before it expires
+    ensure_valid_token(account, db)
     
     # Initialize Facebook API
-    initialize_facebook_api(account.access_token)
+    api = initialize_facebook_api(account.access_token)
     
     # Get metrics from Facebook
-    fb_adset = AdSet(adset.fb_adset_id)
+    fb_adset = AdSet(adset.fb_adset_id, api=api)
     params = {
         'time_range': {
             'since': start_date,
@@ -1137,74 +1979,32 @@ def get_ad_set_metrics(
     
     insights = fb_adset.get_insights(params=params)
     
-    # Process and store metrics
-    metrics = []
-    
-    for insight in insights:
-        date = datetime.strptime(insight.get('date_start'), '%Y-%m-%d')
-        impressions = int(insight.get('impressions', 0))
-        clicks = int(insight.get('clicks', 0))
-        spend = float(insight.get('spend', 0))
-        
-        # Extract conversions from actions
-        conversions = 0
-        if 'actions' in insight:
-            for action in insight['actions']:
-                if action['action_type'] in ['offsite_conversion', 'lead']:
-                    conversions += int(action['value'])
-        
-        # Calculate CPA and CPL
-        cpa = None
-        if conversions > 0 and spend > 0:
-            cpa = spend / conversions
-        
-        cpl = None
-        if 'actions' in insight:
-            leads = 0
-            for action in insight['actions']:
-                if action['action_type'] == 'lead':
-                    leads += int(action['value'])
-            
-            if leads > 0 and spend > 0:
-                cpl = spend / leads
-        
-        # Check if metric already exists in database
-        db_metric = db.query(PerformanceMetric).filter(
-            PerformanceMetric.adset_id == adset_id,
-            PerformanceMetric.date == date
-        ).first()
-        
-        if db_metric:
-            # Update existing metric
-            db_metric.impressions = impressions
-            db_metric.clicks = clicks
-            db_metric.conversions = conversions
-            db_metric.spend = spend
-            db_metric.cpa = cpa
-            db_metric.cpl = cpl
-        else:
-            # Create new metric
-            db_metric = PerformanceMetric(
-                adset_id=adset_id,
-                date=date,
-                impressions=impressions,
-                clicks=clicks,
-                conversions=conversions,
-                spend=spend,
-                cpa=cpa,
-                cpl=cpl
-            )
-            db.add(db_metric)
-        
-        metrics.append(db_metric)
-    
+    rows = [
+        {
+            "adset_id": adset_id,
+            "date": datetime.fromisoformat(insight['date_start']),
+            **parse_insight_metrics(insight)
+        }
+        for insight in insights
+    ]
+    if not rows:
+        return []
+    
+    # Insert new days and update stored ones in one statement; RETURNING
+    # hands back the stored rows without reading them again
+    metrics = db.scalars(
+        upsert_performance_metrics_statement(db, rows).returning(PerformanceMetric),
+        execution_options={"populate_existing": True}
+    ).all()
+    
+    # Build the response before committing, which would expire the rows
+    response = sorted(
+        (PerformanceMetricResponse.model_validate(metric) for metric in metrics),
+        key=lambda metric: metric.date
+    )
     db.commit()
     
-    # Refresh metrics from database
-    for i, metric in enumerate(metrics):
-        db.refresh(metric)
-    
-    return metrics
+    return response
 
 @app.get("/campaigns/{campaign_id}/metrics")
 @handle_facebook_error
@@ -1225,28 +2025,26 @@ def get_campaign_metrics(
     Returns:
         Aggregated metrics
     """
-    # Get campaign
-    campaign = db.query(CampaignModel).filter(CampaignModel.id == campaign_id).first()
+    # Get campaign and its Facebook account in one query
+    campaign = db.execute(CAMPAIGN_WITH_ACCOUNT_STATEMENT, {"campaign_id": campaign_id}).scalar_one_or_none()
     if not campaign:
         raise HTTPException(status_code=404, detail="Campaign not found")
     
-    # Get Facebook account
-    account = db.query(FacebookAccount).filter(FacebookAccount.id == campaign.account_id).first()
+    account = campaign.account
     if not account:
         raise HTTPException(status_code=404, detail="Facebook account not found")
     
     # Set default date range if not provided
-    if not start_date:
-        start_date = (datetime.utcnow() - timedelta(days=30)).strftime('%Y-%m-%d')
+    start_date, end_date = default_date_range(start_date, end_date)
     
-    if not end_date:
-        end_date = datetime.utcnow().strftime('%Y-%m-%d')
+    # Refresh the access token before it expires
+    ensure_valid_token(account, db)
     
     # Initialize Facebook API
-    initialize_facebook_api(account.access_token)
+    api = initialize_facebook_api(account.access_token)
     
     # Get metrics from Facebook
-    fb_campaign = Campaign(campaign.fb_campaign_id)
+    fb_campaign = Campaign(campaign.fb_campaign_id, api=api)
     params = {
         'time_range': {
             'since': start_date,
@@ -1283,16 +2081,7 @@ def get_campaign_metrics(
     clicks = int(insight.get('clicks', 0))
     spend = float(insight.get('spend', 0))
     
-    # Extract conversions and leads from actions
-    conversions = 0
-    leads = 0
-    if 'actions' in insight:
-        for action in insight['actions']:
-            if action['action_type'] == 'offsite_conversion':
-                conversions += int(action['value'])
-            elif action['action_type'] == 'lead':
-                leads += int(action['value'])
-                conversions += int(action['value'])  # Count leads as conversions too
+    conversions, leads = count_conversions(insight.get('actions', ()))
     
     # Calculate metrics
     cpa = None
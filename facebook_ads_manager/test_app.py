@@ -3,17 +3,26 @@ Test module for the Facebook Ads Manager application.
 """
 
 import os
-import pytest
 import json
+import httpx
+import orjson
+import pytest
+from decimal import Decimal
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from urllib.parse import urlparse, parse_qs
 from unittest.mock import patch, MagicMock
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker, raiseload
 from sqlalchemy.pool import StaticPool
 
 from app import app, Base, get_db, FacebookAccount, CampaignModel, AdSetModel, PerformanceMetric
-from app import initialize_facebook_api, get_ad_account, handle_facebook_error
+from app import initialize_facebook_api, get_ad_account, handle_facebook_error, get_insights_async, ensure_valid_token
+from app import consume_oauth_state, issue_oauth_state, rate_limit_wait_seconds, dump_json, to_cents, from_cents, ensure_unique_indexes
+from facebook_business.exceptions import FacebookRequestError
 
 # Create test database
 TEST_DATABASE_URL = "sqlite:///./test_facebook.db"
@@ -21,9 +30,37 @@ engine = create_engine(
     TEST_DATABASE_URL,
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
+    json_serializer=dump_json,
+    json_deserializer=orjson.loads
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Fail on any lazy load that would hit the database, so N+1 patterns show
+# up as errors instead of extra queries. Loads issued by eager loader
+# options and attribute refreshes are left alone.
+@event.listens_for(TestingSessionLocal, "do_orm_execute")
+def raise_on_lazy_load(orm_execute_state):
+    if (
+        orm_execute_state.is_select
+        and not orm_execute_state.is_relationship_load
+        and not orm_execute_state.is_column_load
+    ):
+        orm_execute_state.statement = orm_execute_state.statement.options(raiseload("*", sql_only=True))
+
+@contextmanager
+def count_queries():
+    """Collect the SELECT statements sent to the test database."""
+    statements = []
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+    
+    event.listen(engine, "before_cursor_execute", record_statement)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record_statement)
+
 # Create test client
 client = TestClient(app)
 
@@ -46,6 +83,13 @@ def setup_database():
     # Drop tables
     Base.metadata.drop_all(bind=engine)
 
+@pytest.fixture(autouse=True)
+def clear_facebook_api_cache():
+    # API instances are cached per access token; don't reuse another test's
+    initialize_facebook_api.cache_clear()
+    yield
+    initialize_facebook_api.cache_clear()
+
 @pytest.fixture
 def mock_facebook_api():
     with patch('app.FacebookAdsApi') as mock_api:
@@ -120,7 +164,7 @@ def sample_adset(setup_database, sample_campaign):
         campaign_id=sample_campaign.id,
         fb_adset_id="987654321",
         name="Test Ad Set",
-        targeting=json.dumps({"age_min": 18, "age_max": 65}),
+        targeting={"age_min": 18, "age_max": 65},
         budget=50.0,
         status="ACTIVE",
         billing_event="IMPRESSIONS",
@@ -138,11 +182,19 @@ def test_initialize_facebook_api(mock_facebook_api):
     initialize_facebook_api("test_token")
     mock_facebook_api.init.assert_called_once()
 
+def test_initialize_facebook_api_cached_per_token(mock_facebook_api):
+    """Test that API instances are reused for the same access token."""
+    first = initialize_facebook_api("test_token")
+    assert initialize_facebook_api("test_token") is first
+    initialize_facebook_api("other_token")
+    
+    assert mock_facebook_api.init.call_count == 2
+
 def test_get_ad_account(mock_facebook_api, mock_ad_account):
     """Test getting an ad account."""
     mock_account, mock_instance = mock_ad_account
     result = get_ad_account("test_token", "123456789")
-    mock_account.assert_called_once()
+    mock_account.assert_called_once_with("act_123456789", api=mock_facebook_api.init.return_value)
     assert result == mock_instance
 
 def test_handle_facebook_error_decorator():
@@ -154,7 +206,182 @@ def test_handle_facebook_error_decorator():
     result = test_function()
     assert result == "success"
 
+def rate_limit_error(headers):
+    error = MagicMock(spec=FacebookRequestError)
+    error.http_headers.return_value = headers
+    return error
+
+def test_rate_limit_wait_seconds_uses_regain_estimate():
+    """Test that the backoff waits for Facebook's regain-access estimate."""
+    headers = {
+        "X-Business-Use-Case-Usage": json.dumps({
+            "123": [
+                {"type": "ads_management", "call_count": 100, "estimated_time_to_regain_access": 2},
+                {"type": "ads_insights", "call_count": 40, "estimated_time_to_regain_access": 0}
+            ]
+        })
+    }
+    
+    wait_time = rate_limit_wait_seconds(rate_limit_error(headers), 1)
+    assert 120 <= wait_time <= 121
+
+def test_handle_facebook_error_rejects_long_rate_limit_waits():
+    """Test that regain estimates over the cap return 429 instead of sleeping."""
+    headers = {
+        "x-business-use-case-usage": json.dumps({
+            "123": [{"type": "ads_management", "estimated_time_to_regain_access": 30}]
+        })
+    }
+    error = FacebookRequestError(
+        "Rate limited", {}, 400, headers,
+        json.dumps({"error": {"code": 17, "message": "User request limit reached"}})
+    )
+    
+    @handle_facebook_error
+    def throttled():
+        raise error
+    
+    with patch('app.time.sleep') as mock_sleep:
+        with pytest.raises(HTTPException) as exc_info:
+            throttled()
+    
+    mock_sleep.assert_not_called()
+    assert exc_info.value.status_code == 429
+    assert 1800 <= int(exc_info.value.headers["Retry-After"]) <= 1801
+
+def test_rate_limit_wait_seconds_falls_back_to_backoff():
+    """Test exponential backoff without a usable usage header."""
+    assert 4 <= rate_limit_wait_seconds(rate_limit_error({}), 2) <= 5
+    assert 2 <= rate_limit_wait_seconds(rate_limit_error({"x-business-use-case-usage": "garbage"}), 1) <= 3
+
+def test_ensure_unique_indexes_upgrades_existing_tables():
+    """Test that unique indexes missing from older tables are created at startup."""
+    legacy_engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=legacy_engine)
+    with legacy_engine.begin() as connection:
+        connection.execute(text("DROP INDEX ix_performance_metrics_adset_id_date"))
+    
+    ensure_unique_indexes(legacy_engine)
+    ensure_unique_indexes(legacy_engine)
+    
+    indexes = {index["name"]: index for index in inspect(legacy_engine).get_indexes("performance_metrics")}
+    assert indexes["ix_performance_metrics_adset_id_date"]["unique"]
+
+def test_ensure_unique_indexes_rejects_duplicates():
+    """Test that duplicate rows stop startup instead of breaking every upsert."""
+    legacy_engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=legacy_engine)
+    with legacy_engine.begin() as connection:
+        connection.execute(text("DROP INDEX ix_facebook_accounts_user_id_fb_account_id"))
+        for account_id in ("first", "second"):
+            connection.execute(text(
+                "INSERT INTO facebook_accounts (id, user_id, fb_account_id, name, access_token) "
+                f"VALUES ('{account_id}', 'user', 'act_1', 'Account', 'token')"
+            ))
+    
+    with pytest.raises(IntegrityError):
+        ensure_unique_indexes(legacy_engine)
+
+def test_cents_conversion_is_exact():
+    """Test that budgets round-trip through cents without float truncation."""
+    assert to_cents(19.99) == 1999
+    assert to_cents(0.29) == 29
+    assert from_cents("1999") == Decimal("19.99")
+    assert to_cents(from_cents("4005")) == 4005
+
+def test_ensure_valid_token_refreshes_expiring_token(setup_database, sample_facebook_account, monkeypatch):
+    """Test that a token expiring within a day is exchanged and stored."""
+    monkeypatch.setattr("app.APP_ID", "app_id")
+    monkeypatch.setattr("app.APP_SECRET", "app_secret")
+    db = TestingSessionLocal()
+    account = db.get(FacebookAccount, sample_facebook_account.id)
+    account.token_expiry = datetime.utcnow() + timedelta(hours=2)
+    db.commit()
+    
+    with patch('app.requests.get') as mock_get:
+        mock_get.return_value.json.return_value = {"access_token": "new_token", "expires_in": 5184000}
+        ensure_valid_token(account, db)
+    
+    assert mock_get.call_args.kwargs["params"]["fb_exchange_token"] == "test_access_token"
+    db.close()
+    
+    db = TestingSessionLocal()
+    account = db.get(FacebookAccount, sample_facebook_account.id)
+    assert account.access_token == "new_token"
+    assert account.token_expiry > datetime.utcnow() + timedelta(days=59)
+    db.close()
+
+def test_ensure_valid_token_skips_fresh_token(setup_database, sample_facebook_account, monkeypatch):
+    """Test that tokens far from expiry are used as they are."""
+    monkeypatch.setattr("app.APP_ID", "app_id")
+    monkeypatch.setattr("app.APP_SECRET", "app_secret")
+    db = TestingSessionLocal()
+    account = db.get(FacebookAccount, sample_facebook_account.id)
+    
+    with patch('app.requests.get') as mock_get:
+        ensure_valid_token(account, db)
+    
+    mock_get.assert_not_called()
+    assert account.access_token == "test_access_token"
+    db.close()
+
 # Integration tests for API endpoints
+def test_facebook_auth_encodes_params_and_state(monkeypatch):
+    """Test that the OAuth URL is encoded and carries a fresh state."""
+    monkeypatch.setattr("app.APP_ID", "app_id")
+    monkeypatch.setattr("app.APP_SECRET", "app_secret")
+    monkeypatch.setattr("app.REDIRECT_URI", "https://example.com/callback?next=a&b")
+    
+    response = client.get("/auth/facebook", follow_redirects=False)
+    
+    assert response.status_code == 307
+    query = parse_qs(urlparse(response.headers["location"]).query)
+    assert query["redirect_uri"] == ["https://example.com/callback?next=a&b"]
+    assert query["scope"] == ["ads_management,ads_read"]
+    assert consume_oauth_state(query["state"][0])
+    # States are single use
+    assert not consume_oauth_state(query["state"][0])
+
+def test_facebook_callback_rejects_unknown_state(monkeypatch):
+    """Test that the callback refuses states it did not issue."""
+    monkeypatch.setattr("app.APP_ID", "app_id")
+    monkeypatch.setattr("app.APP_SECRET", "app_secret")
+    monkeypatch.setattr("app.REDIRECT_URI", "https://example.com/callback")
+    
+    with patch("app.graph_api_client") as mock_client:
+        response = client.get("/auth/facebook/callback", params={"code": "code", "state": "forged"})
+    
+    assert response.status_code == 400
+    mock_client.get.assert_not_called()
+
+def test_facebook_callback_exchanges_tokens(monkeypatch):
+    """Test that the callback chains the token exchanges over the shared client."""
+    monkeypatch.setattr("app.APP_ID", "app_id")
+    monkeypatch.setattr("app.APP_SECRET", "app_secret")
+    monkeypatch.setattr("app.REDIRECT_URI", "https://example.com/callback")
+    
+    payloads = {
+        "code": {"access_token": "short_token"},
+        "short_token": {"access_token": "long_token", "expires_in": 5184000},
+        "long_token": {"data": [{"id": "act_1", "name": "Account", "account_id": "1"}]}
+    }
+    requested = []
+    async def fake_get(path, params):
+        requested.append(path)
+        key = params.get("code") or params.get("fb_exchange_token") or params.get("access_token")
+        return httpx.Response(200, json=payloads[key], request=httpx.Request("GET", f"https://graph.facebook.com/{path}"))
+    
+    state = issue_oauth_state()
+    with patch("app.graph_api_client") as mock_client:
+        mock_client.get.side_effect = fake_get
+        response = client.get("/auth/facebook/callback", params={"code": "code", "state": state})
+    
+    assert response.status_code == 200
+    assert requested == ["oauth/access_token", "oauth/access_token", "me/adaccounts"]
+    data = response.json()
+    assert data["access_token"] == "long_token"
+    assert data["ad_accounts"][0]["id"] == "act_1"
+
 def test_create_facebook_account(setup_database):
     """Test creating a Facebook account."""
     response = client.post(
@@ -173,6 +400,31 @@ def test_create_facebook_account(setup_database):
     assert data["fb_account_id"] == "act_123456789"
     assert data["name"] == "Test Account"
 
+def test_create_facebook_account_updates_existing(setup_database, sample_facebook_account):
+    """Test that reconnecting an account updates it in a single statement."""
+    with count_queries() as queries:
+        response = client.post(
+            "/accounts/",
+            json={
+                "user_id": sample_facebook_account.user_id,
+                "fb_account_id": sample_facebook_account.fb_account_id,
+                "name": "Renamed Account",
+                "access_token": "new_token"
+            }
+        )
+    
+    assert response.status_code == 200
+    assert queries == []
+    data = response.json()
+    assert data["id"] == sample_facebook_account.id
+    assert data["name"] == "Renamed Account"
+    
+    db = TestingSessionLocal()
+    accounts = db.query(FacebookAccount).all()
+    assert len(accounts) == 1
+    assert accounts[0].access_token == "new_token"
+    db.close()
+
 def test_get_facebook_accounts(setup_database, sample_facebook_account):
     """Test getting Facebook accounts for a user."""
     response = client.get("/accounts/", params={"user_id": sample_facebook_account.user_id})
@@ -192,6 +444,40 @@ def test_get_facebook_account(setup_database, sample_facebook_account):
     assert data["id"] == sample_facebook_account.id
     assert data["fb_account_id"] == sample_facebook_account.fb_account_id
 
+def test_delete_facebook_account_cascades(setup_database, sample_adset):
+    """Test that deleting an account removes its whole tree in a fixed number of queries."""
+    db = TestingSessionLocal()
+    db.add(PerformanceMetric(adset_id=sample_adset.id, date=datetime(2025, 4, 1), impressions=100))
+    # A second campaign with its own ad set, so lazy loading would cost extra queries
+    db.add(CampaignModel(
+        id="second_campaign_id",
+        account_id="test_account_id",
+        fb_campaign_id="223456789",
+        name="Second Campaign",
+        status="ACTIVE"
+    ))
+    db.add(AdSetModel(
+        campaign_id="second_campaign_id",
+        fb_adset_id="887654321",
+        name="Second Ad Set",
+        targeting={},
+        status="ACTIVE"
+    ))
+    db.commit()
+    db.close()
+    
+    with count_queries() as queries:
+        response = client.delete("/accounts/test_account_id")
+    
+    assert response.status_code == 200
+    # Account, campaigns, ad sets and metrics: one SELECT each
+    assert len(queries) == 4
+    
+    db = TestingSessionLocal()
+    for model in (FacebookAccount, CampaignModel, AdSetModel, PerformanceMetric):
+        assert db.query(model).count() == 0
+    db.close()
+
 def test_create_campaign(setup_database, sample_facebook_account, mock_ad_account):
     """Test creating a campaign."""
     mock_account, mock_instance = mock_ad_account
@@ -228,15 +514,131 @@ def test_get_campaigns(setup_database, sample_facebook_account, sample_campaign,
         }
     ]
     
-    response = client.get(f"/accounts/{sample_facebook_account.id}/campaigns/")
+    with count_queries() as queries:
+        response = client.get(f"/accounts/{sample_facebook_account.id}/campaigns/")
     
     assert response.status_code == 200
+    # Account lookup and stored campaigns
+    assert len(queries) <= 2
     data = response.json()
     assert len(data) == 1
     assert data[0]["id"] == sample_campaign.id
     assert data[0]["name"] == sample_campaign.name
     assert data[0]["objective"] == sample_campaign.objective
 
+def test_get_campaigns_syncs_new_and_existing(setup_database, sample_facebook_account, sample_campaign, mock_ad_account):
+    """Test that synced campaigns update stored rows and add new ones."""
+    mock_account, mock_instance = mock_ad_account
+    mock_instance.get_campaigns.return_value = [
+        {"id": sample_campaign.fb_campaign_id, "name": "Renamed Campaign", "status": "PAUSED"},
+        {"id": "new_fb_campaign", "name": "New Campaign", "status": "ACTIVE", "daily_budget": "2500"}
+    ]
+    
+    response = client.get(f"/accounts/{sample_facebook_account.id}/campaigns/")
+    
+    assert response.status_code == 200
+    campaigns = {campaign["fb_campaign_id"]: campaign for campaign in response.json()}
+    assert len(campaigns) == 2
+    assert campaigns[sample_campaign.fb_campaign_id]["name"] == "Renamed Campaign"
+    assert campaigns[sample_campaign.fb_campaign_id]["status"] == "PAUSED"
+    assert campaigns[sample_campaign.fb_campaign_id]["daily_budget"] == sample_campaign.daily_budget
+    assert campaigns["new_fb_campaign"]["daily_budget"] == 25.0
+
+def test_get_user_campaigns_across_accounts(setup_database, sample_facebook_account, mock_ad_account):
+    """Test listing campaigns fetched from all of a user's accounts."""
+    db = TestingSessionLocal()
+    db.add(FacebookAccount(
+        id="second_account_id",
+        user_id=sample_facebook_account.user_id,
+        fb_account_id="act_987",
+        access_token="second_token"
+    ))
+    db.commit()
+    db.close()
+    
+    mock_account, mock_instance = mock_ad_account
+    campaigns_by_account = {
+        "act_123456789": [{"id": "fb_1", "name": "First", "status": "ACTIVE"}],
+        "act_987": [{"id": "fb_2", "name": "Second", "status": "PAUSED"}]
+    }
+    
+    def ad_account(fb_account_id, api):
+        account = MagicMock()
+        account.get_campaigns.return_value = campaigns_by_account[fb_account_id]
+        return account
+    
+    mock_account.side_effect = ad_account
+    
+    response = client.get("/campaigns/", params={"user_id": sample_facebook_account.user_id})
+    
+    assert response.status_code == 200
+    assert sorted(campaign["name"] for campaign in response.json()) == ["First", "Second"]
+    
+    response = client.get("/campaigns/", params={"user_id": "unknown_user"})
+    assert response.status_code == 200
+    assert response.json() == []
+
+def test_update_campaign_budget_not_found(setup_database):
+    """Test that a missing campaign is reported as 404."""
+    response = client.put("/campaigns/missing_campaign/budget", params={"daily_budget": 10})
+    
+    assert response.status_code == 404
+
+def test_update_campaign_budgets_batch(setup_database, sample_campaign, mock_facebook_api, mock_campaign):
+    """Test batched budget updates, recording failures per campaign."""
+    db = TestingSessionLocal()
+    db.add(CampaignModel(
+        id="failing_campaign_id",
+        account_id=sample_campaign.account_id,
+        fb_campaign_id="555",
+        name="Failing Campaign",
+        status="ACTIVE",
+        daily_budget=10.0
+    ))
+    db.commit()
+    db.close()
+    
+    mock_campaign_class, mock_campaign_instance = mock_campaign
+    
+    def api_update(params, batch, success, failure):
+        fb_campaign_id = mock_campaign_class.call_args.args[0]
+        if fb_campaign_id == "555":
+            response = MagicMock()
+            response.error.return_value.api_error_message.return_value = "Budget too low"
+            failure(response)
+        else:
+            assert params == {"daily_budget": 25000}
+            success(MagicMock())
+    
+    mock_campaign_instance.api_update.side_effect = api_update
+    batch = mock_facebook_api.init.return_value.new_batch.return_value
+    batch.execute.return_value = None
+    
+    response = client.post("/campaigns/batch/budget", json=[
+        {"campaign_id": sample_campaign.id, "daily_budget": 250.0},
+        {"campaign_id": "failing_campaign_id", "daily_budget": 0.5}
+    ])
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["updated"] == [sample_campaign.id]
+    assert data["errors"] == [{"campaign_id": "failing_campaign_id", "error": "Budget too low"}]
+    batch.execute.assert_called_once()
+    
+    db = TestingSessionLocal()
+    assert db.get(CampaignModel, sample_campaign.id).daily_budget == 250.0
+    assert db.get(CampaignModel, "failing_campaign_id").daily_budget == 10.0
+    db.close()
+
+def test_update_campaign_budgets_batch_not_found(setup_database, sample_campaign):
+    """Test that unknown campaigns reject the whole batch."""
+    response = client.post("/campaigns/batch/budget", json=[
+        {"campaign_id": sample_campaign.id, "daily_budget": 250.0},
+        {"campaign_id": "missing_campaign", "daily_budget": 10.0}
+    ])
+    
+    assert response.status_code == 404
+
 def test_update_campaign_status(setup_database, sample_campaign, mock_campaign):
     """Test updating a campaign's status."""
     mock_campaign_class, mock_campaign_instance = mock_campaign
@@ -282,6 +684,72 @@ def test_create_ad_set(setup_database, sample_campaign, mock_ad_account):
     assert data["status"] == "PAUSED"
     assert data["fb_adset_id"] == "new_adset_id"
 
+def test_create_ad_sets_batch(setup_database, sample_campaign, mock_facebook_api, mock_ad_account):
+    """Test batched ad set creation, storing only the ones Facebook accepted."""
+    mock_account, mock_instance = mock_ad_account
+    
+    def create_ad_set(params, batch, success, failure):
+        assert params["campaign_id"] == sample_campaign.fb_campaign_id
+        response = MagicMock()
+        if params["name"] == "Rejected":
+            response.error.return_value.api_error_message.return_value = "Invalid targeting"
+            failure(response)
+        else:
+            response.json.return_value = {"id": f"fb_{params['name']}"}
+            success(response)
+    
+    mock_instance.create_ad_set.side_effect = create_ad_set
+    batch = mock_facebook_api.init.return_value.new_batch.return_value
+    batch.execute.return_value = None
+    
+    ad_set = {
+        "targeting": {"age_min": 18},
+        "budget": 20.0,
+        "billing_event": "IMPRESSIONS",
+        "optimization_goal": "REACH"
+    }
+    response = client.post(f"/campaigns/{sample_campaign.id}/adsets/batch", json=[
+        {"name": "First", **ad_set},
+        {"name": "Rejected", **ad_set},
+        {"name": "Second", **ad_set}
+    ])
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["created"]) == 2
+    assert data["errors"] == [{"index": 1, "name": "Rejected", "error": "Invalid targeting"}]
+    batch.execute.assert_called_once()
+    
+    db = TestingSessionLocal()
+    stored = {adset.fb_adset_id: adset for adset in db.query(AdSetModel).all()}
+    assert set(stored) == {"fb_First", "fb_Second"}
+    assert stored["fb_First"].id in data["created"]
+    assert stored["fb_First"].targeting == {"age_min": 18}
+    db.close()
+
+def test_create_ad_sets_batch_prefixes_account_id(setup_database, sample_campaign, mock_facebook_api, mock_ad_account):
+    """Test that batched creation targets the act_ node for unprefixed account IDs."""
+    mock_account, mock_instance = mock_ad_account
+    db = TestingSessionLocal()
+    db.get(FacebookAccount, sample_campaign.account_id).fb_account_id = "123456789"
+    db.commit()
+    db.close()
+    
+    mock_instance.create_ad_set.side_effect = lambda params, batch, success, failure: failure(MagicMock())
+    mock_facebook_api.init.return_value.new_batch.return_value.execute.return_value = None
+    
+    response = client.post(f"/campaigns/{sample_campaign.id}/adsets/batch", json=[{
+        "name": "First",
+        "targeting": {"age_min": 18},
+        "budget": 20.0,
+        "billing_event": "IMPRESSIONS",
+        "optimization_goal": "REACH"
+    }])
+    
+    assert response.status_code == 200
+    mock_account.assert_called_once()
+    assert mock_account.call_args.args[0] == "act_123456789"
+
 def test_get_ad_sets(setup_database, sample_campaign, sample_adset, mock_campaign):
     """Test getting ad sets for a campaign."""
     mock_campaign_class, mock_campaign_instance = mock_campaign
@@ -290,30 +758,73 @@ def test_get_ad_sets(setup_database, sample_campaign, sample_adset, mock_campaig
             "id": sample_adset.fb_adset_id,
             "name": sample_adset.name,
             "status": sample_adset.status,
-            "targeting": json.loads(sample_adset.targeting),
+            "targeting": sample_adset.targeting,
             "daily_budget": int(sample_adset.budget * 100)
         }
     ]
     
-    response = client.get(f"/campaigns/{sample_campaign.id}/adsets/")
+    with count_queries() as queries:
+        response = client.get(f"/campaigns/{sample_campaign.id}/adsets/")
     
     assert response.status_code == 200
+    # Campaign with account and the stored ad sets; no reload after the sync
+    assert len(queries) == 2
     data = response.json()
     assert len(data) == 1
     assert data[0]["id"] == sample_adset.id
     assert data[0]["name"] == sample_adset.name
     assert data[0]["status"] == sample_adset.status
 
+def test_get_ad_sets_syncs_new_and_existing(setup_database, sample_campaign, sample_adset, mock_campaign):
+    """Test that synced ad sets update stored rows and add new ones."""
+    mock_campaign_class, mock_campaign_instance = mock_campaign
+    mock_campaign_instance.get_ad_sets.return_value = [
+        {"id": sample_adset.fb_adset_id, "status": "PAUSED", "bid_amount": "150"},
+        {"id": "new_fb_adset", "name": "New Ad Set", "daily_budget": "4000"}
+    ]
+    
+    response = client.get(f"/campaigns/{sample_campaign.id}/adsets/")
+    
+    assert response.status_code == 200
+    adsets = {adset["fb_adset_id"]: adset for adset in response.json()}
+    assert len(adsets) == 2
+    assert adsets[sample_adset.fb_adset_id]["name"] == sample_adset.name
+    assert adsets[sample_adset.fb_adset_id]["status"] == "PAUSED"
+    assert adsets[sample_adset.fb_adset_id]["bid_amount"] == 1.5
+    assert adsets[sample_adset.fb_adset_id]["targeting"] == sample_adset.targeting
+    assert adsets["new_fb_adset"]["budget"] == 40.0
+    assert adsets["new_fb_adset"]["status"] == "UNKNOWN"
+
+def test_get_ad_sets_targeting_on_request(setup_database, sample_campaign, sample_adset, mock_campaign):
+    """Test that targeting is only fetched from Facebook when asked for."""
+    mock_campaign_class, mock_campaign_instance = mock_campaign
+    mock_campaign_instance.get_ad_sets.return_value = [
+        {"id": sample_adset.fb_adset_id, "targeting": {"age_min": 25}}
+    ]
+    
+    response = client.get(f"/campaigns/{sample_campaign.id}/adsets/")
+    assert response.status_code == 200
+    assert "targeting" not in mock_campaign_instance.get_ad_sets.call_args.kwargs["fields"]
+    
+    response = client.get(f"/campaigns/{sample_campaign.id}/adsets/", params={"include_targeting": True})
+    assert response.status_code == 200
+    assert "targeting" in mock_campaign_instance.get_ad_sets.call_args.kwargs["fields"]
+    assert response.json()[0]["targeting"] == {"age_min": 25}
+
 def test_update_ad_set_status(setup_database, sample_adset, mock_adset):
     """Test updating an ad set's status."""
     mock_adset_class, mock_adset_instance = mock_adset
     
-    response = client.put(
-        f"/adsets/{sample_adset.id}/status",
-        params={"status": "PAUSED"}
-    )
+    with count_queries() as queries:
+        response = client.put(
+            f"/adsets/{sample_adset.id}/status",
+            params={"status": "PAUSED"}
+        )
     
     assert response.status_code == 200
+    # Ad set, campaign and account come back in one joined SELECT and
+    # nothing is re-read after the commit
+    assert len(queries) == 1
     data = response.json()
     assert data["message"] == "Ad set status updated to PAUSED"
     assert data["adset_id"] == sample_adset.id
@@ -351,8 +862,106 @@ def test_get_ad_set_metrics(setup_database, sample_adset, mock_adset):
     assert data[0]["impressions"] == 1000
     assert data[0]["clicks"] == 50
     assert data[0]["spend"] == 25.5
-    assert data[0]["conversions"] == 10
-    assert data[0]["cpa"] == 25.5 / 10  # spend / conversions
+    # Leads count as conversions too
+    assert data[0]["conversions"] == 15
+    assert data[0]["cpa"] == 25.5 / 15  # spend / conversions
+    assert data[0]["cpl"] == 25.5 / 5  # spend / leads
+
+def test_get_ad_set_metrics_upserts_days(setup_database, sample_adset, mock_adset):
+    """Test that refetched days overwrite stored metrics in a single statement."""
+    db = TestingSessionLocal()
+    db.add(PerformanceMetric(adset_id=sample_adset.id, date=datetime(2025, 4, 1), impressions=1, clicks=1))
+    db.commit()
+    db.close()
+    
+    mock_adset_class, mock_adset_instance = mock_adset
+    mock_adset_instance.get_insights.return_value = [
+        {"date_start": "2025-04-02", "impressions": "700", "clicks": "20", "spend": "10"},
+        {"date_start": "2025-04-01", "impressions": "500", "clicks": "10", "spend": "5"}
+    ]
+    
+    with count_queries() as queries:
+        response = client.get(
+            f"/adsets/{sample_adset.id}/metrics",
+            params={"start_date": "2025-04-01", "end_date": "2025-04-02"}
+        )
+    
+    assert response.status_code == 200
+    # Only the ad set lookup reads; the upsert returns the stored rows
+    assert len(queries) == 1
+    data = response.json()
+    assert [metric["impressions"] for metric in data] == [500, 700]
+    
+    db = TestingSessionLocal()
+    assert db.query(PerformanceMetric).count() == 2
+    db.close()
+
+def test_get_insights_async_polls_with_backoff():
+    """Test that insights jobs are polled with growing delays until done."""
+    statuses = iter(["Job Not Started", "Job Running", "Job Completed"])
+    report = MagicMock()
+    state = {"id": "report_id", "async_percent_completion": 50}
+    
+    def api_get(fields):
+        state["async_status"] = next(statuses)
+        return report
+    
+    report.api_get.side_effect = api_get
+    report.__getitem__.side_effect = state.__getitem__
+    report.get_result.return_value = ["insight"]
+    ad_object = MagicMock()
+    ad_object.get_insights_async.return_value = report
+    
+    with patch('app.time.sleep') as mock_sleep:
+        result = get_insights_async(ad_object, {"level": "adset"})
+    
+    assert result == ["insight"]
+    assert [call.args[0] for call in mock_sleep.call_args_list] == [5, 10]
+    ad_object.get_insights_async.assert_called_once_with(params={"level": "adset"})
+
+def test_get_insights_async_failed_job():
+    """Test that a failed insights job raises."""
+    report = MagicMock()
+    report.api_get.return_value = report
+    report.__getitem__.side_effect = {"id": "report_id", "async_status": "Job Failed"}.__getitem__
+    ad_object = MagicMock()
+    ad_object.get_insights_async.return_value = report
+    
+    with pytest.raises(RuntimeError):
+        get_insights_async(ad_object, {})
+
+def test_sync_account_metrics(setup_database, sample_facebook_account, sample_adset, mock_ad_account, monkeypatch):
+    """Test that synced insights are stored once per ad set and day."""
+    monkeypatch.setattr("app.SessionLocal", TestingSessionLocal)
+    insights = [
+        {
+            "adset_id": sample_adset.fb_adset_id,
+            "date_start": "2025-04-01",
+            "impressions": "1000",
+            "clicks": "50",
+            "spend": "30",
+            "actions": [{"action_type": "lead", "value": "3"}]
+        },
+        {"adset_id": "unknown_adset", "date_start": "2025-04-01", "impressions": "5"}
+    ]
+    
+    with patch('app.get_insights_async', return_value=insights) as mock_insights:
+        for _ in range(2):
+            response = client.post(
+                f"/accounts/{sample_facebook_account.id}/metrics/sync",
+                params={"start_date": "2025-04-01", "end_date": "2025-04-03"}
+            )
+            assert response.status_code == 200
+    
+    assert mock_insights.call_args.args[1]["level"] == "adset"
+    
+    db = TestingSessionLocal()
+    metrics = db.query(PerformanceMetric).all()
+    assert len(metrics) == 1
+    assert metrics[0].adset_id == sample_adset.id
+    assert metrics[0].impressions == 1000
+    assert metrics[0].cpl == 10.0
+    db.close()
 
 def test_get_campaign_metrics(setup_database, sample_campaign, mock_campaign):
     """Test getting aggregated metrics for a campaign."""
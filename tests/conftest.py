@@ -0,0 +1,26 @@
+"""
+Shared pytest configuration for the test suite.
+
+Makes the repository root importable so the application packages can be
+imported by their package names no matter where pytest is started from, and
+silences application logging for the duration of the run.
+"""
+
+import os
+import sys
+import logging
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+
+@pytest.fixture(autouse=True, scope="session")
+def disable_logging():
+    # The application modules configure INFO logging at import time; formatting
+    # every record is wasted work while testing
+    logging.disable(logging.CRITICAL)
+    yield
+    logging.disable(logging.NOTSET)
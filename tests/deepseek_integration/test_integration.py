@@ -0,0 +1,458 @@
+"""
+Testing Framework for DeepSeek Integration
+
+This module provides tests for the DeepSeek integration components
+to ensure they work correctly together.
+"""
+
+import os
+import json
+import functools
+import importlib.util
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, Mock, patch
+
+# Skip the module instead of failing collection when the client dependencies are missing
+pytest.importorskip("openai")
+pytest.importorskip("tenacity")
+
+from deepseek_integration.deepseek_client import DeepSeekAIClient
+from deepseek_integration.api_connection import DeepSeekAPIConnection
+from deepseek_integration.knowledge_processor import KnowledgeProcessor
+from deepseek_integration.integration import AIMediaBuyingAgent
+
+# Shared test data
+TEST_CAMPAIGN = {"id": "123", "name": "Test Campaign", "objective": "conversions"}
+TEST_PERFORMANCE = {"impressions": 1000, "clicks": 100, "conversions": 10}
+TEST_RULES = [{"category": "budget", "rule": "Test rule"}]
+TEST_DECISION_JSON = '{"budget_adjustment": {"action": "increase", "amount": 0.2}}'
+TEST_DECISION = json.loads(TEST_DECISION_JSON)
+
+@functools.lru_cache(maxsize=None)
+def make_chat_response(content):
+    # Plain namespaces are enough for the response.choices[0].message.content access.
+    # Responses are cached per content, so tests must not mutate them.
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+def last_call_kwargs(mock):
+    return mock.call_args.kwargs
+
+# Fixtures
+@pytest.fixture(scope="class")
+def mock_openai():
+    # Patch the API key and OpenAI once for every test in the class
+    with pytest.MonkeyPatch.context() as monkeypatch, \
+            patch('deepseek_integration.deepseek_client.OpenAI') as mock_openai:
+        monkeypatch.setenv('DEEPSEEK_API_KEY', 'test_api_key')
+        mock_openai.return_value = MagicMock()
+        yield mock_openai
+
+@pytest.fixture
+def deepseek_client(mock_openai):
+    mock_openai.reset_mock()
+    mock_client = mock_openai.return_value
+    mock_client.chat.completions.create.return_value = make_chat_response("Test response")
+    return DeepSeekAIClient(), mock_client
+
+@pytest.fixture(scope="class")
+def mock_deepseek_client_class():
+    with patch('deepseek_integration.api_connection.DeepSeekAIClient') as mock_client_class:
+        mock_client_class.return_value = Mock(spec=DeepSeekAIClient)
+        yield mock_client_class
+
+@pytest.fixture
+def api_connection(mock_deepseek_client_class):
+    mock_deepseek_client_class.reset_mock()
+    return DeepSeekAPIConnection(api_key='test_api_key'), mock_deepseek_client_class.return_value
+
+@pytest.fixture(scope="class")
+def knowledge_base_dir(tmp_path_factory):
+    return tmp_path_factory.mktemp("knowledge_base")
+
+@pytest.fixture
+def knowledge_processor(knowledge_base_dir, request):
+    # Give each test its own knowledge base file
+    return KnowledgeProcessor(knowledge_base_path=str(knowledge_base_dir / f"{request.node.name}.json"))
+
+@pytest.fixture(scope="class")
+def mock_agent_dependencies():
+    with patch('deepseek_integration.integration.DeepSeekAPIConnection') as mock_api_connection_class, \
+            patch('deepseek_integration.integration.KnowledgeProcessor') as mock_knowledge_processor_class:
+        mock_api_connection_class.return_value = Mock(spec=DeepSeekAPIConnection)
+        mock_knowledge_processor_class.return_value = Mock(spec=KnowledgeProcessor)
+        yield mock_api_connection_class, mock_knowledge_processor_class
+
+@pytest.fixture
+def mock_facebook_ads_manager():
+    return MagicMock()
+
+@pytest.fixture
+def agent(mock_agent_dependencies, mock_facebook_ads_manager):
+    for mock_class in mock_agent_dependencies:
+        mock_class.reset_mock()
+    
+    return AIMediaBuyingAgent(
+        deepseek_api_key='test_api_key',
+        knowledge_base_path='test_kb.json',
+        facebook_ads_manager=mock_facebook_ads_manager
+    )
+
+
+class TestDeepSeekClient:
+    """Tests for the DeepSeekAIClient class."""
+    
+    def test_initialization(self, deepseek_client, mock_openai):
+        """Test client initialization."""
+        client, _ = deepseek_client
+        assert client.api_key == 'test_api_key'
+        assert client.base_url == 'https://api.deepseek.com'
+        mock_openai.assert_called_once_with(
+            api_key='test_api_key',
+            base_url='https://api.deepseek.com'
+        )
+    
+    @pytest.mark.parametrize("method,kwargs,response_content,prompt_content", [
+        ("ask_question", {"question": "Test question"}, "Test response", "Test question"),
+        ("analyze_document", {"document_text": "Test document"}, "Test response", "Test document"),
+        (
+            "generate_decision",
+            {
+                "campaign_data": TEST_CAMPAIGN,
+                "performance_metrics": TEST_PERFORMANCE,
+                "knowledge_base_rules": TEST_RULES
+            },
+            '{"test": "value"}',
+            "Test Campaign"
+        ),
+    ])
+    def test_chat_completion(self, deepseek_client, method, kwargs, response_content, prompt_content):
+        """Test that each request method sends its prompt and returns the response."""
+        client, mock_client = deepseek_client
+        mock_client.chat.completions.create.return_value = make_chat_response(response_content)
+        
+        response = getattr(client, method)(**kwargs)
+        
+        assert response == response_content
+        mock_client.chat.completions.create.assert_called_once()
+        call_kwargs = last_call_kwargs(mock_client.chat.completions.create)
+        assert call_kwargs['model'] == 'deepseek-chat'
+        assert prompt_content in call_kwargs['messages'][-1]['content']
+
+
+class TestAPIConnection:
+    """Tests for the DeepSeekAPIConnection class."""
+    
+    def test_initialization(self, api_connection, mock_deepseek_client_class):
+        """Test connection initialization."""
+        connection, mock_client = api_connection
+        mock_deepseek_client_class.assert_called_once_with(api_key='test_api_key')
+        assert connection.client == mock_client
+    
+    def test_process_document(self, api_connection):
+        """Test document processing."""
+        connection, mock_client = api_connection
+        
+        # Set up mock responses
+        mock_client.analyze_document.return_value = "Test analysis"
+        mock_client.extract_knowledge_items.return_value = [
+            {"category": "budget", "rule": "Test rule"}
+        ]
+        
+        result = connection.process_document("Test document", "test_doc.pdf")
+        
+        mock_client.analyze_document.assert_called_once_with("Test document")
+        mock_client.extract_knowledge_items.assert_called_once_with("Test analysis")
+        
+        assert result == [{"category": "budget", "rule": "Test rule", "source": "test_doc.pdf"}]
+    
+    def test_evaluate_campaign(self, api_connection):
+        """Test campaign evaluation."""
+        connection, mock_client = api_connection
+        
+        # Set up mock response
+        mock_client.generate_decision.return_value = TEST_DECISION_JSON
+        
+        result = connection.evaluate_campaign(
+            campaign_data=TEST_CAMPAIGN,
+            performance_metrics=TEST_PERFORMANCE,
+            knowledge_base_rules=TEST_RULES
+        )
+        
+        mock_client.generate_decision.assert_called_once()
+        assert result == TEST_DECISION
+    
+    def test_stream_evaluate_campaign(self, api_connection):
+        """Test streamed campaign evaluation."""
+        connection, mock_client = api_connection
+        
+        # Split the response mid-field to mimic token streaming
+        mock_client.stream_decision.return_value = iter([
+            '{"budget_adjustment": {"action": "incr',
+            'ease", "amount": 0.2}, "ad_set_actions": [{"ad_set_id": "1", ',
+            '"action": "pause"}]}'
+        ])
+        
+        result = list(connection.stream_evaluate_campaign(
+            campaign_data=TEST_CAMPAIGN,
+            performance_metrics=TEST_PERFORMANCE,
+            knowledge_base_rules=TEST_RULES
+        ))
+        
+        assert result == [
+            ("budget_adjustment", {"action": "increase", "amount": 0.2}),
+            ("ad_set_actions", [{"ad_set_id": "1", "action": "pause"}])
+        ]
+    
+    def test_stream_evaluate_campaign_truncated(self, api_connection):
+        """Test that a stream cut off mid-object ends with an error."""
+        connection, mock_client = api_connection
+        
+        # Output stopped at max_tokens inside the ad set actions
+        mock_client.stream_decision.return_value = iter([
+            '{"budget_adjustment": {"action": "increase", "amount": 0.2}, ',
+            '"ad_set_actions": [{"ad_set_id": "1", "act'
+        ])
+        
+        result = list(connection.stream_evaluate_campaign(
+            campaign_data=TEST_CAMPAIGN,
+            performance_metrics=TEST_PERFORMANCE,
+            knowledge_base_rules=TEST_RULES
+        ))
+        
+        assert result[0] == ("budget_adjustment", {"action": "increase", "amount": 0.2})
+        assert [key for key, _ in result] == ["budget_adjustment", "error"]
+    
+    def test_stream_evaluate_campaign_not_json(self, api_connection):
+        """Test that non-JSON output falls back to reformatting."""
+        connection, mock_client = api_connection
+        
+        mock_client.stream_decision.return_value = iter(["Increase the budget ", "by 20%."])
+        mock_client._reformat_as_json.return_value = TEST_DECISION_JSON
+        
+        result = list(connection.stream_evaluate_campaign(
+            campaign_data=TEST_CAMPAIGN,
+            performance_metrics=TEST_PERFORMANCE,
+            knowledge_base_rules=TEST_RULES
+        ))
+        
+        mock_client._reformat_as_json.assert_called_once_with("Increase the budget by 20%.")
+        assert result == list(TEST_DECISION.items())
+
+
+class TestKnowledgeProcessor:
+    """Tests for the KnowledgeProcessor class."""
+    
+    def test_initialization(self, knowledge_processor, knowledge_base_dir):
+        """Test processor initialization."""
+        assert os.path.dirname(knowledge_processor.knowledge_base_path) == str(knowledge_base_dir)
+        assert knowledge_processor.knowledge_base.keys() >= {"items", "categories", "documents"}
+    
+    def test_add_knowledge_items(self, knowledge_processor):
+        """Test adding knowledge items."""
+        items = [
+            {
+                "category": "budget",
+                "rule": "Increase budget by 20% when ROAS exceeds target",
+                "conditions": "ROAS > target",
+                "outcome": "Improved scale"
+            },
+            {
+                "category": "targeting",
+                "rule": "Exclude non-converting audiences",
+                "conditions": "No conversions in 14 days",
+                "outcome": "Improved efficiency"
+            }
+        ]
+        
+        added_count = knowledge_processor.add_knowledge_items(items, "test_doc.pdf")
+        knowledge_base = knowledge_processor.knowledge_base
+        
+        # Compare everything except the timestamps in one go
+        snapshot = {
+            "items": [
+                {key: value for key, value in item.items() if key != "added_at"}
+                for item in knowledge_base["items"]
+            ],
+            "categories": knowledge_base["categories"],
+            "documents": {name: document["item_count"] for name, document in knowledge_base["documents"].items()}
+        }
+        
+        assert added_count == 2
+        assert snapshot == {
+            "items": [
+                {
+                    "id": "item_1",
+                    "category": "budget",
+                    "rule": "Increase budget by 20% when ROAS exceeds target",
+                    "conditions": "ROAS > target",
+                    "outcome": "Improved scale",
+                    "source": "test_doc.pdf"
+                },
+                {
+                    "id": "item_2",
+                    "category": "targeting",
+                    "rule": "Exclude non-converting audiences",
+                    "conditions": "No conversions in 14 days",
+                    "outcome": "Improved efficiency",
+                    "source": "test_doc.pdf"
+                }
+            ],
+            "categories": {"budget": {"item_count": 1}, "targeting": {"item_count": 1}},
+            "documents": {"test_doc.pdf": 2}
+        }
+    
+    def test_get_knowledge_items(self, knowledge_processor):
+        """Test getting knowledge items."""
+        # Add test items
+        items = [
+            {"category": "budget", "rule": "Test budget rule"},
+            {"category": "targeting", "rule": "Test targeting rule"},
+            {"category": "budget", "rule": "Another budget rule"}
+        ]
+        knowledge_processor.add_knowledge_items(items, "test_doc.pdf")
+        
+        counts = [
+            len(knowledge_processor.get_knowledge_items()),
+            len(knowledge_processor.get_knowledge_items(category="budget")),
+            len(knowledge_processor.get_knowledge_items(document_name="test_doc.pdf")),
+            len(knowledge_processor.get_knowledge_items(limit=2))
+        ]
+        
+        # All items, by category, by document and with a limit
+        assert counts == [3, 2, 3, 2]
+
+
+class TestIntegration:
+    """Tests for the AIMediaBuyingAgent class."""
+    
+    def test_initialization(self, agent, mock_agent_dependencies, mock_facebook_ads_manager):
+        """Test agent initialization."""
+        mock_api_connection_class, mock_knowledge_processor_class = mock_agent_dependencies
+        mock_api_connection_class.assert_called_once_with(api_key='test_api_key')
+        mock_knowledge_processor_class.assert_called_once_with(knowledge_base_path='test_kb.json')
+        
+        assert agent.api_connection == mock_api_connection_class.return_value
+        assert agent.knowledge_processor == mock_knowledge_processor_class.return_value
+        assert agent.facebook_ads_manager == mock_facebook_ads_manager
+    
+    def test_process_document(self, agent):
+        """Test document processing."""
+        # Set up mock response
+        agent.api_connection.process_document.return_value = [
+            {"category": "budget", "rule": "Test rule"}
+        ]
+        
+        result = agent.process_document("Test document", "test_doc.pdf")
+        
+        agent.api_connection.process_document.assert_called_once_with("Test document", "test_doc.pdf")
+        agent.knowledge_processor.add_knowledge_items.assert_called_once()
+        
+        assert result == [{"category": "budget", "rule": "Test rule"}]
+    
+    def test_evaluate_campaign(self, agent):
+        """Test campaign evaluation."""
+        # Set up mock responses
+        agent.facebook_ads_manager.get_campaign.return_value = TEST_CAMPAIGN
+        agent.facebook_ads_manager.get_campaign_performance.return_value = TEST_PERFORMANCE
+        agent.knowledge_processor.get_rules_for_campaign_type.return_value = TEST_RULES
+        agent.api_connection.evaluate_campaign.return_value = TEST_DECISION
+        
+        result = agent.evaluate_campaign("123", "act_123")
+        
+        agent.facebook_ads_manager.get_campaign.assert_called_once_with("act_123", "123")
+        agent.facebook_ads_manager.get_campaign_performance.assert_called_once_with("act_123", "123")
+        agent.knowledge_processor.get_rules_for_campaign_type.assert_called_once_with("conversions")
+        agent.api_connection.evaluate_campaign.assert_called_once()
+        
+        assert result == TEST_DECISION
+    
+    def test_batch_evaluate_campaigns(self, agent):
+        """Test batch campaign evaluation."""
+        agent.facebook_ads_manager.get_campaign.return_value = TEST_CAMPAIGN
+        agent.api_connection.evaluate_campaign.return_value = {
+            "budget_adjustment": {"action": "maintain", "amount": 0}
+        }
+        
+        result = agent.batch_evaluate_campaigns("act_123", ["1", "2", "3"], max_workers=2)
+        
+        assert list(result) == ["1", "2", "3"]
+        assert agent.api_connection.evaluate_campaign.call_count == 3
+        assert result["2"]["budget_adjustment"]["action"] == "maintain"
+    
+    def test_batch_execute_decisions(self, agent):
+        """Test concurrent execution of several campaign decisions."""
+        decisions = {"1": TEST_DECISION, "2": TEST_DECISION}
+        
+        result = agent.batch_execute_decisions("act_123", decisions, auto_apply=True, max_workers=2)
+        
+        assert list(result) == ["1", "2"]
+        assert agent.facebook_ads_manager.increase_campaign_budget.call_count == 2
+        assert result["1"]["applied_changes"] == ["Increased budget by 20.0%"]
+    
+    def test_get_account_optimization_auto_apply_skips_errors(self, agent):
+        """Test that auto-apply only executes decisions without an error."""
+        agent.facebook_ads_manager.get_account.return_value = {"kpi_targets": {"CPA": 10}}
+        agent.facebook_ads_manager.get_campaigns.return_value = [{"id": "1"}, {"id": "2"}]
+        agent.api_connection.get_optimization_suggestions.return_value = {
+            "account_id": "act_123",
+            "campaigns": {"1": TEST_DECISION, "2": {"error": "Failed to parse decision"}},
+            "account_level_suggestions": [],
+            "errors": []
+        }
+        
+        result = agent.get_account_optimization("act_123", auto_apply=True)
+        
+        assert list(result["execution_results"]) == ["1"]
+        agent.facebook_ads_manager.increase_campaign_budget.assert_called_once_with("act_123", "1", 0.2)
+    
+    def test_evaluate_and_execute_campaign_applies_while_streaming(self, agent):
+        """Test that each streamed recommendation is applied before the next arrives."""
+        events = []
+        agent.facebook_ads_manager.get_campaign.return_value = TEST_CAMPAIGN
+        agent.facebook_ads_manager.increase_campaign_budget.side_effect = lambda *args: events.append("budget")
+        agent.facebook_ads_manager.pause_ad_set.side_effect = lambda *args: events.append("pause")
+        
+        def stream_fields():
+            yield "budget_adjustment", {"action": "increase", "amount": 0.2}
+            events.append("ad_set_actions generated")
+            yield "ad_set_actions", [{"ad_set_id": "1", "action": "pause"}]
+        
+        agent.api_connection.stream_evaluate_campaign.return_value = stream_fields()
+        
+        result = agent.evaluate_and_execute_campaign("123", "act_123", auto_apply=True)
+        
+        assert events == ["budget", "ad_set_actions generated", "pause"]
+        assert result["errors"] == []
+        assert list(result["decision"]) == ["budget_adjustment", "ad_set_actions"]
+    
+    def test_evaluate_and_execute_campaign_reports_stream_error(self, agent):
+        """Test that a decision stream error is reported in the results."""
+        agent.facebook_ads_manager.get_campaign.return_value = TEST_CAMPAIGN
+        agent.api_connection.stream_evaluate_campaign.return_value = iter([
+            ("budget_adjustment", {"action": "increase", "amount": 0.2}),
+            ("error", "Decision stream ended before the decision was complete")
+        ])
+        
+        result = agent.evaluate_and_execute_campaign("123", "act_123", auto_apply=True)
+        
+        assert result["errors"] == ["Decision stream ended before the decision was complete"]
+    
+    def test_unconfigured_facebook_ads_manager(self, mock_agent_dependencies):
+        """Test that a missing Facebook Ads manager produces error results."""
+        with patch.dict("sys.modules", {"facebook_ads_manager.app": None}):
+            agent = AIMediaBuyingAgent(deepseek_api_key='test_api_key', knowledge_base_path='test_kb.json')
+        
+        assert not agent.facebook_ads_manager
+        
+        result = agent.evaluate_campaign("123", "act_123")
+        assert result == {"error": "Error evaluating campaign: Facebook Ads manager not initialized"}
+
+
+if __name__ == '__main__':
+    # The test classes share no state, so run them in parallel when pytest-xdist is
+    # installed; loadscope keeps each class on one worker for its class-scoped fixtures
+    if importlib.util.find_spec("xdist"):
+        pytest.main(["-n", "4", "--dist", "loadscope", __file__])
+    else:
+        pytest.main([__file__])